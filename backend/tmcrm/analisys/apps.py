@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AnalisysConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analisys'
+
+    def ready(self):
+        import analisys.signals
@@ -0,0 +1,147 @@
+"""
+Кэш ответов аналитики.
+
+Ключ ответа - область данных пользователя, действие, параметры запроса
+и версии данных области. Версии - счетчики в общем кэше, которые
+увеличиваются при изменении занятий, посещений, оценок, учеников и снимков
+организации, поэтому старые ответы просто перестают читаться.
+ETag считается по тому же ключу: если данные не менялись, ответ 304
+отдается без обращения к базе.
+"""
+from __future__ import annotations
+import hashlib
+from functools import wraps
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django.utils.cache import patch_cache_control
+from rest_framework import status
+from rest_framework.response import Response
+from mainapp.cache import CacheStats, bump_versions, get_versions
+
+
+ANALYTICS_CACHE_KEY = "analisys:response"
+ANALYTICS_VERSION_KEY = "analisys:version"
+# Сколько живет ответ аналитики, если данные не менялись
+ANALYTICS_CACHE_TIMEOUT = 60 * 10
+
+# Области данных: администратор видит все организации,
+# пользователь без организации - только записи без организации
+ALL_ORGS_SCOPE = "all"
+NO_ORG_SCOPE = "none"
+
+# Параметры, которые не влияют на данные ответа
+IGNORED_PARAMS = ("format",)
+
+analytics_cache_stats = CacheStats("analytics")
+
+
+def _version_key(scope) -> str:
+    return f"{ANALYTICS_VERSION_KEY}:{scope}"
+
+
+def _org_scope(org_id) -> str:
+    return NO_ORG_SCOPE if org_id is None else str(org_id)
+
+
+def get_cache_scopes(user) -> tuple[str, ...]:
+    """
+    Области, от данных которых зависит ответ пользователю.
+    Записи без организации видны всем (filter_by_org), поэтому их версия входит в каждый ключ
+    """
+    if user.has_role("admin"):
+        return (ALL_ORGS_SCOPE,)
+    if user.has_org:
+        return (_org_scope(user.get_org.pk), NO_ORG_SCOPE)
+    return (NO_ORG_SCOPE,)
+
+
+def get_analytics_versions(scopes) -> tuple[int, ...]:
+    return get_versions(_version_key(scope) for scope in scopes)
+
+
+def get_orgs_data_versions(org_ids) -> tuple[int, ...]:
+    """
+    Версии данных организаций (id None - записи без организации) одним обращением к кэшу.
+    Меняются при тех же изменениях, что сбрасывают аналитику, поэтому
+    подходят для ключей других кэшей по занятиям, посещениям и оценкам
+    """
+    return get_analytics_versions(dict.fromkeys(_org_scope(org_id) for org_id in org_ids))
+
+
+def get_org_data_version(org_id) -> int:
+    """Версия данных одной организации, см. get_orgs_data_versions"""
+    return get_orgs_data_versions((org_id,))[0]
+
+
+def invalidate_analytics_cache(org_ids) -> None:
+    """Меняет версии данных организаций (id None - записи без организации) и области администратора"""
+    scopes = {_org_scope(org_id) for org_id in org_ids}
+    if not scopes:
+        return
+    scopes.add(ALL_ORGS_SCOPE)
+    bump_versions(_version_key(scope) for scope in scopes)
+
+
+def _normalize_params(query) -> str:
+    params = sorted(
+        (key, sorted(query.getlist(key))) for key in query if key not in IGNORED_PARAMS
+    )
+    return repr(params)
+
+
+def get_response_key(request, action: str) -> str:
+    scopes = get_cache_scopes(request.user)
+    versions = get_analytics_versions(scopes)
+    raw_key = repr((scopes, versions, action, _normalize_params(request.GET)))
+    return f"{ANALYTICS_CACHE_KEY}:{hashlib.sha1(raw_key.encode()).hexdigest()}"
+
+
+def _etag(key: str) -> str:
+    return f'"{key.rsplit(":", 1)[-1]}"'
+
+
+def _etag_matches(request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match", "")
+    return any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(","))
+
+
+def _with_validators(response: Response, etag: str) -> Response:
+    response["ETag"] = etag
+    # Ответ зависит от пользователя и должен сверяться с сервером при каждом показе
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def cache_analytics_response(func):
+    """
+    Кэширует ответ действия аналитики и отвечает 304 на If-None-Match с текущим ETag.
+    Потоковые и неуспешные ответы не кэшируются
+    """
+
+    @wraps(func)
+    def wrapper(self, request, *args, **kwargs):
+        key = get_response_key(request, func.__name__)
+        etag = _etag(key)
+
+        # 304 только пока жива запись: изменения, не меняющие версию,
+        # видны не позже чем через ANALYTICS_CACHE_TIMEOUT
+        if _etag_matches(request, etag) and cache.has_key(key):
+            analytics_cache_stats.record("shared")
+            return _with_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+        data = cache.get(key)
+        if data is not None:
+            analytics_cache_stats.record("shared")
+            return _with_validators(Response(data), etag)
+
+        analytics_cache_stats.record(None)
+        response = func(self, request, *args, **kwargs)
+        if not isinstance(response, Response) or response.status_code != status.HTTP_200_OK:
+            return response
+
+        if isinstance(response.data, QuerySet):
+            response.data = list(response.data)
+        cache.set(key, response.data, timeout=ANALYTICS_CACHE_TIMEOUT)
+        return _with_validators(response, etag)
+
+    return wrapper
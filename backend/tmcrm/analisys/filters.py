@@ -2,6 +2,9 @@ import django_filters
 from lesson_schedule.models import Attendance, Grade, Lesson
 from students.models import Student, StudentsSnapshot, StudentGroup
 from mainapp.filters import DateRangeMixin
+from employers.models import Teacher
+from lesson_schedule.models import Subject
+from .models import DailyRollup
 
 
 class AttendanceFilter(django_filters.FilterSet):                          
@@ -60,3 +63,19 @@ class StudentFilter(django_filters.FilterSet):
     class Meta:
         model = Student
         fields = ["group", ]
+
+
+class DailyRollupFilter(DateRangeMixin, django_filters.FilterSet):
+    group = django_filters.ModelMultipleChoiceFilter(
+        queryset=StudentGroup.objects.all(), to_field_name="id", label="Группа"
+    )
+    teacher = django_filters.ModelMultipleChoiceFilter(
+        queryset=Teacher.objects.all(), to_field_name="id", label="Преподаватель"
+    )
+    subject = django_filters.ModelMultipleChoiceFilter(
+        queryset=Subject.objects.all(), to_field_name="id", label="Предмет"
+    )
+
+    class Meta:
+        model = DailyRollup
+        fields = ["group", "teacher", "subject"]
@@ -0,0 +1,26 @@
+import time as timer
+from datetime import date
+from typing import Any
+from django.core.management.base import BaseCommand
+from analisys.services import rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает дневные итоги аналитики по сырым занятиям, посещениям и оценкам. "
+        "Без параметров - для всех организаций за всю историю"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--org", type=int, action="append", dest="orgs", help="id организации, можно несколько")
+        parser.add_argument("--start-date", type=date.fromisoformat, default=None)
+        parser.add_argument("--end-date", type=date.fromisoformat, default=None)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        started = timer.perf_counter()
+        written = rebuild_daily_rollups(
+            org_ids=options["orgs"], start=options["start_date"], end=options["end_date"]
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Записано {written} строк итогов за {timer.perf_counter() - started:.1f} c"
+        ))
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:58
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('employers', '0002_initial'),
+        ('lesson_schedule', '0008_hot_query_indexes'),
+        ('mainapp', '0002_initial'),
+        ('students', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('date', models.DateField()),
+                ('attendance_total', models.PositiveIntegerField(default=0)),
+                ('attendance_presents', models.PositiveIntegerField(default=0)),
+                ('grades_count', models.PositiveIntegerField(default=0)),
+                ('grades_sum', models.PositiveIntegerField(default=0)),
+                ('lessons_count', models.PositiveIntegerField(default=0)),
+                ('worked_time', models.DurationField(default=datetime.timedelta)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_%(class)s_set', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='students.studentgroup')),
+                ('org', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s', to='mainapp.organization')),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='lesson_schedule.subject')),
+                ('teacher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='employers.teacher')),
+            ],
+            options={
+                'verbose_name': 'Итоги дня',
+                'verbose_name_plural': 'Итоги дней',
+                'indexes': [models.Index(fields=['org', 'date'], name='daily_rollup_org_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def fill_daily_rollups(apps, schema_editor):
+    from analisys.services import rebuild_daily_rollups
+
+    rebuild_daily_rollups(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analisys', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_daily_rollups, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,40 @@
+from datetime import timedelta
 from django.db import models
+from mainapp.models import BaseModelOrg
 
-# Create your models here.
+
+class DailyRollup(BaseModelOrg):
+    """
+    Итоги дня организации в разрезе группы, преподавателя и предмета занятия.
+    Пересчитываются целиком за день (analisys.services), аналитика читает их
+    вместо сырых посещений, оценок и занятий
+    """
+
+    date = models.DateField()
+    group = models.ForeignKey(
+        "students.StudentGroup", on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    teacher = models.ForeignKey(
+        "employers.Teacher", on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+    subject = models.ForeignKey(
+        "lesson_schedule.Subject", on_delete=models.CASCADE, null=True, blank=True, related_name="+"
+    )
+
+    attendance_total = models.PositiveIntegerField(default=0)
+    attendance_presents = models.PositiveIntegerField(default=0)
+    # Оценки с проставленным значением и их сумма
+    grades_count = models.PositiveIntegerField(default=0)
+    grades_sum = models.PositiveIntegerField(default=0)
+    lessons_count = models.PositiveIntegerField(default=0)
+    worked_time = models.DurationField(default=timedelta)
+
+    class Meta:
+        verbose_name = "Итоги дня"
+        verbose_name_plural = "Итоги дней"
+        indexes = [
+            models.Index(fields=["org", "date"], name="daily_rollup_org_date_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"Итоги {self.date} ({self.org_id})"
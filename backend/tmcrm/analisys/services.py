@@ -0,0 +1,173 @@
+"""
+Дневные итоги аналитики (DailyRollup).
+
+Итоги дня организации пересчитываются целиком по сырым занятиям, посещениям
+и оценкам этого дня: три группирующих запроса, удаление старых строк и одна
+вставка. Пересчет идемпотентен, поэтому его можно безопасно повторять -
+после сохранения записей (сигналы), массовых операций и ночной задачей.
+"""
+from __future__ import annotations
+import threading
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Iterable
+from django.apps import apps as django_apps
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from .cache import invalidate_analytics_cache
+
+
+# Сколько дней пересчитывается одним набором запросов
+ROLLUP_BATCH_DAYS = 92
+ROLLUP_INSERT_BATCH_SIZE = 1000
+
+_pending = threading.local()
+
+
+def _get_models(apps=None):
+    apps = apps or django_apps
+    return (
+        apps.get_model("mainapp", "Organization"),
+        apps.get_model("lesson_schedule", "Lesson"),
+        apps.get_model("lesson_schedule", "Attendance"),
+        apps.get_model("lesson_schedule", "Grade"),
+        apps.get_model("analisys", "DailyRollup"),
+    )
+
+
+def _build_rollups(models, org_id, lookup: str, value) -> list:
+    """Итоги организации за дни, выбранные условием date__<lookup>=value"""
+    _, Lesson, Attendance, Grade, DailyRollup = models
+    rows = defaultdict(dict)
+
+    lessons = (
+        Lesson.objects.filter(org_id=org_id, **{f"date__{lookup}": value})
+        .order_by()
+        .values_list("date", "group_id", "teacher_id", "subject_id")
+        .annotate(count=Count("id"), worked_time=Sum("duration"))
+    )
+    for *key, count, worked_time in lessons:
+        rows[tuple(key)].update(lessons_count=count, worked_time=worked_time or timedelta())
+
+    attendances = (
+        Attendance.objects.filter(org_id=org_id, **{f"lesson_date__{lookup}": value})
+        .order_by()
+        .values_list("lesson_date", "lesson__group_id", "lesson__teacher_id", "lesson__subject_id")
+        .annotate(total=Count("id"), presents=Count("id", filter=Q(was_present=True)))
+    )
+    for *key, total, presents in attendances:
+        rows[tuple(key)].update(attendance_total=total, attendance_presents=presents)
+
+    grades = (
+        Grade.objects.filter(org_id=org_id, value__isnull=False, **{f"grade_date__{lookup}": value})
+        .order_by()
+        .values_list("grade_date", "lesson__group_id", "lesson__teacher_id", "lesson__subject_id")
+        .annotate(count=Count("id"), grades_sum=Sum("value"))
+    )
+    for *key, count, grades_sum in grades:
+        rows[tuple(key)].update(grades_count=count, grades_sum=grades_sum)
+
+    return [
+        DailyRollup(
+            org_id=org_id, date=day, group_id=group_id, teacher_id=teacher_id, subject_id=subject_id, **counters
+        )
+        for (day, group_id, teacher_id, subject_id), counters in rows.items()
+    ]
+
+
+def _replace_rollups(models, org_id, lookup: str, value) -> int:
+    Organization, *_, DailyRollup = models
+    with transaction.atomic():
+        # Пересчеты одной организации выполняются по очереди,
+        # иначе параллельные удаление и вставка оставили бы дубли
+        if org_id is not None:
+            list(Organization.objects.select_for_update().filter(pk=org_id).values_list("pk"))
+
+        rollups = _build_rollups(models, org_id, lookup, value)
+        DailyRollup.objects.filter(org_id=org_id, **{f"date__{lookup}": value}).delete()
+        DailyRollup.objects.bulk_create(rollups, batch_size=ROLLUP_INSERT_BATCH_SIZE)
+    return len(rollups)
+
+
+def refresh_daily_rollups(days: Iterable[tuple[int | None, date]]) -> int:
+    """
+    Пересчитывает итоги для пар (id организации, дата).
+    Возвращает количество записанных строк итогов
+    """
+    models = _get_models()
+    days_by_org = defaultdict(set)
+    for org_id, day in days:
+        if day is not None:
+            days_by_org[org_id].add(day)
+
+    written = 0
+    for org_id, org_days in days_by_org.items():
+        org_days = sorted(org_days)
+        for start in range(0, len(org_days), ROLLUP_BATCH_DAYS):
+            written += _replace_rollups(models, org_id, "in", org_days[start:start + ROLLUP_BATCH_DAYS])
+
+    invalidate_analytics_cache(days_by_org)
+    return written
+
+
+def _date_bounds(models, org_id) -> tuple[date | None, date | None]:
+    _, Lesson, Attendance, Grade, DailyRollup = models
+    bounds = [
+        Lesson.objects.filter(org_id=org_id).aggregate(first=Min("date"), last=Max("date")),
+        Attendance.objects.filter(org_id=org_id).aggregate(first=Min("lesson_date"), last=Max("lesson_date")),
+        Grade.objects.filter(org_id=org_id).aggregate(first=Min("grade_date"), last=Max("grade_date")),
+        # Устаревшие итоги за дни, от которых не осталось записей, тоже удаляются
+        DailyRollup.objects.filter(org_id=org_id).aggregate(first=Min("date"), last=Max("date")),
+    ]
+    firsts = [item["first"] for item in bounds if item["first"]]
+    lasts = [item["last"] for item in bounds if item["last"]]
+    return (min(firsts), max(lasts)) if firsts else (None, None)
+
+
+def rebuild_daily_rollups(org_ids=None, start: date | None = None, end: date | None = None, apps=None) -> int:
+    """
+    Полный пересчет итогов организаций (по умолчанию всех, включая записи без организации)
+    за период, по умолчанию - за всю историю. Дни обрабатываются диапазонами
+    по ROLLUP_BATCH_DAYS. apps передается из миграций
+    """
+    models = _get_models(apps)
+    if org_ids is None:
+        org_ids = [*models[0].objects.values_list("pk", flat=True), None]
+
+    written = 0
+    for org_id in org_ids:
+        first, last = _date_bounds(models, org_id)
+        if first is None:
+            continue
+        first, last = max(first, start or first), min(last, end or last)
+
+        while first <= last:
+            batch_end = min(first + timedelta(days=ROLLUP_BATCH_DAYS - 1), last)
+            written += _replace_rollups(models, org_id, "range", (first, batch_end))
+            first = batch_end + timedelta(days=1)
+
+    # В миграциях кэш ответов не трогается: при развертывании он может быть недоступен
+    if apps is None:
+        invalidate_analytics_cache(org_ids)
+    return written
+
+
+def schedule_rollup_refresh(days: Iterable[tuple[int | None, date]]) -> None:
+    """
+    Откладывает пересчет итогов до фиксации транзакции. Дни всех изменений
+    транзакции копятся в одном множестве и пересчитываются первым колбэком.
+    Дни откатившейся транзакции пересчитаются вместе со следующими - это безопасно
+    """
+    days = {(org_id, day) for org_id, day in days if day is not None}
+    if not days:
+        return
+    if not hasattr(_pending, "days"):
+        _pending.days = set()
+    _pending.days.update(days)
+    transaction.on_commit(_flush_pending_days, robust=True)
+
+
+def _flush_pending_days() -> None:
+    days = _pending.__dict__.pop("days", None)
+    if days:
+        refresh_daily_rollups(days)
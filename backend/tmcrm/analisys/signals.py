@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from lesson_schedule.models import Attendance, Grade, Lesson
+from lesson_schedule.utils import lesson_days_changed
+from students.models import Student, StudentGroup, StudentsSnapshot
+from .cache import invalidate_analytics_cache
+from .services import schedule_rollup_refresh
+
+
+def _invalidate_analytics(org_ids):
+    # Сброс сразу и после фиксации: ответ, посчитанный параллельным запросом
+    # по данным до фиксации, не останется в кэше под новой версией
+    invalidate_analytics_cache(org_ids)
+    transaction.on_commit(lambda: invalidate_analytics_cache(org_ids))
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_day(sender, instance, **kwargs):
+    # При переносе занятия пересчитывается и день, с которого оно ушло
+    instance._rollup_previous_day = None
+    if instance.pk:
+        instance._rollup_previous_day = (
+            Lesson.objects.filter(pk=instance.pk).values_list("org_id", "date").first()
+        )
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def refresh_lesson_rollups(sender, instance, **kwargs):
+    days = {(instance.org_id, instance.date)}
+    previous_day = getattr(instance, "_rollup_previous_day", None)
+    if previous_day:
+        days.add(previous_day)
+    schedule_rollup_refresh(days)
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def refresh_attendance_rollups(sender, instance, **kwargs):
+    schedule_rollup_refresh({(instance.org_id, instance.lesson_date)})
+
+
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+def refresh_grade_rollups(sender, instance, **kwargs):
+    schedule_rollup_refresh({(instance.org_id, instance.grade_date)})
+
+
+@receiver(lesson_days_changed)
+def refresh_changed_days_rollups(sender, days, **kwargs):
+    schedule_rollup_refresh(days)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+@receiver(post_save, sender=StudentsSnapshot)
+@receiver(post_delete, sender=StudentsSnapshot)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=StudentGroup)
+@receiver(post_delete, sender=StudentGroup)
+def invalidate_analytics_on_change(sender, instance, **kwargs):
+    _invalidate_analytics([instance.org_id])
+
+
+@receiver(m2m_changed, sender=StudentGroup.students.through)
+def invalidate_analytics_on_group_students_change(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        _invalidate_analytics([instance.org_id])
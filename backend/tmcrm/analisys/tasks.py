@@ -0,0 +1,21 @@
+from datetime import timedelta
+from celery import shared_task
+from django.utils import timezone
+from mainapp.metrics import track_task_rows
+from .services import rebuild_daily_rollups
+
+
+# Сколько последних дней пересчитывает ночная задача
+ROLLUP_RECENT_DAYS = 7
+
+
+@shared_task
+def rebuild_recent_daily_rollups(orgs=None, days=ROLLUP_RECENT_DAYS):
+    """
+    Страховочный пересчет итогов за последние дни: итоги поддерживаются
+    сигналами, а задача исправляет изменения, прошедшие в обход них
+    """
+    today = timezone.localdate()
+    written = rebuild_daily_rollups(org_ids=orgs, start=today - timedelta(days=days), end=today)
+    track_task_rows("rebuild_recent_daily_rollups", written)
+    return f"Записано {written} строк итогов"
@@ -1,3 +1,125 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from rest_framework import status
+from mainapp.tests import BaseSetupDB
+from lesson_schedule.models import Attendance, Grade
+from .models import DailyRollup
+from .services import rebuild_daily_rollups
 
-# Create your tests here.
+
+class TestDailyRollups(BaseSetupDB):
+
+    def setUp(self):
+        super().setUp()
+        rebuild_daily_rollups(org_ids=[self.org.pk])
+
+    def test_rebuild_groups_lessons_by_group_and_teacher(self):
+        rollup = DailyRollup.objects.get(org=self.org, date=date(2025, 8, 9), group=self.group1)
+        self.assertEqual(rollup.teacher, self.teacher1)
+        self.assertEqual(rollup.lessons_count, 2)
+        self.assertEqual(rollup.worked_time, timedelta(hours=1, minutes=30) + timedelta(hours=1, minutes=10))
+
+    def test_attendance_and_grades_refreshed_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(lesson=self.schedule1, student=self.student1, org=self.org, was_present=True)
+            Attendance.objects.create(lesson=self.schedule2, student=self.student2, org=self.org)
+            Grade.objects.create(lesson=self.schedule1, student=self.student1, org=self.org, value=5)
+
+        response = self.client.get("/api/analisys/metrics/attendance/", {"start_date": "2025-08-01"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["total"], response.data["presents"]), (2, 1))
+
+        response = self.client.get("/api/analisys/charts/grades/")
+        self.assertEqual(list(response.data), [{"grade_date": date(2025, 8, 9), "avg_grade": 5.0}])
+
+    def test_lesson_move_refreshes_both_days(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schedule2.date = date(2025, 8, 11)
+            self.schedule2.save()
+
+        self.assertFalse(DailyRollup.objects.filter(date=date(2025, 8, 9), group=self.group2).exists())
+        self.assertTrue(DailyRollup.objects.filter(date=date(2025, 8, 11), group=self.group2).exists())
+
+
+class TestAnalyticsResponseCache(BaseSetupDB):
+
+    url = "/api/analisys/metrics/attendance/"
+
+    def setUp(self):
+        super().setUp()
+        rebuild_daily_rollups(org_ids=[self.org.pk])
+
+    def test_unchanged_data_served_from_cache_and_304(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(self.url)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertFalse([q for q in ctx.captured_queries if "analisys_dailyrollup" in q["sql"]])
+        self.assertEqual(cached.data, response.data)
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_change_in_org_bumps_version(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(lesson=self.schedule1, student=self.student1, org=self.org, was_present=True)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["presents"], 1)
+
+
+class TestAnalyticsVersions(BaseSetupDB):
+
+    def test_versions_shared_between_processes(self):
+        import tempfile
+        from unittest import mock
+        from django.core.cache.backends.filebased import FileBasedCache
+        from .cache import get_org_data_version, invalidate_analytics_cache
+
+        with tempfile.TemporaryDirectory() as location:
+            # Два процесса со своими экземплярами одного общего кэша
+            first, second = FileBasedCache(location, {}), FileBasedCache(location, {})
+
+            with mock.patch("mainapp.cache.cache", first):
+                before = get_org_data_version(self.org.pk)
+            with mock.patch("mainapp.cache.cache", second):
+                invalidate_analytics_cache([self.org.pk])
+            with mock.patch("mainapp.cache.cache", first):
+                after = get_org_data_version(self.org.pk)
+                self.assertNotEqual(after, before)
+
+                # Вытесненный счетчик не возвращается к прежним значениям
+                first.clear()
+                self.assertNotIn(get_org_data_version(self.org.pk), (before, after))
+
+
+class TestRollupMatchesRawAnalytics(BaseSetupDB):
+
+    url = "/api/analisys/metrics/grade/"
+
+    def setUp(self):
+        super().setUp()
+        # Занятие группы group1, ученик с оценкой - из group2
+        Grade.objects.create(lesson=self.schedule1, student=self.student2, org=self.org, value=5)
+        Grade.objects.create(lesson=self.schedule1, student=self.student1, org=self.org, value=None)
+        rebuild_daily_rollups(org_ids=[self.org.pk])
+
+    def test_grades_without_value_not_counted(self):
+        rollup = self.client.get(self.url).data
+        raw = self.client.get(self.url, {"student": self.student1.pk}).data
+
+        self.assertEqual(rollup["total_quantity_grades"], 1)
+        self.assertEqual(raw["total_quantity_grades"], 0)
+
+    def test_group_filters_by_student_groups(self):
+        response = self.client.get(self.url, {"group": self.group2.pk})
+        self.assertEqual(response.data["total_quantity_grades"], 1)
+
+        response = self.client.get(self.url, {"group": self.group1.pk})
+        self.assertEqual(response.data["total_quantity_grades"], 0)
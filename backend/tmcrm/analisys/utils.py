@@ -1,3 +1,7 @@
+import json
+from django_celery_beat.models import PeriodicTask, IntervalSchedule
+
+
 def _calculate_attendances_rate(presents: int, total: int) -> float:
     """
     Вычисляет процент посещаемости.
@@ -27,3 +31,19 @@ def format_duration(td):
     hours = int(total_seconds // 3600)
     minutes = int((total_seconds % 3600) // 60)
     return f"{hours}:{minutes:02d}"
+
+
+def init_task_rebuild_recent_daily_rollups():
+    schedule, _ = IntervalSchedule.objects.get_or_create(
+        every=1, period=IntervalSchedule.DAYS
+    )
+
+    PeriodicTask.objects.update_or_create(
+        name="Пересчет итогов аналитики за последние дни",
+        defaults={
+            "interval": schedule,
+            "task": "analisys.tasks.rebuild_recent_daily_rollups",
+            "args": json.dumps([]),
+            "kwargs": json.dumps({}),
+        },
+    )
@@ -2,7 +2,8 @@ from datetime import date
 from functools import total_ordering
 import re
 from typing import TYPE_CHECKING, Dict
-from django.db.models import Count, Q, Max, Sum, Min, Avg, F
+from django.db.models import Count, Q, Max, Sum, Min, Avg, F, ExpressionWrapper, FloatField
+from django.db.models.functions import Cast
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from mainapp.exceptions.analisys_exceptions import HasNoStudentsSnapShot
@@ -13,6 +14,7 @@ from mainapp.views import (
     SelectrealtedByModelsViewSet
 )
 from mainapp.permissions import OrgParamsPermission
+from mainapp.streaming import is_stream_requested, iter_serialized, streaming_json_response
 from lesson_schedule.models import Attendance, Grade, Lesson
 from lesson_schedule.serializers.read import ScheduleReadSerializer
 from employers.models import Employer, Teacher
@@ -22,7 +24,16 @@ from .utils import (
     _calcutate_student_success_rate,
     format_duration,
 )
-from .filters import AttendanceFilter, StudentSnapshotFilter, GradeFilter, LessonFilter, StudentFilter
+from .filters import (
+    AttendanceFilter,
+    DailyRollupFilter,
+    StudentSnapshotFilter,
+    GradeFilter,
+    LessonFilter,
+    StudentFilter,
+)
+from .models import DailyRollup
+from .cache import cache_analytics_response
 from mainapp.exceptions.user_exceptions import UserHasNoOrg
 
 
@@ -30,6 +41,16 @@ if TYPE_CHECKING:
     from django.db.models import QuerySet
 
 
+# Параметры запроса, которые можно посчитать по дневным итогам.
+# С любыми другими фильтрами аналитика считается по сырым записям.
+# group посещений и оценок - группы ученика, а итоги разбиты по группе занятия,
+# поэтому такой фильтр считается по сырым записям
+ATTENDANCE_ROLLUP_PARAMS = ("start_date", "end_date", "lesson_date")
+GRADE_ROLLUP_PARAMS = ("start_date", "end_date", "grade_date")
+LESSON_ROLLUP_PARAMS = ("group", "teacher", "subject", "start_date", "end_date", "date")
+IGNORED_ROLLUP_PARAMS = ("format",)
+
+
 # views
 
 
@@ -70,7 +91,8 @@ class BaseMetricsViewSet(
         return self.optimize_queryset(queryset=Attendance.org_objects.all())
 
     def _get_grade_queryset(self) -> "QuerySet[Grade]":
-        return self.optimize_queryset(queryset=Grade.org_objects.all())
+        # Оценка без значения не учитывается, как и в дневных итогах
+        return self.optimize_queryset(queryset=Grade.org_objects.filter(value__isnull=False))
 
     def _get_students_queryset(self) -> "QuerySet[Student]":
         return Student.org_objects.all()
@@ -81,6 +103,23 @@ class BaseMetricsViewSet(
     def _get_lessons_queryset(self) -> "QuerySet[Lesson]":
         return self.optimize_queryset(queryset=Lesson.org_objects.all())
 
+    def _get_rollup_queryset(
+        self, request, params, date_param="date", ignore=()
+    ) -> "QuerySet[DailyRollup] | None":
+        """
+        Дневные итоги, отфильтрованные параметрами запроса,
+        или None, если среди параметров есть неподдерживаемые итогами
+        """
+        query = request.GET.copy()
+        for key in (*IGNORED_ROLLUP_PARAMS, *ignore):
+            query.pop(key, None)
+        if not set(query) <= set(params):
+            return None
+
+        if date_param != "date" and date_param in query:
+            query.setlist("date", query.pop(date_param))
+        return DailyRollupFilter(query, queryset=DailyRollup.org_objects.all()).qs
+
 
 class MetricsViewSet(BaseMetricsViewSet):
     """
@@ -143,8 +182,42 @@ class MetricsViewSet(BaseMetricsViewSet):
         total_seconds = result["total_seconds"]
         return total_seconds
 
+    def _aggregate_rollup_attendences(self, rollups) -> Dict[str, int]:
+        has_attendances = Q(attendance_total__gt=0)
+        aggregate_data = rollups.aggregate(
+            total=Sum("attendance_total"),
+            presents=Sum("attendance_presents"),
+            start_date=Min("date", filter=has_attendances),
+            end_date=Max("date", filter=has_attendances),
+        )
+        aggregate_data["total"] = aggregate_data["total"] or 0
+        aggregate_data["presents"] = aggregate_data["presents"] or 0
+        aggregate_data["rate"] = _calculate_attendances_rate(
+            aggregate_data["presents"], aggregate_data["total"]
+        )
+        return aggregate_data
+
+    def _aggregate_rollup_success_rate(self, rollups) -> Dict[str, int]:
+        has_grades = Q(grades_count__gt=0)
+        aggregate_data = rollups.aggregate(
+            total_quantity_grades=Sum("grades_count"),
+            sum_grades=Sum("grades_sum", filter=has_grades),
+            start_date=Min("date", filter=has_grades),
+            end_date=Max("date", filter=has_grades),
+        )
+        aggregate_data["total_quantity_grades"] = aggregate_data["total_quantity_grades"] or 0
+        aggregate_data["rate"] = _calcutate_student_success_rate(
+            aggregate_data["total_quantity_grades"], aggregate_data["sum_grades"] or 0
+        )
+        return aggregate_data
+
     @action(detail=False, methods=["get"], url_path="attendance")
+    @cache_analytics_response
     def get_attendances_rate(self, request):
+        rollups = self._get_rollup_queryset(request, ATTENDANCE_ROLLUP_PARAMS, "lesson_date")
+        if rollups is not None:
+            return Response(self._aggregate_rollup_attendences(rollups))
+
         queryset = AttendanceFilter(
             request.GET, queryset=self._get_attendance_queryset()
         ).qs      
@@ -153,7 +226,12 @@ class MetricsViewSet(BaseMetricsViewSet):
         return Response(agg)
 
     @action(detail=False, methods=["get"], url_path="grade")
+    @cache_analytics_response
     def get_student_success_rate(self, request):
+        rollups = self._get_rollup_queryset(request, GRADE_ROLLUP_PARAMS, "grade_date")
+        if rollups is not None:
+            return Response(self._aggregate_rollup_success_rate(rollups))
+
         queryset = GradeFilter(
             request.GET, queryset=self._get_grade_queryset()
         ).qs
@@ -162,6 +240,7 @@ class MetricsViewSet(BaseMetricsViewSet):
         return Response(agg)              
 
     @action(detail=False, methods=["get"], url_path="student_snapshot")
+    @cache_analytics_response
     def get_student_snapshot(self, request):
         error_resp = self.validate_required_query_params(request, ["date"])
         if error_resp:
@@ -184,14 +263,29 @@ class MetricsViewSet(BaseMetricsViewSet):
         methods=["get"],
         url_path="worked_hours",
     )
+    @cache_analytics_response
     def get_worked_hours(self, request):
         queryset = LessonFilter(request.GET, queryset=self._get_lessons_queryset()).qs
-        serializer = ScheduleReadSerializer(
-            queryset, many=True, exclude_fields=["teacher", "subject", "classroom"]
-        )
-        worked_seconds = self._aggregate_worked_time(queryset)
+        exclude_fields = ["teacher", "subject", "classroom"]
+
+        rollups = self._get_rollup_queryset(request, LESSON_ROLLUP_PARAMS, ignore=("stream",))
+        if rollups is not None:
+            worked_seconds = rollups.aggregate(total=Sum("worked_time"))["total"]
+        else:
+            worked_seconds = self._aggregate_worked_time(queryset)
         worked_hours = format_duration(worked_seconds)
 
+        if is_stream_requested(request):
+            lessons = iter_serialized(
+                queryset, ScheduleReadSerializer, exclude_fields=exclude_fields
+            )
+            return streaming_json_response(
+                lessons, head={"worked_hours": worked_hours}, key="lessons"
+            )
+
+        serializer = ScheduleReadSerializer(
+            queryset, many=True, exclude_fields=exclude_fields
+        )
         return Response({"worked_hours": worked_hours, "lessons": serializer.data})
 
     @action(
@@ -199,6 +293,7 @@ class MetricsViewSet(BaseMetricsViewSet):
         methods=['get'],
         url_path='groups_count'
     )
+    @cache_analytics_response
     def get_groups_count(self, request):
         queryset= self._get_student_group_queryset()
         data = self._get_groups_count(queryset)
@@ -209,6 +304,7 @@ class MetricsViewSet(BaseMetricsViewSet):
         methods=['get'],
         url_path='students_count'
     )
+    @cache_analytics_response
     def get_students_count(self, request):
         queryset = StudentFilter(request.GET, queryset=self._get_students_queryset()).qs
         data = self._get_students_count(queryset)
@@ -232,12 +328,46 @@ class AnalyticsChartsViewSet(BaseMetricsViewSet):
     def _get_worked_hours_by_date(self, queryset: "QuerySet[Lesson]"):
         return queryset.values('date').annotate(total_hours=Sum(F('duration')))
 
+    def _get_rollup_average_grade_by_date(self, rollups: "QuerySet[DailyRollup]"):
+        return (
+            rollups.filter(grades_count__gt=0)
+            .values(grade_date=F("date"))
+            .annotate(
+                avg_grade=ExpressionWrapper(
+                    Cast(Sum("grades_sum"), FloatField()) / Sum("grades_count"),
+                    output_field=FloatField(),
+                )
+            )
+            .order_by("grade_date")
+        )
+
+    def _get_rollup_attendance_by_date(self, rollups: "QuerySet[DailyRollup]"):
+        return (
+            rollups.filter(attendance_total__gt=0)
+            .values(lesson_date=F("date"))
+            .annotate(total=Sum("attendance_total"), presents=Sum("attendance_presents"))
+            .order_by("lesson_date")
+        )
+
+    def _get_rollup_worked_hours_by_date(self, rollups: "QuerySet[DailyRollup]"):
+        return (
+            rollups.filter(lessons_count__gt=0)
+            .values("date")
+            .annotate(total_hours=Sum("worked_time"))
+            .order_by("date")
+        )
+
     @action(
         detail=False,
         methods=["get"],
         url_path="grades"
     )
+    @cache_analytics_response
     def get_grades_chart(self, request) -> Response: 
+        rollups = self._get_rollup_queryset(request, GRADE_ROLLUP_PARAMS, "grade_date")
+        if rollups is not None:
+            return Response(list(self._get_rollup_average_grade_by_date(rollups)))
+
         queryset = GradeFilter(request.GET, queryset=self._get_grade_queryset()).qs
         data = self._get_average_grade_by_date(queryset)
         return Response(list(data))           
@@ -247,6 +377,7 @@ class AnalyticsChartsViewSet(BaseMetricsViewSet):
         methods=['get'],
         url_path='clients_dynamic'
     )
+    @cache_analytics_response
     def get_clients_chart(self, request):
         queryset = StudentSnapshotFilter(request.GET, queryset=self._get_student_snapshot()).qs
         data = self._get_clients_by_date(queryset)
@@ -257,7 +388,12 @@ class AnalyticsChartsViewSet(BaseMetricsViewSet):
         methods=["get"],
         url_path="attendance"
     )
+    @cache_analytics_response
     def get_attendance_chart(self, request):
+        rollups = self._get_rollup_queryset(request, ATTENDANCE_ROLLUP_PARAMS, "lesson_date")
+        if rollups is not None:
+            return Response(self._get_rollup_attendance_by_date(rollups))
+
         queryset = AttendanceFilter(request.GET, queryset=self._get_attendance_queryset()).qs 
         data = self._get_attendance_by_date(queryset)
         return Response(data)
@@ -267,7 +403,12 @@ class AnalyticsChartsViewSet(BaseMetricsViewSet):
         methods=['get'],
         url_path='worked_hours'
     )                          
+    @cache_analytics_response
     def get_worked_hours_by_date(self, request):
+        rollups = self._get_rollup_queryset(request, LESSON_ROLLUP_PARAMS)
+        if rollups is not None:
+            return Response(self._get_rollup_worked_hours_by_date(rollups))
+
         queryset = LessonFilter(request.GET, queryset=Lesson.org_objects.all()).qs
         data = self._get_worked_hours_by_date(queryset)
         return Response(data)
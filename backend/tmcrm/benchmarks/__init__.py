@@ -0,0 +1,19 @@
+"""
+Бенчмарки REST API: количество запросов к базе, p50/p95 времени ответа
+и пик памяти для основных эндпоинтов на синтетических данных нескольких организаций.
+
+Запуск с PostgreSQL из настроек проекта:
+    TMCRM_BENCHMARKS=1 pytest benchmarks
+
+С SQLite и кэшем в памяти процесса вместо Redis:
+    TMCRM_BENCHMARKS=1 TMCRM_DATABASE=sqlite TMCRM_CACHE=locmem pytest benchmarks
+
+Размер данных: BENCH_ORGS (организаций, по умолчанию 3), повторов замера: BENCH_REPEAT.
+
+Результаты сравниваются с benchmarks/baselines.json (отдельно для каждой СУБД).
+Прогон сам ничего не пишет. Сохранить эталоны с замерами новых эндпоинтов
+в файл: BENCH_BASELINES_OUT=<путь>; перезаписать и существующие - вместе
+с BENCH_UPDATE_BASELINES=1. Обновить эталоны репозитория:
+    BENCH_UPDATE_BASELINES=1 BENCH_BASELINES_OUT=benchmarks/baselines.json pytest benchmarks
+Шум замеров: BENCH_LATENCY_SLACK_MS, BENCH_MEMORY_RUNS.
+"""
@@ -0,0 +1,95 @@
+import os
+from datetime import timedelta
+from pathlib import Path
+import pytest
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from .recorder import Baselines, measure
+
+BENCHMARKS_DIR = Path(__file__).parent
+ENABLED = os.environ.get("TMCRM_BENCHMARKS") == "1"
+
+_baselines: Baselines | None = None
+
+
+def bench_config():
+    from mainapp.services.load_data import LoadDataConfig
+
+    config = LoadDataConfig(prefix="bench", orgs=int(os.environ.get("BENCH_ORGS", 3)))
+    # Последние недели остаются незавершенными - их меняет редактирование расписаний
+    return config._replace(completed_until=config.start_date + timedelta(weeks=config.weeks - 4))
+
+
+def pytest_collection_modifyitems(config, items):
+    if ENABLED:
+        return
+    skip = pytest.mark.skip(reason="Бенчмарки запускаются с TMCRM_BENCHMARKS=1")
+    for item in items:
+        if BENCHMARKS_DIR in Path(item.fspath).parents:
+            item.add_marker(skip)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _baselines or not _baselines.results:
+        return
+    terminalreporter.section(f"benchmarks ({_baselines.vendor})")
+    terminalreporter.write_line(f"{'эндпоинт':<28}{'запросов':>10}{'p50, мс':>10}{'p95, мс':>10}{'пик, КБ':>10}")
+    for result in _baselines.results:
+        terminalreporter.write_line(
+            f"{result.name:<28}{result.queries:>10}{result.p50_ms:>10}{result.p95_ms:>10}{result.peak_kb:>10}"
+        )
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(django_db_setup, django_db_blocker):
+    """Данные генерируются один раз на сессию, тесты работают в откатываемых транзакциях"""
+    if not ENABLED:
+        return
+    from mainapp.services.load_data import LoadDataGenerator
+
+    with django_db_blocker.unblock():
+        LoadDataGenerator(bench_config()).generate()
+
+
+@pytest.fixture(scope="session")
+def baselines():
+    global _baselines
+    _baselines = Baselines(connection.vendor)
+    yield _baselines
+    _baselines.save()
+
+
+@pytest.fixture
+def org(db):
+    from mainapp.models import Organization
+
+    return Organization.objects.get(name=f"{bench_config().prefix}_0")
+
+
+@pytest.fixture(autouse=True)
+def auth_users_cache(settings):
+    # Бенчмарки идут в одном процессе: кэш пользователей корректен и с кэшем в памяти
+    settings.AUTH_USERS_CACHE = True
+
+
+@pytest.fixture
+def api_client(org):
+    user = org.created_by
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+    return client
+
+
+@pytest.fixture
+def bench(baselines):
+    """bench(name, request, before=None) - замер и сравнение с эталоном"""
+
+    def run(name, request, before=None):
+        result = measure(name, request, before=before)
+        problems = baselines.check(result)
+        if problems:
+            pytest.fail(f"{name}: " + "; ".join(problems))
+        return result
+
+    return run
@@ -0,0 +1,149 @@
+import gc
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+# Куда записать эталоны после прогона. Без этой переменной прогон ничего
+# не пишет; обновить эталоны репозитория - BENCH_BASELINES_OUT=benchmarks/baselines.json
+BASELINES_OUT = os.environ.get("BENCH_BASELINES_OUT")
+
+# Повторов для расчета перцентилей и прогревочных запросов перед замером
+REPEAT = int(os.environ.get("BENCH_REPEAT", 20))
+WARMUP = 2
+# Пик памяти - минимум из нескольких прогонов: разовые выделения
+# (ленивая инициализация, рост словарей) не должны считаться регрессией
+MEMORY_RUNS = int(os.environ.get("BENCH_MEMORY_RUNS", 3))
+# Допустимый рост относительно эталона. Количество запросов сравнивается строго,
+# для p95 допуск вдвое больше, чем для p50: хвост сильнее зависит от шума
+LATENCY_TOLERANCE = float(os.environ.get("BENCH_LATENCY_TOLERANCE", 0.5))
+MEMORY_TOLERANCE = float(os.environ.get("BENCH_MEMORY_TOLERANCE", 0.25))
+# Рост времени меньше этого значения считается шумом
+LATENCY_SLACK_MS = float(os.environ.get("BENCH_LATENCY_SLACK_MS", 10.0))
+
+
+class BenchResult(NamedTuple):
+    name: str
+    queries: int
+    p50_ms: float
+    p95_ms: float
+    peak_kb: int
+
+    def as_baseline(self) -> dict:
+        return {
+            "queries": self.queries,
+            "p50_ms": self.p50_ms,
+            "p95_ms": self.p95_ms,
+            "peak_kb": self.peak_kb,
+        }
+
+
+def measure(
+    name: str, request: Callable[[], Any], repeat: int = REPEAT, before: Callable[[], Any] | None = None
+) -> BenchResult:
+    """
+    Замеряет вызов request (запрос тестового клиента):
+    количество SQL-запросов, p50/p95 времени и пик памяти Python (tracemalloc).
+    Память и запросы замеряются отдельными прогонами, чтобы не искажать время.
+    before вызывается перед каждым запросом вне замера, например чтобы сбросить кэш ответов
+    """
+    before = before or (lambda: None)
+    for _ in range(WARMUP):
+        before()
+        _check_response(name, request())
+
+    before()
+    with CaptureQueriesContext(connection) as ctx:
+        _check_response(name, request())
+    queries = len(ctx.captured_queries)
+
+    peaks = []
+    for _ in range(MEMORY_RUNS):
+        before()
+        tracemalloc.start()
+        try:
+            _check_response(name, request())
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    peak = min(peaks)
+
+    gc.collect()
+    timings = []
+    for _ in range(repeat):
+        before()
+        started = time.perf_counter()
+        _check_response(name, request())
+        timings.append((time.perf_counter() - started) * 1000)
+
+    p95 = statistics.quantiles(timings, n=20)[18] if len(timings) > 1 else timings[0]
+    return BenchResult(
+        name=name,
+        queries=queries,
+        p50_ms=round(statistics.median(timings), 2),
+        p95_ms=round(p95, 2),
+        peak_kb=peak // 1024,
+    )
+
+
+def _check_response(name, response):
+    status_code = getattr(response, "status_code", 200)
+    if status_code >= 400:
+        raise AssertionError(f"{name}: ответ {status_code}")
+    # Потоковые ответы нужно дочитать, иначе сериализация не попадет в замер
+    if getattr(response, "streaming", False):
+        b"".join(response.streaming_content)
+
+
+class Baselines:
+    """Эталонные результаты по СУБД и сравнение с ними"""
+
+    def __init__(self, vendor: str, path: Path = BASELINES_PATH, out: str | Path | None = BASELINES_OUT):
+        self.vendor = vendor
+        self.path = path
+        self.out = Path(out) if out else None
+        self.update = os.environ.get("BENCH_UPDATE_BASELINES") == "1"
+        self.data = json.loads(path.read_text()) if path.exists() else {}
+        self.results: list[BenchResult] = []
+
+    def check(self, result: BenchResult) -> list[str]:
+        """Список регрессий относительно эталона (пустой, если их нет)"""
+        self.results.append(result)
+        baseline = self.data.get(self.vendor, {}).get(result.name)
+        if self.update or baseline is None:
+            return []
+
+        problems = []
+        if result.queries > baseline["queries"]:
+            problems.append(f"запросов {result.queries} > {baseline['queries']}")
+
+        for field, tolerance in (("p50_ms", LATENCY_TOLERANCE), ("p95_ms", 2 * LATENCY_TOLERANCE)):
+            allowed = max(baseline[field] * (1 + tolerance), baseline[field] + LATENCY_SLACK_MS)
+            value = getattr(result, field)
+            if value > allowed:
+                problems.append(f"{field[:3]} {value} мс > {allowed:.2f} мс")
+
+        allowed_peak = baseline["peak_kb"] * (1 + MEMORY_TOLERANCE)
+        if result.peak_kb > allowed_peak:
+            problems.append(f"пик памяти {result.peak_kb} КБ > {allowed_peak:.0f} КБ")
+        return problems
+
+    def save(self) -> None:
+        """
+        Записывает эталоны в out, если он задан: новые замеры добавляются всегда,
+        существующие перезаписываются при включенном обновлении
+        """
+        if self.out is None:
+            return
+        vendor_data = self.data.setdefault(self.vendor, {})
+        for result in self.results:
+            if self.update or result.name not in vendor_data:
+                vendor_data[result.name] = result.as_baseline()
+        self.out.write_text(json.dumps(self.data, indent=2, ensure_ascii=False, sort_keys=True) + "\n")
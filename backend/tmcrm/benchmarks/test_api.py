@@ -0,0 +1,55 @@
+import pytest
+from analisys.cache import invalidate_analytics_cache
+from lesson_schedule.models import PeriodLesson
+
+pytestmark = pytest.mark.django_db
+
+# Месяц в середине сгенерированного периода
+PERIOD = "start_date=2025-02-01&end_date=2025-02-28"
+
+GET_CASES = [
+    ("lessons_list", f"/api/schedule/lessons/?{PERIOD}"),
+    ("lessons_list_page", f"/api/schedule/lessons/?{PERIOD}&page_size=100"),
+    ("lessons_list_stream", f"/api/schedule/lessons/?{PERIOD}&stream=true"),
+    ("lessons_by_teachers", f"/api/schedule/lessons/by-teachers/?{PERIOD}"),
+    ("lessons_by_groups", f"/api/schedule/lessons/by-groups/?{PERIOD}"),
+    ("lessons_by_classrooms", f"/api/schedule/lessons/by-classrooms/?{PERIOD}"),
+    ("attendances_list", f"/api/schedule/attendances/?{PERIOD}"),
+    ("metrics_attendance", f"/api/analisys/metrics/attendance/?{PERIOD}"),
+    ("metrics_grade", f"/api/analisys/metrics/grade/?{PERIOD}"),
+    ("metrics_worked_hours", f"/api/analisys/metrics/worked_hours/?{PERIOD}"),
+    ("metrics_students_count", "/api/analisys/metrics/students_count/"),
+    ("charts_grades", f"/api/analisys/charts/grades/?{PERIOD}"),
+    ("charts_attendance", f"/api/analisys/charts/attendance/?{PERIOD}"),
+    ("charts_worked_hours", f"/api/analisys/charts/worked_hours/?{PERIOD}"),
+]
+
+SEARCH_CASES = [
+    ("search_students", "/api/students/students/search/", "Иван"),
+    ("search_groups", "/api/students/student_groups/search/", "bench_0-1"),
+]
+
+
+# Ответы аналитики кэшируются: перед каждым замером версия данных организации
+# меняется, чтобы замерялся расчет, а не чтение из кэша
+UNCACHED_PREFIXES = ("metrics_", "charts_")
+
+
+@pytest.mark.parametrize("name,url", GET_CASES, ids=[name for name, _ in GET_CASES])
+def test_get(bench, api_client, org, name, url):
+    before = (lambda: invalidate_analytics_cache([org.pk])) if name.startswith(UNCACHED_PREFIXES) else None
+    bench(name, lambda: api_client.get(url), before=before)
+
+
+@pytest.mark.parametrize("name,url,query", SEARCH_CASES, ids=[name for name, *_ in SEARCH_CASES])
+def test_search(bench, api_client, name, url, query):
+    bench(name, lambda: api_client.post(url, {"query": query}, format="json"))
+
+
+def test_period_lesson_edit(bench, api_client, org):
+    """Изменение расписания переносится на все его незавершенные занятия"""
+    period_lesson = PeriodLesson.objects.filter(org=org).order_by("pk").first()
+    url = f"/api/schedule/period_lessons/{period_lesson.pk}/"
+    titles = iter(range(1_000_000))
+
+    bench("period_lesson_edit", lambda: api_client.patch(url, {"title": f"Занятие {next(titles)}"}, format="json"))
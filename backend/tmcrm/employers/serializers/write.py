@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from mainapp.serializers import BaseWriteSerializer
 from employers.models import Department, Teacher, Employer, Leave, TeacherNote
 from mainapp.models import TeacherProfile
@@ -10,7 +11,11 @@ class EmployerWriteSerializer(BaseWriteSerializer):
 
 
 class TeacherWriteSerializer(BaseWriteSerializer):
-    employer = serializers.PrimaryKeyRelatedField(queryset=Employer.objects.all())
+    # Поле объявлено явно, поэтому проверку OneToOne нужно указать самим
+    employer = serializers.PrimaryKeyRelatedField(
+        queryset=Employer.objects.all(),
+        validators=[UniqueValidator(queryset=Teacher.objects.all())],
+    )
 
     class Meta(BaseWriteSerializer.Meta):
         model = Teacher
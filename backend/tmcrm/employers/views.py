@@ -10,13 +10,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .permissions import IsTeacherProfile
 from mainapp.models import TeacherProfile
+from search.mixins import AutocompleteMixin
 
 
-class TeacherViewset(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
+class TeacherViewset(AutocompleteMixin, SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
     select_related_fields = []
     queryset = Teacher.objects.all()
     read_serializer_class = TeacherReadSerializer
     write_serializer_class = TeacherWriteSerializer
+    autocomplete_source = "teacher"
 
 
 class EmployerViewSet(BaseViewSetWithOrdByOrg):
@@ -0,0 +1,206 @@
+from __future__ import annotations
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, time
+from itertools import accumulate
+from typing import Iterable, NamedTuple, TYPE_CHECKING
+from django.db.models import Q
+from .models import PeriodLesson
+from .utils import LessonSlot, build_virtual_lessons
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+    from .models import Lesson
+
+
+RESOURCES = ("teacher", "classroom", "group")
+
+
+class CandidateSlot(NamedTuple):
+    """Слот, который планируется занять уроком"""
+    date: date
+    start_time: time
+    end_time: time
+    teacher_id: int | None = None
+    classroom_id: int | None = None
+    group_id: int | None = None
+
+    def resources(self) -> list[tuple[str, int]]:
+        return [
+            (resource, resource_id)
+            for resource in RESOURCES
+            if (resource_id := getattr(self, f"{resource}_id")) is not None
+        ]
+
+
+class Conflict(NamedTuple):
+    """
+    Пересечение слота-кандидата с существующим уроком.
+    Занятие виртуального расписания не сохранено, у него lesson_id = -id расписания
+    """
+    date: date
+    resource: str
+    resource_id: int
+    lesson_id: int
+    start_time: time
+    end_time: time
+
+    def as_dict(self) -> dict:
+        data = {
+            "date": self.date.isoformat(),
+            "resource": self.resource,
+            "resource_id": self.resource_id,
+            "lesson_id": self.lesson_id,
+            "time": f"{self.start_time} - {self.end_time}",
+        }
+        if self.lesson_id < 0:
+            data.update(lesson_id=None, period_schedule_id=-self.lesson_id)
+        return data
+
+
+class _IntervalList:
+    """
+    Отсортированный по началу список интервалов одного ресурса за один день.
+
+    Хранит префиксный максимум концов интервалов, поэтому поиск всех
+    пересечений занимает O(log M + k), где k - количество найденных пересечений.
+    """
+
+    __slots__ = ("starts", "intervals", "max_ends")
+
+    def __init__(self, intervals: list[tuple[time, time, int]]):
+        self.intervals = sorted(intervals)
+        self.starts = [start for start, _, _ in self.intervals]
+        self.max_ends = list(accumulate((end for _, end, _ in self.intervals), max))
+
+    def overlapping(self, start_time: time, end_time: time) -> list[tuple[time, time, int]]:
+        # Кандидаты - интервалы, начинающиеся раньше конца нового слота
+        idx = bisect_left(self.starts, end_time) - 1
+        found = []
+        while idx >= 0 and self.max_ends[idx] > start_time:
+            interval = self.intervals[idx]
+            if interval[1] > start_time:
+                found.append(interval)
+            idx -= 1
+        found.reverse()
+        return found
+
+
+class LessonConflictEngine:
+    """
+    Движок проверки пересечений уроков.
+
+    Загружает одним запросом все уроки нужных преподавателей, аудиторий и групп
+    за весь диапазон дат, раскладывает их по ресурсам и дням в отсортированные
+    списки интервалов и отвечает на вопрос "пересекается ли набор из N слотов"
+    за O(N log M). Занятия виртуальных расписаний не хранятся в базе, поэтому
+    вычисляются по расписаниям тех же ресурсов (еще два запроса) и тоже занимают время.
+
+    Пример:
+        engine = LessonConflictEngine.for_slots(Lesson.objects.all(), slots, exclude_pks=[lesson.pk])
+        conflicts = engine.find_conflicts(slots)
+    """
+
+    def __init__(self, rows: Iterable[tuple] = ()):
+        """
+        rows - кортежи (id, date, start_time, end_time, teacher_id, classroom_id, group_id)
+        """
+        grouped: dict[tuple[str, int, date], list] = defaultdict(list)
+        for lesson_id, lesson_date, start_time, end_time, *resource_ids in rows:
+            if start_time is None or end_time is None or start_time >= end_time:
+                continue
+            for resource, resource_id in zip(RESOURCES, resource_ids):
+                if resource_id is not None:
+                    grouped[(resource, resource_id, lesson_date)].append(
+                        (start_time, end_time, lesson_id)
+                    )
+
+        self._index = {key: _IntervalList(intervals) for key, intervals in grouped.items()}
+
+    @classmethod
+    def for_slots(
+        cls,
+        queryset: "QuerySet[Lesson]",
+        slots: list[CandidateSlot],
+        exclude_pks: Iterable[int] = (),
+        exclude_period_pks: Iterable[int] = (),
+    ) -> "LessonConflictEngine":
+        """
+        Строит движок по урокам, которые могут пересечься с переданными слотами.
+        exclude_period_pks - виртуальные расписания, чьи занятия не учитываются
+        (например, проверяется изменение самого расписания)
+        """
+        if not slots:
+            return cls()
+
+        resource_q = Q()
+        for resource in RESOURCES:
+            ids = {
+                resource_id
+                for slot in slots
+                if (resource_id := getattr(slot, f"{resource}_id")) is not None
+            }
+            if ids:
+                resource_q |= Q(**{f"{resource}_id__in": ids})
+
+        if not resource_q:
+            return cls()
+
+        start, end = min(slot.date for slot in slots), max(slot.date for slot in slots)
+        rows = list(
+            queryset.filter(resource_q, date__range=(start, end))
+            .exclude(pk__in=list(exclude_pks))
+            .order_by()
+            .values_list(
+                "id", "date", "start_time", "end_time",
+                "teacher_id", "classroom_id", "group_id",
+            )
+        )
+
+        period_lessons = (
+            PeriodLesson.objects.filter(resource_q, is_virtual=True, start_date__lte=end)
+            .filter(Q(repeat_lessons_until_date__isnull=True) | Q(repeat_lessons_until_date__gte=start))
+            .exclude(pk__in=list(exclude_period_pks))
+        )
+        # Даты с сохраненным занятием расписания пропускаются: оно уже в rows
+        rows.extend(
+            (
+                -lesson.period_schedule_id, lesson.date, lesson.start_time, lesson.end_time,
+                lesson.teacher_id, lesson.classroom_id, lesson.group_id,
+            )
+            for lesson in build_virtual_lessons(period_lessons, start, end)
+        )
+        return cls(rows)
+
+    def find_conflicts(self, slots: Iterable[CandidateSlot]) -> list[Conflict]:
+        """Возвращает все пересечения слотов с загруженными уроками"""
+        conflicts = []
+        for slot in slots:
+            for resource, resource_id in slot.resources():
+                intervals = self._index.get((resource, resource_id, slot.date))
+                if intervals is None:
+                    continue
+                conflicts.extend(
+                    Conflict(slot.date, resource, resource_id, lesson_id, start, end)
+                    for start, end, lesson_id in intervals.overlapping(
+                        slot.start_time, slot.end_time
+                    )
+                )
+        return conflicts
+
+    def busy_slots(self, slot: CandidateSlot) -> list[LessonSlot]:
+        """Занятые интервалы ресурсов слота в его день (без дублей одного урока)"""
+        seen = {}
+        for resource, resource_id in slot.resources():
+            intervals = self._index.get((resource, resource_id, slot.date))
+            if intervals is None:
+                continue
+            for start, end, lesson_id in intervals.intervals:
+                seen[lesson_id] = (start, end)
+        return [LessonSlot(start, end) for start, end in sorted(seen.values())]
+
+    def free_slots(self, slot: CandidateSlot) -> list[str]:
+        return [
+            f"{start} - {end}"
+            for start, end in LessonSlot.find_free_slots_at_day(self.busy_slots(slot))
+        ]
@@ -1,5 +1,5 @@
 import django_filters
-from lesson_schedule.models import Attendance, Grade, Lesson
+from lesson_schedule.models import Attendance, Grade, Lesson, PeriodLesson
 from students.models import Student, StudentsSnapshot, StudentGroup
 from mainapp.filters import DateRangeMixin
 
@@ -9,3 +9,11 @@ class LessonFilter(DateRangeMixin, django_filters.FilterSet):
     class Meta:
         model = Lesson
         exclude = ["duration"]
+
+
+class PeriodLessonFilter(django_filters.FilterSet):
+    """Фильтр виртуальных занятий по полям, общим с Lesson"""
+
+    class Meta:
+        model = PeriodLesson
+        fields = ["teacher", "classroom", "group", "subject", "start_time", "end_time"]
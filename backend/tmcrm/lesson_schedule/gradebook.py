@@ -0,0 +1,104 @@
+"""
+Журнал группы: матрица ученики x занятия за период.
+
+Ячейки упакованы в строки по одному символу на пару (ученик, занятие),
+строки матрицы - ученики, столбцы - занятия, ячейка (i, j) имеет индекс
+i * len(lessons) + j. Оценка - цифра или "-", посещение - "1", "0" или "-".
+Журнал 30 x 120 занимает несколько КБ. В журнал попадают записи организации
+пользователя и записи без организации - как и в остальных представлениях.
+Ответ кэшируется по группе, периоду и версиям данных этих двух областей
+(analisys.cache), которые меняются при любом изменении занятий, посещений,
+оценок и учеников. Группа без организации поэтому тоже видит оценки,
+выставленные под организацией пользователя.
+"""
+from __future__ import annotations
+import hashlib
+from datetime import date
+from django.core.cache import cache
+from django.db.models import Q
+from analisys.cache import get_orgs_data_versions
+from students.models import Student, StudentGroup
+from .models import Attendance, Grade, Lesson
+
+
+GRADEBOOK_CACHE_KEY = "lesson_schedule:gradebook"
+GRADEBOOK_CACHE_TIMEOUT = 60 * 10
+EMPTY_CELL = "-"
+
+
+def get_gradebook_key(group: StudentGroup, start: date, end: date, org_id) -> str:
+    """Ключ журнала для пользователя организации org_id (None - пользователь без организации)"""
+    versions = get_orgs_data_versions((org_id, None))
+    raw_key = repr((group.pk, start.isoformat(), end.isoformat(), org_id, versions))
+    return f"{GRADEBOOK_CACHE_KEY}:{hashlib.sha1(raw_key.encode()).hexdigest()}"
+
+
+def _visible(org_id) -> Q:
+    return Q(org_id=org_id) | Q(org__isnull=True)
+
+
+def _student_label(surname, name) -> str:
+    return f"{surname} {name}"
+
+
+def build_gradebook(group: StudentGroup, start: date, end: date, org_id) -> dict:
+    """
+    Матрица журнала: состав группы и занятия периода - два простых запроса,
+    ячейки - по запросу на оценки и посещения этих занятий
+    """
+    students = list(
+        StudentGroup.students.through.objects.filter(studentgroup_id=group.pk)
+        .order_by("student__surname", "student__name", "student_id")
+        .values_list("student_id", "student__surname", "student__name")
+    )
+    lessons = list(
+        Lesson.objects.filter(_visible(org_id), group=group, date__range=(start, end))
+        .order_by("date", "start_time", "id")
+        .values_list("id", "date")
+    )
+    lesson_ids = [lesson_id for lesson_id, _ in lessons]
+    grades = Grade.objects.filter(_visible(org_id), value__isnull=False, lesson_id__in=lesson_ids)
+    presence = Attendance.objects.filter(_visible(org_id), lesson_id__in=lesson_ids)
+    grades = grades.values_list("student_id", "lesson_id", "value")
+    presence = presence.values_list("student_id", "lesson_id", "was_present")
+    grades, presence = list(grades), list(presence)
+
+    # Ученики, которые уже вышли из группы, но имеют записи за период, - в конце
+    known = {student_id for student_id, *_ in students}
+    former = {student_id for student_id, *_ in (*grades, *presence)} - known
+    if former:
+        students += list(
+            Student.objects.filter(pk__in=former).order_by("surname", "name", "pk").values_list("pk", "surname", "name")
+        )
+
+    rows = {student_id: i for i, (student_id, *_) in enumerate(students)}
+    columns = {lesson_id: j for j, (lesson_id, _) in enumerate(lessons)}
+    width = len(lessons)
+    grade_cells = [EMPTY_CELL] * (len(students) * width)
+    presence_cells = [EMPTY_CELL] * (len(students) * width)
+    for student_id, lesson_id, value in grades:
+        grade_cells[rows[student_id] * width + columns[lesson_id]] = str(value)
+    for student_id, lesson_id, was_present in presence:
+        presence_cells[rows[student_id] * width + columns[lesson_id]] = "1" if was_present else "0"
+
+    return {
+        "group": group.pk,
+        "start_date": start,
+        "end_date": end,
+        "students": [student_id for student_id, *_ in students],
+        "student_names": [_student_label(surname, name) for _, surname, name in students],
+        "lessons": [lesson_id for lesson_id, _ in lessons],
+        "dates": [lesson_date for _, lesson_date in lessons],
+        "grades": "".join(grade_cells),
+        "presence": "".join(presence_cells),
+    }
+
+
+def get_gradebook(group: StudentGroup, start: date, end: date, org_id, key: str | None = None) -> dict:
+    """Журнал из кэша или построенный заново. key - уже посчитанный get_gradebook_key"""
+    key = key or get_gradebook_key(group, start, end, org_id)
+    gradebook = cache.get(key)
+    if gradebook is None:
+        gradebook = build_gradebook(group, start, end, org_id)
+        cache.set(key, gradebook, timeout=GRADEBOOK_CACHE_TIMEOUT)
+    return gradebook
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson_schedule', '0003_alter_lesson_table_alter_periodlesson_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
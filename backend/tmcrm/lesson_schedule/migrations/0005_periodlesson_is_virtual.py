@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson_schedule', '0004_lesson_completed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='periodlesson',
+            name='is_virtual',
+            field=models.BooleanField(default=False, help_text='Занятия не создаются заранее, а вычисляются по правилу повторения'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:25
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def set_materialized_until(apps, schema_editor):
+    # Занятия существующих расписаний уже созданы целиком до даты последнего занятия
+    PeriodLesson = apps.get_model('lesson_schedule', 'PeriodLesson')
+    Lesson = apps.get_model('lesson_schedule', 'Lesson')
+    last_lesson_date = (
+        Lesson.objects.filter(period_schedule=OuterRef('pk'))
+        .order_by()
+        .values('period_schedule')
+        .annotate(last_date=Max('date'))
+        .values('last_date')
+    )
+    PeriodLesson.objects.filter(is_virtual=False).update(
+        materialized_until=Subquery(last_lesson_date)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson_schedule', '0005_periodlesson_is_virtual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='periodlesson',
+            name='materialized_until',
+            field=models.DateField(blank=True, editable=False, help_text='Дата, до которой занятия расписания уже созданы', null=True),
+        ),
+        migrations.RunPython(set_materialized_until, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:40
+
+from django.db import migrations
+from django.db.models import Exists, OuterRef, Q
+
+
+def remove_duplicate_attendances(apps, schema_editor):
+    # Перед уникальным ограничением (lesson, student) остается одна запись на пару:
+    # с отметкой о присутствии, если она есть, иначе самая поздняя
+    Attendance = apps.get_model('lesson_schedule', 'Attendance')
+    better = Attendance.objects.filter(
+        Q(was_present__gt=OuterRef('was_present'))
+        | Q(was_present=OuterRef('was_present'), id__gt=OuterRef('id')),
+        lesson_id=OuterRef('lesson_id'),
+        student_id=OuterRef('student_id'),
+    )
+    Attendance.objects.filter(Exists(better)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lesson_schedule', '0006_periodlesson_materialized_until'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendances, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,13 @@
 from __future__ import annotations
-from typing import Literal
-from django.db.models import Q
+from copy import copy
+from typing import Any, Literal
 from django.db.models import QuerySet
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 from mainapp.serializers import BaseSerializerExcludeFields
-from lesson_schedule.models import Lesson
-from lesson_schedule.utils import LessonSlot
+from lesson_schedule.models import Lesson, PeriodLesson
+from lesson_schedule.conflicts import CandidateSlot, Conflict, LessonConflictEngine
+from lesson_schedule.utils import iter_period_dates
 
 
 class SerializerUpdateMixin:
@@ -72,7 +74,8 @@ class LessonValidationMixin:
             serializer: Сериализатор, содержащий валидированные данные и экземпляр урока.
 
         Возвращает:
-            Словарь с полями: start_time, end_time, teacher, classroom, group.
+            Словарь с полями: start_time, end_time, teacher, classroom, group, date.
+            У периодического расписания нет поля date, для него date будет None.
         """
         instance = serializer.instance
         new_data = serializer.validated_data
@@ -83,9 +86,41 @@ class LessonValidationMixin:
             "teacher": new_data.get("teacher", instance.teacher),
             "classroom": new_data.get("classroom", instance.classroom),
             "group": new_data.get("group", instance.group),
-            "date": new_data.get("date", instance.date)
+            "date": new_data.get("date", getattr(instance, "date", None)),
         }
 
+    @staticmethod
+    def _build_slot(*, date, start_time, end_time, teacher, classroom, group) -> CandidateSlot:
+        return CandidateSlot(
+            date=date,
+            start_time=start_time,
+            end_time=end_time,
+            teacher_id=getattr(teacher, "pk", None),
+            classroom_id=getattr(classroom, "pk", None),
+            group_id=getattr(group, "pk", None),
+        )
+
+    def _check_slots(
+        self, slots: list[CandidateSlot], exclude_pks=(), exclude_period_pks=()
+    ) -> tuple[LessonConflictEngine, list[Conflict]]:
+        """Проверяет все слоты разом: один запрос к базе на весь диапазон дат"""
+        engine = LessonConflictEngine.for_slots(
+            self.get_lessons_queryset(),
+            slots,
+            exclude_pks=exclude_pks,
+            exclude_period_pks=exclude_period_pks,
+        )
+        return engine, engine.find_conflicts(slots)
+
+    def _raise_alone_lesson_conflict(self, engine, slot, conflicts):
+        raise ValidationError({
+            "detail": "Невозможно обновить время урока на заданное время",
+            "free_slots": engine.free_slots(slot),
+            "lesson_list": [str(lesson) for lesson in engine.busy_slots(slot)],
+            "current_date": slot.date.isoformat(),
+            "conflicts": [conflict.as_dict() for conflict in conflicts],
+        })
+
     def can_create_alone_lesson_by_fields(
         self,
         *,
@@ -96,29 +131,15 @@ class LessonValidationMixin:
         classroom,
         group,
     ) -> Literal[True]:
-
-        all_lessons_at_day = (
-            self.get_lessons_queryset()
-            .filter(date=date)
-            .filter(Q(teacher=teacher) | Q(classroom=classroom) | Q(group=group))
+        slot = self._build_slot(
+            date=date, start_time=start_time, end_time=end_time,
+            teacher=teacher, classroom=classroom, group=group,
         )
+        engine, conflicts = self._check_slots([slot])
 
-        lesson_list = [
-            LessonSlot(lesson.start_time, lesson.end_time)
-            for lesson in all_lessons_at_day
-        ]
-        current_lesson = LessonSlot(start_time, end_time)
-
-        if LessonSlot.can_add_lesson(lesson_list, current_lesson):
+        if not conflicts:
             return True
-        else:
-            slots = LessonSlot.find_free_slots_at_day(lesson_list)
-            raise ValidationError({
-                "detail": "Невозможно обновить время урока на заданное время",
-                "free_slots": [f"{s[0]} - {s[1]}" for s in slots],
-                "lesson_list": [str(lesson) for lesson in lesson_list],
-                "current_date": date.isoformat(),
-            })
+        self._raise_alone_lesson_conflict(engine, slot, conflicts)
 
     def can_update_alone_lesson_by_fields(
         self,
@@ -133,35 +154,20 @@ class LessonValidationMixin:
     ) -> Literal[True]:
         """
         Проверяет, можно ли обновить указанный урок с заданными параметрами без пересечения с другими уроками.
-        Метод ищет все уроки на тот же день, где учитель, аудитория или группа совпадают с переданными параметрами,
-        исключая текущий урок. Затем он проверяет, не пересекается ли заданное время с другими занятиями.
+        Ищет уроки на тот же день, где учитель, аудитория или группа совпадают с переданными параметрами,
+        исключая текущий урок.
         Если пересечений нет — возвращает True.
         Если пересечения есть — возбуждает ValidationError с информацией о свободных слотах и текущем дне.
         """
-        all_lessons_at_day: QuerySet[Lesson] = (
-            self.get_lessons_queryset()
-            .filter(date=date)
-            .filter(Q(teacher=teacher) | Q(classroom=classroom) | Q(group=group))
-            .exclude(pk=instance.pk)
+        slot = self._build_slot(
+            date=date, start_time=start_time, end_time=end_time,
+            teacher=teacher, classroom=classroom, group=group,
         )
+        engine, conflicts = self._check_slots([slot], exclude_pks=[instance.pk])
 
-        lesson_list = [
-            LessonSlot(lesson.start_time, lesson.end_time)
-            for lesson in all_lessons_at_day
-        ]
-
-        current_lesson = LessonSlot(start_time, end_time)
-
-        if LessonSlot.can_add_lesson(lesson_list, current_lesson):
+        if not conflicts:
             return True
-        else:
-            slots = LessonSlot.find_free_slots_at_day(lesson_list)
-            raise ValidationError({
-                "detail": "Невозможно обновить время урока на заданное время",
-                "free_slots": [f"{s[0]} - {s[1]}" for s in slots],
-                "lesson_list": [str(lesson) for lesson in lesson_list],
-                "current_date": date.isoformat(),
-            })
+        self._raise_alone_lesson_conflict(engine, slot, conflicts)
 
     def can_create_alone_lesson(
         self, serializer: BaseSerializerExcludeFields, is_force_create
@@ -181,21 +187,90 @@ class LessonValidationMixin:
             return True
 
         fields = self._extract_lesson_fields(serializer=serializer)
-        lesson = serializer.instance
-        return self.can_update_alone_lesson_by_fields(
-            lesson, date=lesson.date, **fields
+        return self.can_update_alone_lesson_by_fields(serializer.instance, **fields)
+
+    def can_materialize_period_lesson(
+        self, period_lesson: PeriodLesson, lesson_date, is_force_create=False
+    ) -> Literal[True]:
+        """
+        Проверяет, что занятие расписания на дату можно сохранить.
+        Если занятие уже сохранено, проверять нечего: materialize вернет его.
+        Собственное виртуальное занятие расписания на эту дату не считается пересечением.
+        """
+        if is_force_create or Lesson.objects.filter(
+            period_schedule=period_lesson, date=lesson_date
+        ).exists():
+            return True
+
+        slot = self._build_slot(
+            date=lesson_date,
+            start_time=period_lesson.start_time,
+            end_time=period_lesson.end_time,
+            teacher=period_lesson.teacher,
+            classroom=period_lesson.classroom,
+            group=period_lesson.group,
         )
+        engine, conflicts = self._check_slots([slot], exclude_period_pks=[period_lesson.pk])
+
+        if not conflicts:
+            return True
+        self._raise_alone_lesson_conflict(engine, slot, conflicts)
 
     def can_update_period_lesson(
         self, serializer: BaseSerializerExcludeFields, is_force_update=False
     ):
+        """
+        Проверяет все будущие уроки периодического расписания одним запросом.
+        Сохранена только часть занятий (до горизонта материализации, у виртуального
+        расписания - ни одного), поэтому проверяются все даты правила повторения
+        с новыми period, start_date и repeat_lessons_until_date начиная с сегодняшней.
+        При пересечениях возвращает все конфликты с датами и ресурсами,
+        а также свободные слоты по каждой конфликтной дате.
+        """
         if is_force_update:
             return True
 
-        all_lessons_to_update = self._get_related_lessons(serializer=serializer)
-
+        instance = serializer.instance
+        related_lessons = list(
+            self._get_related_lessons(serializer=serializer).values_list("pk", "date")
+        )
         fields = self._extract_lesson_fields(serializer=serializer)
-        for lesson in all_lessons_to_update:
-            self.can_update_alone_lesson_by_fields(lesson, date=lesson.date, **fields)
+        fields.pop("date")
+
+        candidate = copy(instance)
+        for field in ("period", "start_date", "repeat_lessons_until_date"):
+            if field in serializer.validated_data:
+                setattr(candidate, field, serializer.validated_data[field])
+
+        # Завершенные занятия расписания не меняются, их даты не проверяем
+        completed_dates = set(
+            self.get_lessons_queryset()
+            .filter(period_schedule=instance.pk, is_completed=True)
+            .values_list("date", flat=True)
+        )
+        dates = [
+            lesson_date
+            for lesson_date in iter_period_dates(candidate, timezone.localdate())
+            if lesson_date not in completed_dates
+        ]
+
+        slots = [self._build_slot(date=lesson_date, **fields) for lesson_date in dates]
+        engine, conflicts = self._check_slots(
+            slots,
+            exclude_pks=[pk for pk, _ in related_lessons],
+            exclude_period_pks=[instance.pk],
+        )
+
+        if not conflicts:
+            return True
 
-        return True
+        conflict_dates = {conflict.date for conflict in conflicts}
+        raise ValidationError({
+            "detail": "Невозможно обновить время уроков на заданное время",
+            "free_slots": {
+                slot.date.isoformat(): engine.free_slots(slot)
+                for slot in slots
+                if slot.date in conflict_dates
+            },
+            "conflicts": [conflict.as_dict() for conflict in conflicts],
+        })
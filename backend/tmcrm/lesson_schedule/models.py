@@ -116,6 +116,16 @@ class PeriodLesson(AbstrctLesson):
     period = models.PositiveSmallIntegerField(blank=True, null=True)
     repeat_lessons_until_date = models.DateField(blank=True, null=True)
     start_date = models.DateField(blank=True, null=True)
+    is_virtual = models.BooleanField(
+        default=False,
+        help_text="Занятия не создаются заранее, а вычисляются по правилу повторения",
+    )
+    materialized_until = models.DateField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Дата, до которой занятия расписания уже созданы",
+    )
 
     class Meta:
         db_table = "lesson_schedule_periodlesson"
@@ -129,6 +139,7 @@ class Lesson(AbstrctLesson):
     week_day = models.PositiveSmallIntegerField(blank=False)
     is_canceled = models.BooleanField(default=False, blank=True)
     is_completed = models.BooleanField(default=False, blank=True)
+    completed_at = models.DateTimeField(blank=True, null=True, editable=False)
 
     period_schedule = models.ForeignKey(
         PeriodLesson, on_delete=models.SET_NULL, blank=True, null=True
@@ -141,6 +152,34 @@ class Lesson(AbstrctLesson):
         verbose_name = "Занятие"
         verbose_name_plural = "Занятия"
         ordering = ["date", "start_time"]
+        indexes = [
+            # Списки и расписания организации за период
+            models.Index(fields=["org", "date", "start_time"], name="lesson_org_date_idx"),
+            # Расписание преподавателя/группы/аудитории и проверка пересечений в clean.
+            # Преподаватель, группа и аудитория принадлежат одной организации,
+            # поэтому org в эти индексы не входит
+            models.Index(fields=["teacher", "date", "start_time"], name="lesson_teacher_date_idx"),
+            models.Index(fields=["group", "date", "start_time"], name="lesson_group_date_idx"),
+            models.Index(fields=["classroom", "date", "start_time"], name="lesson_classroom_date_idx"),
+            # update_complete_lessons: незавершенные уроки организаций по дате и времени окончания
+            models.Index(
+                fields=["org", "date", "end_time"],
+                condition=models.Q(is_completed=False),
+                name="lesson_open_org_date_idx",
+            ),
+            # Обновление будущих занятий при изменении периодического расписания
+            models.Index(
+                fields=["period_schedule", "date"],
+                condition=models.Q(is_completed=False),
+                name="lesson_open_period_idx",
+            ),
+            # create_attendences_for_all_passes: уроки, завершенные после водяного знака
+            models.Index(
+                fields=["completed_at"],
+                condition=models.Q(is_completed=True),
+                name="lesson_completed_at_idx",
+            ),
+        ]
 
     @property   
     def calc_duration(self):
@@ -183,6 +222,11 @@ class Lesson(AbstrctLesson):
             self.week_day = self.date.isoweekday()
         if self.start_time and self.end_time:
             self.duration = self.calc_duration
+        # Момент завершения нужен фоновым задачам, которые обрабатывают только новые завершенные уроки
+        if self.is_completed and not self.completed_at:
+            self.completed_at = timezone.now()
+        elif not self.is_completed:
+            self.completed_at = None
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -202,6 +246,15 @@ class Attendance(BaseModelOrg):
     class Meta:
         verbose_name = "Посещение"
         verbose_name_plural = "Посещения"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["lesson", "student"], name="unique_lesson_student_attendance"
+            )
+        ]
+        indexes = [
+            # Аналитика посещаемости организации за период
+            models.Index(fields=["org", "lesson_date"], name="attendance_org_date_idx"),
+        ]
 
 
     def clean(self):
@@ -217,9 +270,6 @@ class Attendance(BaseModelOrg):
         return super().clean()
 
     def save(self, *args, **kwargs):
-        print(
-            f"[SAVE] lesson: {self.lesson}, lesson.date: {getattr(self.lesson, 'date', None)}"
-        )
         if not self.lesson_date:
             self.lesson_date = self.lesson.date
         super().save(*args, **kwargs)
@@ -253,6 +303,10 @@ class Grade(BaseModelOrg):
                 fields=["student", "lesson"], name="unique_student_lesson_grade"
             )
         ]
+        indexes = [
+            # Аналитика оценок организации за период
+            models.Index(fields=["org", "grade_date"], name="grade_org_date_idx"),
+        ]
 
     def __str__(self):
         return f"{self.value} оценка ученика {self.student.name} за {self.updated_at if self.updated_at else self.created_at}"
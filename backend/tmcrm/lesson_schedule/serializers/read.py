@@ -1,4 +1,10 @@
-from mainapp.serializers import BaseWriteSerializer, ColorSerializer, BaseReadSerializer
+from functools import cached_property
+from mainapp.serializers import (
+    BaseWriteSerializer,
+    ColorSerializer,
+    BaseReadSerializer,
+    PrefetchListSerializer,
+)
 from students.models import Student, StudentGroup
 from lesson_schedule.models import (
     Attendance,
@@ -12,6 +18,7 @@ from mainapp.models import SubjectColor
 from students.serializers.read import StudentGroupReadSerializer, StudentReadSerializer
 from employers.serializers.read import TeacherReadSerializer
 from rest_framework.serializers import SerializerMethodField
+from mainapp.fast_serializers import FastField
 
 
 class ClassroomReadSerializer(BaseReadSerializer):
@@ -28,6 +35,7 @@ class SubjectReadSerializer(BaseReadSerializer):
 
 
 class AttendanceReadSerializer(BaseReadSerializer):
+    fast_serialization = True
 
     class Meta(BaseReadSerializer.Meta):
         model = Attendance
@@ -48,12 +56,42 @@ class ScheduleReadSerializer(BaseReadSerializer):
     group = StudentGroupReadSerializer(exclude_fields=["students"])
     classroom = ClassroomReadSerializer()
     period_lesson = SerializerMethodField()
+    is_virtual = SerializerMethodField()
+
+    fast_serialization = True
+    fast_fields = {
+        "period_lesson": FastField(
+            ("period_schedule", "period_schedule__period"),
+            lambda pk, period: {} if pk is None else {"period": period},
+        ),
+        # Из базы приходят только сохраненные занятия
+        "is_virtual": FastField((), lambda: False),
+    }
 
     class Meta(BaseReadSerializer.Meta):
         model = Lesson
+        list_serializer_class = PrefetchListSerializer
+        list_prefetch_related = {
+            "teacher": ("teacher__employer",),
+            "subject": ("subject__color",),
+            "group": ("group",),
+            "classroom": ("classroom",),
+            "period_lesson": ("period_schedule",),
+        }
+
+    @cached_property
+    def period_lesson_serializer(self) -> PeriodScheduleReadSerializer:
+        # Один экземпляр на все строки списка, поля не пересоздаются для каждого занятия
+        return PeriodScheduleReadSerializer(un_exclude_fields=['period'])
 
     def get_period_lesson(self, obj: Lesson):
-        return PeriodScheduleReadSerializer(obj.period_schedule, un_exclude_fields=['period']).data
+        if obj.period_schedule is None:
+            return {}
+        return self.period_lesson_serializer.to_representation(obj.period_schedule)
+
+    def get_is_virtual(self, obj: Lesson) -> bool:
+        """Виртуальное занятие вычислено по расписанию и еще не сохранено в базе"""
+        return obj.pk is None
 
 
 class GradeReadSerializer(BaseReadSerializer):
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from employers.models import Teacher
 from students.models import Student, StudentGroup
 from lesson_schedule.models import (
+    GRADE_CHOICES,
     Attendance,
     Classroom,
     Lesson,
@@ -13,6 +14,12 @@ from mainapp.models import SubjectColor
 from mainapp.serializers import BaseWriteSerializer, ColorSerializer
 
 
+# Сколько учеников можно отметить одним запросом
+BULK_MARKS_MAX = 500
+# Сколько оценок можно выставить одним запросом (ведомость группы за четверть)
+BULK_GRADES_MAX = 5000
+
+
 class ClassroomWriteSerializer(BaseWriteSerializer):
 
     class Meta(BaseWriteSerializer.Meta):
@@ -35,6 +42,118 @@ class AttendanceWriteSerializer(BaseWriteSerializer):
         read_only_fields = ['lesson_date', ]
 
 
+class AttendanceMarkSerializer(serializers.Serializer):
+    student = serializers.IntegerField(min_value=1)
+    was_present = serializers.BooleanField()
+
+
+class AttendanceBulkWriteSerializer(serializers.Serializer):
+    """
+    Отметка посещений всего занятия: {"lesson": id, "attendances": [{"student": id, "was_present": bool}]}.
+    Ученики проверяются по составу группы занятия одним запросом.
+    Занятия, доступные пользователю, обязательно передаются в context["lessons"]
+    """
+    lesson = serializers.PrimaryKeyRelatedField(queryset=Lesson.objects.none())
+    attendances = AttendanceMarkSerializer(many=True, allow_empty=False, max_length=BULK_MARKS_MAX)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Без ограничения выборки занятие искалось бы среди всех организаций
+        if self.context.get("lessons") is None:
+            raise ValueError("Не переданы занятия пользователя: context['lessons']")
+        self.fields["lesson"].queryset = self.context["lessons"]
+
+    def validate_attendances(self, value):
+        student_ids = [mark["student"] for mark in value]
+        if len(set(student_ids)) != len(student_ids):
+            raise serializers.ValidationError("Ученик указан несколько раз.")
+        return value
+
+    def validate(self, attrs):
+        lesson = attrs["lesson"]
+        if lesson.group_id is None:
+            raise serializers.ValidationError({"lesson": "У занятия не указана группа."})
+
+        student_ids = {mark["student"] for mark in attrs["attendances"]}
+        roster = set(
+            StudentGroup.students.through.objects.filter(
+                studentgroup_id=lesson.group_id, student_id__in=student_ids
+            ).values_list("student_id", flat=True)
+        )
+        missing = sorted(student_ids - roster)
+        if missing:
+            raise serializers.ValidationError(
+                {"attendances": f"Ученики не состоят в группе занятия: {missing}"}
+            )
+        return attrs
+
+
+class GradeEntrySerializer(serializers.Serializer):
+    student = serializers.IntegerField(min_value=1)
+    lesson = serializers.IntegerField(min_value=1, required=False)
+    value = serializers.ChoiceField(choices=GRADE_CHOICES, allow_null=True)
+    # Без comment у существующей оценки остается прежний комментарий
+    comment = serializers.CharField(max_length=250, allow_blank=True, required=False)
+
+
+class GradeBulkWriteSerializer(serializers.Serializer):
+    """
+    Выставление оценок ведомостью: {"lesson": id, "grades": [{"student", "lesson", "value", "comment"}]}.
+    lesson верхнего уровня - занятие строк, где оно не указано.
+    Занятия и состав их групп проверяются двумя запросами на весь набор,
+    ошибки возвращаются по строкам: {"grades": [{}, {"student": [...]}, ...]}.
+    Занятия, доступные пользователю, обязательно передаются в context["lessons"]
+    """
+    lesson = serializers.IntegerField(min_value=1, required=False)
+    grades = GradeEntrySerializer(many=True, allow_empty=False, max_length=BULK_GRADES_MAX)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Без ограничения выборки занятия искались бы среди всех организаций
+        if self.context.get("lessons") is None:
+            raise ValueError("Не переданы занятия пользователя: context['lessons']")
+
+    def validate(self, attrs):
+        default_lesson = attrs.get("lesson")
+        rows = attrs["grades"]
+        errors = [{} for _ in rows]
+        for row, error in zip(rows, errors):
+            row.setdefault("lesson", default_lesson)
+            if row["lesson"] is None:
+                error["lesson"] = ["Не указано занятие."]
+
+        lesson_ids = {row["lesson"] for row in rows if row["lesson"] is not None}
+        lessons = {
+            lesson.pk: lesson
+            for lesson in self.context["lessons"].filter(pk__in=lesson_ids).only("id", "org_id", "date", "group_id")
+        }
+        roster = set(
+            StudentGroup.students.through.objects.filter(
+                studentgroup_id__in={lesson.group_id for lesson in lessons.values()},
+                student_id__in={row["student"] for row in rows},
+            ).values_list("studentgroup_id", "student_id")
+        )
+
+        seen = set()
+        for row, error in zip(rows, errors):
+            if error:
+                continue
+            lesson = lessons.get(row["lesson"])
+            if lesson is None:
+                error["lesson"] = ["Занятие не найдено."]
+            elif (lesson.group_id, row["student"]) not in roster:
+                error["student"] = ["Ученик не состоит в группе занятия."]
+            elif (row["lesson"], row["student"]) in seen:
+                error["student"] = ["Оценка ученика за занятие указана несколько раз."]
+            else:
+                seen.add((row["lesson"], row["student"]))
+                row["lesson"] = lesson
+
+        if any(errors):
+            raise serializers.ValidationError({"grades": errors})
+        return attrs
+
+
 class ScheduleWriteSerializer(BaseWriteSerializer):
     teacher = serializers.PrimaryKeyRelatedField(queryset=Teacher.objects.all())
     subject = serializers.PrimaryKeyRelatedField(queryset=Subject.objects.all())
@@ -2,61 +2,44 @@ from __future__ import annotations
 from lesson_schedule.models import Lesson, PeriodLesson
 from django.dispatch import receiver
 from django.db.models.signals import post_save, post_migrate, pre_save
-from datetime import timedelta
 from mainapp.utils import checkout_interval_schedule_table
 from .models import Attendance, Grade
+from django.utils import timezone
+from .utils import (
+    _period_lesson_data,
+    extend_materialized_lessons,
+    get_materialization_horizon,
+    lesson_days_changed,
+)
 
 
 @receiver(post_save, sender=PeriodLesson)
 def create_lessons_until_date(sender, created, instance, **kwargs):
-    if created:
-        org_settings = instance.org.settings
-        # Получаем дату продлеиня занятий если нет то берем эту дату из настроек
-        repeat_until = getattr(instance, 'repeat_lessons_until_date', None) 
-        if not repeat_until:
-            repeat_until = org_settings.repeat_lessons_until
-
-        period = instance.period
-        current_date = instance.start_date
-
-        # получение атрибутов экземпляра чтобы на его омнове создать другие
-        data = {f.name: getattr(instance, f.name) 
-                for f in instance._meta.fields 
-                if f.name not in ('date', 'created_by', 'id', 'period', 'repeat_lessons_until_date', 'start_date', 'title')}
-
-        if period:
-            lessons_to_create = []
-            # Цикл отвечает за создание списка, 
-            while current_date <= repeat_until:
-                new_lesson = Lesson(
-                    date=current_date,
-                    created_by=instance.created_by,
-                    week_day=current_date.isoweekday(),
-                    period_schedule=instance,
-                    **data
-                )
-                lessons_to_create.append(new_lesson)
-                current_date += timedelta(days=period)
+    if not created:
+        return
+    if not instance.period:
+        raise ValueError('не указана периодичность')
+    # Занятия виртуального расписания вычисляются при запросе и сохраняются по требованию
+    if instance.is_virtual:
+        return
 
-            Lesson.objects.bulk_create(lessons_to_create)
-        else:
-            raise ValueError('не указана периодичность')
+    # Синхронно создаются только занятия в пределах горизонта,
+    # дальше его продлевает ночная задача extend_lessons_horizon
+    today = timezone.localdate()
+    if instance.start_date and instance.start_date > today:
+        today = instance.start_date
+    extend_materialized_lessons([instance], get_materialization_horizon(today))
 
 
 @receiver(post_save, sender=PeriodLesson)
 def update_data_not_complete_lessons(sender, created, instance, **kwargs):
     if not created:
         lessons = Lesson.objects.filter(period_schedule=instance, is_completed=False)
-
-        data = {
-            f.name: getattr(instance, f.name)
-            for f in instance._meta.fields
-            if f.name not in ('date', 'created_by', 'id', 'period', 'repeat_lessons_until_date', 'start_date', 'title')
-            and getattr(instance, f.name) is not None
-        }
-        
-
+        data = _period_lesson_data(instance, skip_none=True)
+        days = set(lessons.order_by().values_list("org_id", "date").distinct())
         lessons.update(**data)
+        if days:
+            lesson_days_changed.send(sender=Lesson, days=days)
 
 
 @receiver(post_migrate)
@@ -65,9 +48,11 @@ def setup_periodic_tasks(sender, **kwargs):
     from .utils import (
         init_task_create_update_complete_lessons_task,
         init_task_create_attendences_for_all_passes,
+        init_task_extend_lessons_horizon,
     )
     init_task_create_update_complete_lessons_task()
     init_task_create_attendences_for_all_passes()
+    init_task_extend_lessons_horizon()
     
 
 
@@ -1,53 +1,143 @@
 # В файлах tasks располагаются фоновые процессы
 from celery import shared_task
-from mainapp.utils import get_org_local_datetime, get_cache, CacheType
-from mainapp.models import Organization 
+import pytz
+from django.conf import settings
 from django.db import transaction
-from .models import Lesson, Attendance
-from .utils import _get_complited_lessons_for_org, _create_missing_attendances_for_lesson
+from django.db.models import Count, F, Q
+from mainapp.metrics import track_task_rows
+from mainapp.utils import group_orgs_by_timezone
+from django.core.cache import cache
+from django.utils import timezone
+from .models import Lesson, PeriodLesson
+from .utils import (
+    _bulk_create_missing_attendances,
+    extend_materialized_lessons,
+    get_materialization_horizon,
+    MATERIALIZATION_BATCH_SIZE,
+    ATTENDANCE_BACKFILL_OVERLAP,
+    ATTENDANCE_BACKFILL_WATERMARK_KEY,
+)
 
 
 @shared_task
 def update_complete_lessons(orgs=None):
+    """
+    Помечает завершенными уроки, время окончания которых уже прошло
+    по локальному времени организации.
+
+    Организации группируются по часовому поясу: локальное время считается
+    один раз на пояс, и на каждый пояс выполняется один UPDATE с условием
+    (date < сегодня) OR (date = сегодня AND end_time <= сейчас).
+    Количество завершенных уроков сообщается по организациям: UPDATE ставит
+    всем строкам одно completed_at, по нему строки прогона и считаются.
+    """
     results = []
+    now = timezone.now()
 
+    orgs_by_timezone = group_orgs_by_timezone(orgs)
     if not orgs:
-        orgs: list[Organization] = get_cache("mainapp.Organization", cache_type=CacheType.MODEL)
+        orgs_by_timezone.setdefault(settings.TIME_ZONE, {})
+
+    for tz_name, org_names in orgs_by_timezone.items():
+        local_now = now.astimezone(pytz.timezone(tz_name))
+        current_date, current_time = local_now.date(), local_now.time()
 
-    for org in orgs:
-        current_time = get_org_local_datetime(org).time()
-        current_date = get_org_local_datetime(org).date()
-        print(f'\n{current_time}, {current_date}')
+        org_filter = Q(org_id__in=list(org_names))
+        # Уроки без организации завершаются по поясу сервера, как и раньше
+        if not orgs and tz_name == settings.TIME_ZONE:
+            org_filter |= Q(org__isnull=True)
 
-        lessons = Lesson.objects.filter_by_org(org=org).filter(
-            end_time__lte=current_time,
-            date__lte=current_date,
-            is_completed=False,
+        lessons = Lesson.objects.filter(org_filter, is_completed=False).filter(
+            Q(date__lt=current_date) | Q(date=current_date, end_time__lte=current_time)
         )
 
-        updated = lessons.update(is_completed=True)
-        if updated > 0:
-            results.append(f"{updated} урок(ов) обновлено для организации {org.name}")
+        # Считаются строки, обновленные этим UPDATE (completed_at=now): подсчет
+        # до него при READ COMMITTED мог бы разойтись с обновленными строками
+        if not lessons.update(is_completed=True, completed_at=now):
+            continue
+        updated_by_org = (
+            # is_completed - условие индекса lesson_completed_at_idx
+            Lesson.objects.filter(org_filter, is_completed=True, completed_at=now)
+            .order_by()
+            .values_list("org_id")
+            .annotate(count=Count("id"))
+        )
+        for org_id, updated in updated_by_org:
+            track_task_rows("update_complete_lessons", updated)
+            org_name = org_names.get(org_id, "без организации")
+            results.append(f"{updated} урок(ов) обновлено для организации {org_name}")
+
     return "\nРезультатов нет" if not results else results
 
 
 @shared_task
 def create_attendences_for_all_passes(orgs=None):
-    results = []
+    """
+    Создает записи о пропусках для учеников, не отмеченных на завершенных уроках.
+
+    Недостающие пары (ученик, урок) вычисляются одним запросом с anti-join
+    и вставляются пачками. Рассматриваются только уроки, завершенные после
+    предыдущего полного прогона (водяной знак хранится в кэше), поэтому
+    стоимость задачи зависит от количества новых уроков, а не от всей истории.
+    """
+    run_started_at = timezone.now()
+
+    lessons = Lesson.objects.filter(
+        is_canceled=False, is_completed=True, group__isnull=False
+    )
+    if orgs:
+        lessons = lessons.filter(org__in=orgs)
+
+    watermark = cache.get(ATTENDANCE_BACKFILL_WATERMARK_KEY)
+    if watermark:
+        lessons = lessons.filter(
+            completed_at__gte=watermark - ATTENDANCE_BACKFILL_OVERLAP
+        )
 
+    created = _bulk_create_missing_attendances(lessons)
+    track_task_rows("create_attendences_for_all_passes", created)
+
+    # Водяной знак сдвигается только после прогона по всем организациям
     if not orgs:
-        orgs: list[Organization] = get_cache("mainapp.Organization", cache_type=CacheType.MODEL)
+        cache.set(ATTENDANCE_BACKFILL_WATERMARK_KEY, run_started_at, timeout=None)
+
+    return "\nРезультатов нет" if not created else f"Создано {created} записей о пропусках"
 
-    for org in orgs:
-        lessons = _get_complited_lessons_for_org(org=org)
 
-        for lesson in lessons:
-            if not lesson.group:
-                continue
+@shared_task
+def extend_lessons_horizon():
+    """
+    Продлевает горизонт созданных занятий периодических расписаний.
 
-            attendances = _create_missing_attendances_for_lesson(lesson=lesson)
-            if len(attendances) > 0 :
-                Attendance.objects.bulk_create(attendances)
-                results.append({"lesson_id": lesson.id, "created": len(attendances)})
+    Каждое расписание хранит водяной знак materialized_until, поэтому за прогон
+    создаются только занятия между ним и новым горизонтом. Расписания
+    обрабатываются пачками по MATERIALIZATION_BATCH_SIZE, каждая пачка -
+    одна вставка занятий и одно обновление водяных знаков.
+    """
+    horizon = get_materialization_horizon()
 
-    return "\nРезультатов нет" if not results else results
+    period_lessons = (
+        PeriodLesson.objects.filter(
+            is_virtual=False, period__isnull=False, start_date__isnull=False
+        )
+        .filter(Q(materialized_until__isnull=True) | Q(materialized_until__lt=horizon))
+        # Расписания, у которых все занятия до своей даты окончания уже созданы
+        .exclude(materialized_until__gte=F("repeat_lessons_until_date"))
+        .order_by("pk")
+    )
+
+    created = 0
+    batch = []
+    for period_lesson in period_lessons.iterator(chunk_size=MATERIALIZATION_BATCH_SIZE):
+        batch.append(period_lesson)
+        if len(batch) >= MATERIALIZATION_BATCH_SIZE:
+            with transaction.atomic():
+                created += extend_materialized_lessons(batch, horizon)
+            batch = []
+
+    if batch:
+        with transaction.atomic():
+            created += extend_materialized_lessons(batch, horizon)
+
+    track_task_rows("extend_lessons_horizon", created)
+    return "\nРезультатов нет" if not created else f"Создано {created} занятий до {horizon}"
@@ -1,13 +1,23 @@
-from datetime import date, time
+from datetime import date, time, timedelta
+from unittest import mock, skipUnless
+from django.utils import timezone
+from django.db.models import Q
 from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
 from mainapp.tests import BaseSetupDB
 from students.models import Student, StudentGroup
-from lesson_schedule.models import Lesson, Classroom, Subject
-from .serializers.read import ScheduleReadSerializer
+from lesson_schedule.models import Lesson, Classroom, Subject, PeriodLesson, Attendance, Grade
+from rest_framework.renderers import JSONRenderer
+from mainapp.fast_serializers import get_fast_plan
+from mainapp.pagination import KeysetPagination
+from .serializers.read import ScheduleReadSerializer, AttendanceReadSerializer
+from .conflicts import CandidateSlot, LessonConflictEngine
+from .tasks import update_complete_lessons, extend_lessons_horizon
 
 
 
@@ -17,7 +27,7 @@ class TestChangeCriticalScheduleFields(BaseSetupDB):
         new_teacher = self.teacher1
         schedule = self.schedule2
 
-        url = f"/api/schedules/schedules/{schedule.id}/"
+        url = f"/api/schedule/lessons/{schedule.id}/"
         data = {"teacher": new_teacher.id}
 
 
@@ -37,7 +47,7 @@ class TestChangeCriticalScheduleFields(BaseSetupDB):
         new_classrom = self.classroom1
         schedule = self.schedule2
 
-        url = f"/api/schedules/schedules/{schedule.id}/"
+        url = f"/api/schedule/lessons/{schedule.id}/"
         data = {"classroom": new_classrom.id}
 
 
@@ -56,7 +66,7 @@ class TestChangeCriticalScheduleFields(BaseSetupDB):
         new_group = self.group1
         schedule = self.schedule2
 
-        url = f"/api/schedules/schedules/{schedule.id}/"
+        url = f"/api/schedule/lessons/{schedule.id}/"
         data = {"group": new_group.id}
 
         # access_token = self._get_access_token()
@@ -78,7 +88,7 @@ class TestMoveTimeOuts(BaseSetupDB):
     def test1(self):
         schedule1 = self.schedule1
         new_end_time = "14:00:00"
-        url = f"/api/schedules/schedules/{schedule1.id}/"
+        url = f"/api/schedule/lessons/{schedule1.id}/"
         data = {"end_time": new_end_time}
 
         response = self.client.patch(url, data, format="json")
@@ -95,7 +105,7 @@ class TestMoveTimeOuts(BaseSetupDB):
     def test2(self):
         schedule1 = self.schedule1
         new_end_time = "13:45:00"
-        url = f"/api/schedules/schedules/{schedule1.id}/"
+        url = f"/api/schedule/lessons/{schedule1.id}/"
         data = {"end_time": new_end_time}
 
 
@@ -120,7 +130,7 @@ class TestInsertSchedule(BaseSetupDB):
         serializer = ScheduleReadSerializer(schedule1)
         data = serializer.data
         data.pop("id", None)
-        url = f"/api/schedules/schedules/"
+        url = f"/api/schedule/lessons/"
 
         response = self.client.post(url, data, format="json")
         self.assertIn(
@@ -138,3 +148,608 @@ class TestDeleteSchedule(BaseSetupDB):
 
         schedule1_id = self.schedule1.id
         Lesson.objects.get(pk=schedule1_id).delete()
+
+
+class TestLessonConflictEngine(BaseSetupDB):
+
+    def _slot(self, start, end, **resources):
+        return CandidateSlot(
+            date=self.schedule1.date,
+            start_time=time.fromisoformat(start),
+            end_time=time.fromisoformat(end),
+            **resources,
+        )
+
+    def test_conflicts_for_all_slots_in_one_query(self):
+        slots = [
+            self._slot("12:30:00", "13:00:00", teacher_id=self.teacher1.id),
+            self._slot("13:55:00", "14:10:00", classroom_id=self.classroom2.id),
+            self._slot("15:00:00", "16:00:00", group_id=self.group1.id),
+        ]
+
+        # Уроки и виртуальные расписания тех же ресурсов
+        with self.assertNumQueries(2):
+            engine = LessonConflictEngine.for_slots(Lesson.objects.all(), slots)
+            conflicts = engine.find_conflicts(slots)
+
+        self.assertEqual(
+            [(c.resource, c.lesson_id) for c in conflicts],
+            [("teacher", self.schedule1.id), ("classroom", self.schedule2.id)],
+        )
+
+    def test_excluded_lesson_is_ignored(self):
+        slots = [self._slot("12:00:00", "13:45:00", teacher_id=self.teacher1.id)]
+
+        engine = LessonConflictEngine.for_slots(
+            Lesson.objects.all(), slots, exclude_pks=[self.schedule1.id]
+        )
+
+        self.assertEqual(engine.find_conflicts(slots), [])
+
+
+class TestUpdateCompleteLessons(BaseSetupDB):
+
+    def test_past_dates_are_completed_regardless_of_end_time(self):
+        today = timezone.now().date()
+        Lesson.objects.filter(pk=self.schedule1.pk).update(
+            date=today - timedelta(days=1), end_time=time(23, 59)
+        )
+        Lesson.objects.filter(pk=self.schedule2.pk).update(
+            date=today + timedelta(days=1), end_time=time(0, 1)
+        )
+
+        update_complete_lessons()
+
+        self.schedule1.refresh_from_db()
+        self.schedule2.refresh_from_db()
+        self.assertTrue(self.schedule1.is_completed)
+        self.assertIsNotNone(self.schedule1.completed_at)
+        self.assertFalse(self.schedule2.is_completed)
+
+    def test_result_by_org(self):
+        today = timezone.now().date()
+        Lesson.objects.update(date=today + timedelta(days=1))
+        Lesson.objects.filter(pk__in=[self.schedule1.pk, self.schedule2.pk]).update(date=today - timedelta(days=1))
+
+        result = update_complete_lessons()
+
+        self.assertEqual(result, [f"2 урок(ов) обновлено для организации {self.org.name}"])
+
+
+class TestAttendanceBackfill(BaseSetupDB):
+
+    def test_counts_only_inserted_rows(self):
+        from .utils import _insert_ignoring_conflicts
+
+        Attendance.objects.create(org=self.org, lesson=self.schedule1, student=self.student1, was_present=True)
+        inserted = _insert_ignoring_conflicts([
+            Attendance(org=self.org, lesson=self.schedule1, student=self.student1, lesson_date=self.schedule1.date),
+            Attendance(org=self.org, lesson=self.schedule2, student=self.student2, lesson_date=self.schedule2.date),
+        ])
+
+        self.assertEqual(inserted, 1)
+        self.assertTrue(Attendance.objects.get(lesson=self.schedule1, student=self.student1).was_present)
+        self.assertTrue(Attendance.objects.filter(lesson=self.schedule2, student=self.student2).exists())
+
+
+class TestVirtualPeriodLessons(BaseSetupDB):
+
+    def _create_period_lesson(self, **kwargs):
+        data = {
+            "org": self.org,
+            "created_by": self.user,
+            "title": "Virtual",
+            "teacher": self.teacher2,
+            "group": self.group2,
+            "classroom": self.classroom2,
+            "subject": self.subject,
+            "start_time": time(9),
+            "end_time": time(10),
+            "period": 7,
+            "start_date": date(2025, 9, 1),
+        }
+        return PeriodLesson.create_manager.create(**{**data, **kwargs})
+
+    def test_virtual_schedule_is_not_materialized(self):
+        period_lesson = self._create_period_lesson(is_virtual=True)
+
+        self.assertFalse(Lesson.objects.filter(period_schedule=period_lesson).exists())
+
+        response = self.client.get(
+            "/api/schedule/lessons/",
+            {"start_date": "2025-09-01", "end_date": "2025-09-14", "teacher": self.teacher2.id},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row["date"], row["is_virtual"]) for row in response.json()["results"]],
+            [("2025-09-01", True), ("2025-09-08", True)],
+        )
+
+    def test_virtual_occurrences_are_busy(self):
+        period_lesson = self._create_period_lesson(is_virtual=True)
+        slot = CandidateSlot(date(2025, 9, 8), time(9, 30), time(10, 30), teacher_id=self.teacher2.id)
+
+        conflicts = LessonConflictEngine.for_slots(Lesson.objects.all(), [slot]).find_conflicts([slot])
+
+        self.assertEqual(
+            [(c.resource, c.as_dict()["period_schedule_id"], c.as_dict()["lesson_id"]) for c in conflicts],
+            [("teacher", period_lesson.pk, None)],
+        )
+        self.assertEqual(
+            LessonConflictEngine.for_slots(
+                Lesson.objects.all(), [slot], exclude_period_pks=[period_lesson.pk]
+            ).find_conflicts([slot]),
+            [],
+        )
+
+    def test_materialize_checks_conflicts(self):
+        self._create_period_lesson(is_virtual=True)
+        other = self._create_period_lesson(
+            is_virtual=True, start_time=time(9, 30), end_time=time(10, 30)
+        )
+        url = f"/api/schedule/period_lessons/{other.pk}/materialize/"
+
+        response = self.client.post(url, {"date": "2025-09-08"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Lesson.objects.filter(period_schedule=other).exists())
+
+        response = self.client.post(f"{url}?is_force_create=true", {"date": "2025-09-08"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_virtual_schedule_update_checks_future_occurrences(self):
+        today = timezone.localdate()
+        self._create_period_lesson(
+            is_virtual=True, start_date=today, repeat_lessons_until_date=today + timedelta(weeks=4)
+        )
+        other = self._create_period_lesson(
+            is_virtual=True,
+            start_date=today + timedelta(weeks=2),
+            repeat_lessons_until_date=today + timedelta(weeks=4),
+            start_time=time(11),
+            end_time=time(12),
+        )
+
+        response = self.client.patch(
+            f"/api/schedule/period_lessons/{other.pk}/", {"start_time": "09:30:00"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            sorted(response.json()["free_slots"]),
+            [(today + timedelta(weeks=week)).isoformat() for week in (2, 3, 4)],
+        )
+
+    def test_schedule_crosses_year_boundary(self):
+        period_lesson = self._create_period_lesson(repeat_lessons_until_date=date(2026, 1, 12))
+
+        self.assertEqual(Lesson.objects.filter(period_schedule=period_lesson).count(), 20)
+
+
+class TestLessonsHorizon(BaseSetupDB):
+
+    def test_schedule_is_materialized_up_to_horizon(self):
+        today = timezone.localdate()
+        period_lesson = PeriodLesson.create_manager.create(
+            org=self.org,
+            created_by=self.user,
+            title="Horizon",
+            teacher=self.teacher2,
+            group=self.group2,
+            subject=self.subject,
+            start_time=time(9),
+            end_time=time(10),
+            period=7,
+            start_date=today,
+            repeat_lessons_until_date=today + timedelta(weeks=52),
+        )
+
+        with self.settings(LESSONS_MATERIALIZATION_HORIZON_WEEKS=4):
+            period_lesson.refresh_from_db()
+            self.assertEqual(period_lesson.materialized_until, today + timedelta(weeks=8))
+            created = Lesson.objects.filter(period_schedule=period_lesson).count()
+
+            # Горизонт уже покрыт, повторный прогон ничего не создает
+            extend_lessons_horizon()
+            self.assertEqual(
+                Lesson.objects.filter(period_schedule=period_lesson).count(), created
+            )
+
+        with self.settings(LESSONS_MATERIALIZATION_HORIZON_WEEKS=10):
+            extend_lessons_horizon()
+
+        period_lesson.refresh_from_db()
+        self.assertEqual(period_lesson.materialized_until, today + timedelta(weeks=10))
+        self.assertEqual(
+            Lesson.objects.filter(period_schedule=period_lesson).count(), created + 2
+        )
+
+    def test_update_checks_dates_beyond_horizon(self):
+        today = timezone.localdate()
+        period_lesson = PeriodLesson.create_manager.create(
+            org=self.org,
+            created_by=self.user,
+            title="Horizon",
+            teacher=self.teacher2,
+            group=self.group2,
+            subject=self.subject,
+            start_time=time(9),
+            end_time=time(10),
+            period=7,
+            start_date=today,
+            repeat_lessons_until_date=today + timedelta(weeks=16),
+        )
+        far_date = today + timedelta(weeks=12)
+        Lesson.objects.filter(pk=self.schedule1.pk).update(
+            date=far_date, teacher=self.teacher2, start_time=time(11), end_time=time(12)
+        )
+        self.assertFalse(Lesson.objects.filter(period_schedule=period_lesson, date=far_date).exists())
+
+        response = self.client.patch(
+            f"/api/schedule/period_lessons/{period_lesson.pk}/", {"end_time": "11:30:00"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(response.json()["free_slots"]), [far_date.isoformat()])
+
+
+class TestLessonsKeysetPagination(BaseSetupDB):
+
+    def test_pages_follow_full_list(self):
+        full = [row["id"] for row in self.client.get("/api/schedule/lessons/?legacy=true").json()]
+
+        paged = []
+        url = "/api/schedule/lessons/?page_size=1"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            paged += [row["id"] for row in response.json()["results"]]
+            url = response.json()["next"]
+
+        self.assertEqual(paged, full)
+
+    def test_pages_with_virtual_lessons(self):
+        for start_time in (time(12), time(12)):
+            PeriodLesson.create_manager.create(
+                org=self.org,
+                created_by=self.user,
+                title="Virtual",
+                teacher=self.teacher2,
+                start_time=start_time,
+                end_time=time(12, 30),
+                period=1,
+                start_date=date(2025, 8, 8),
+                is_virtual=True,
+            )
+        url = "/api/schedule/lessons/?start_date=2025-08-08&end_date=2025-08-10"
+        full = [(row["date"], row["start_time"], row["id"]) for row in self.client.get(f"{url}&legacy=true").json()]
+        self.assertEqual(len(full), 9)
+
+        paged = []
+        url += "&page_size=2"
+        while url:
+            response = self.client.get(url).json()
+            self.assertLessEqual(len(response["results"]), 2)
+            paged += [(row["date"], row["start_time"], row["id"]) for row in response["results"]]
+            url = response["next"]
+
+        self.assertEqual(paged, full)
+
+    def test_list_is_bounded_by_default(self):
+        with mock.patch.object(KeysetPagination, "page_size", 1):
+            response = self.client.get("/api/schedule/lessons/")
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertIsNotNone(response.json()["next"])
+
+        # Старый формат - массив, но тоже не больше max_page_size записей
+        with mock.patch.object(KeysetPagination, "max_page_size", 1):
+            response = self.client.get("/api/schedule/lessons/", {"legacy": "true"})
+        self.assertEqual(len(response.json()), 1)
+        self.assertIn('rel="next"', response["Link"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/schedule/lessons/", {"cursor": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestScheduleSerializerQueries(BaseSetupDB):
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            ScheduleReadSerializer(Lesson.objects.all(), many=True).data
+        return len(ctx.captured_queries)
+
+    def test_queries_do_not_depend_on_rows_count(self):
+        queries = self._count_queries()
+
+        for lesson in list(Lesson.objects.all()):
+            lesson.pk = None
+            lesson.date += timedelta(days=7)
+            lesson.save()
+
+        self.assertEqual(self._count_queries(), queries)
+
+
+class TestFastSerialization(BaseSetupDB):
+
+    def _assert_same_json(self, serializer_class, queryset):
+        plan = get_fast_plan(serializer_class)
+        self.assertIsNotNone(plan)
+
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(plan.serialize(queryset.all())),
+            renderer.render(serializer_class(queryset.all(), many=True).data),
+        )
+
+    def test_lessons(self):
+        self._assert_same_json(ScheduleReadSerializer, Lesson.objects.all())
+
+    def test_attendances(self):
+        for lesson in Lesson.objects.filter(group__isnull=False):
+            Attendance.objects.create(
+                org=self.org,
+                lesson=lesson,
+                student=lesson.group.students.first(),
+                lesson_date=lesson.date,
+            )
+
+        self._assert_same_json(AttendanceReadSerializer, Attendance.objects.all())
+
+
+class TestStreamingLessons(BaseSetupDB):
+
+    def test_stream_matches_regular_response(self):
+        response = self.client.get("/api/schedule/lessons/", {"legacy": "true"})
+        streamed = self.client.get("/api/schedule/lessons/", {"stream": "true"})
+
+        self.assertEqual(streamed.status_code, status.HTTP_200_OK)
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(b"".join(streamed.streaming_content), response.content)
+
+
+class TestGroupedSchedule(BaseSetupDB):
+
+    def test_grouped_by_teacher_pages(self):
+        full = self.client.get("/api/schedule/lessons/by-teachers/", {"legacy": "true"}).json()
+        self.assertEqual(
+            [group["teacher"]["id"] for group in full],
+            sorted({lesson.teacher_id for lesson in Lesson.objects.exclude(teacher=None)}),
+        )
+
+        response = self.client.get("/api/schedule/lessons/by-teachers/", {"page_size": 1})
+        first_page = response.json()
+        self.assertEqual(first_page["results"], full[:1])
+
+        if len(full) > 1:
+            second_page = self.client.get(first_page["next"]).json()
+            self.assertEqual(second_page["results"], full[1:2])
+
+    def test_virtual_lessons_on_boards(self):
+        PeriodLesson.create_manager.create(
+            org=self.org,
+            created_by=self.user,
+            title="Virtual",
+            teacher=self.teacher2,
+            group=self.group2,
+            classroom=self.classroom2,
+            subject=self.subject,
+            start_time=time(9),
+            end_time=time(10),
+            period=7,
+            start_date=date(2025, 8, 4),
+            is_virtual=True,
+        )
+        params = {"start_date": "2025-08-04", "end_date": "2025-08-11"}
+
+        board = self.client.get("/api/schedule/lessons/by-teachers/", params).json()["results"]
+        self.assertEqual([group["teacher"]["id"] for group in board], [self.teacher1.id, self.teacher2.id])
+        self.assertEqual(
+            [(row["date"], row["is_virtual"]) for row in board[1]["schedules"]],
+            [("2025-08-04", True), ("2025-08-09", False), ("2025-08-11", True)],
+        )
+
+        board = self.client.get(
+            "/api/schedule/lessons/by-classrooms/", {**params, "teacher": self.teacher1.id}
+        ).json()["results"]
+        self.assertEqual([group["classroom"]["id"] for group in board], [self.classroom1.id])
+
+
+@skipUnless(connection.vendor == "postgresql", "Планы запросов проверяются на PostgreSQL")
+class TestHotQueriesUseIndexes(BaseSetupDB):
+    """
+    Горячие запросы расписания, аналитики и фоновых задач должны использовать
+    свои индексы. В тестовой базе мало строк, поэтому последовательное
+    сканирование отключается - проверяется, что индекс применим к запросу.
+    """
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertRegex(plan, r"Index (Only )?Scan|Bitmap Index Scan")
+
+    def test_lesson_queries(self):
+        start, end = date(2025, 8, 1), date(2025, 8, 31)
+        ordering = ("date", "start_time")
+
+        self.assertUsesIndex(
+            Lesson.objects.filter(org=self.org, date__range=(start, end)).order_by(*ordering),
+            "lesson_org_date_idx",
+        )
+        # Как в проверке пересечений и в расписаниях по преподавателю/группе/аудитории
+        for field, value, index_name in (
+            ("teacher", self.teacher1, "lesson_teacher_date_idx"),
+            ("group", self.group1, "lesson_group_date_idx"),
+            ("classroom", self.classroom1, "lesson_classroom_date_idx"),
+        ):
+            with self.subTest(field=field):
+                self.assertUsesIndex(
+                    Lesson.objects.filter(**{field: value}, date__range=(start, end)).order_by(*ordering),
+                    index_name,
+                )
+
+    def test_task_queries(self):
+        now = timezone.now()
+        # update_complete_lessons
+        self.assertUsesIndex(
+            Lesson.objects.filter(org_id__in=[self.org.pk], is_completed=False).filter(
+                Q(date__lt=now.date()) | Q(date=now.date(), end_time__lte=now.time())
+            ),
+            "lesson_open_org_date_idx",
+        )
+        # update_data_not_complete_lessons
+        self.assertUsesIndex(
+            Lesson.objects.filter(period_schedule_id=1, is_completed=False), "lesson_open_period_idx"
+        )
+        # create_attendences_for_all_passes
+        self.assertUsesIndex(
+            Lesson.objects.filter(
+                is_canceled=False, is_completed=True, group__isnull=False, completed_at__gte=now
+            ),
+            "lesson_completed_at_idx",
+        )
+
+    def test_attendance_and_grade_queries(self):
+        start, end = date(2025, 8, 1), date(2025, 8, 31)
+        self.assertUsesIndex(
+            Attendance.objects.filter(lesson=self.schedule1, student=self.student1),
+            "unique_lesson_student_attendance",
+        )
+        self.assertUsesIndex(
+            Attendance.objects.filter(org=self.org, lesson_date__range=(start, end)),
+            "attendance_org_date_idx",
+        )
+        self.assertUsesIndex(
+            Grade.objects.filter(org=self.org, grade_date__range=(start, end)),
+            "grade_org_date_idx",
+        )
+
+
+class TestAttendanceConstraints(BaseSetupDB):
+
+    def test_attendance_unique(self):
+        from django.db import IntegrityError, transaction
+
+        Attendance.objects.create(org=self.org, lesson=self.schedule1, student=self.student1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Attendance.objects.create(org=self.org, lesson=self.schedule1, student=self.student1)
+
+
+def fill_group(test, group, count=10) -> list[Student]:
+    """Добавляет в группу учеников, чтобы массовые запросы проверялись на целой группе"""
+    students = Student.objects.bulk_create(
+        Student(
+            org=test.org,
+            created_by=test.user,
+            name=f"Ученик {number}",
+            surname="Тестовый",
+            birthday=date(2006, 1, 1),
+        )
+        for number in range(count)
+    )
+    group.students.add(*students)
+    return list(group.students.order_by("pk"))
+
+
+class TestBulkAttendance(BaseSetupDB):
+
+    url = "/api/schedule/attendances/bulk/"
+
+    def test_upsert_whole_lesson(self):
+        roster = fill_group(self, self.group1)
+        Attendance.objects.create(org=self.org, lesson=self.schedule1, student=self.student1, was_present=False)
+        data = {
+            "lesson": self.schedule1.pk,
+            "attendances": [{"student": student.pk, "was_present": True} for student in roster],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Занятие, состав группы, вставка и чтение результата - без запросов на каждого ученика
+        self.assertLessEqual(len(ctx), 8)
+        attendances = Attendance.objects.filter(lesson=self.schedule1).order_by("student_id")
+        self.assertEqual([attendance.student_id for attendance in attendances], [student.pk for student in roster])
+        self.assertTrue(all(attendance.was_present for attendance in attendances))
+        self.assertEqual({attendance.lesson_date for attendance in attendances}, {self.schedule1.date})
+        self.assertEqual(sorted(item["id"] for item in response.data), sorted(a.pk for a in attendances))
+
+    def test_students_checked_against_group(self):
+        data = {"lesson": self.schedule1.pk, "attendances": [{"student": self.student2.pk, "was_present": True}]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Attendance.objects.filter(lesson=self.schedule1).exists())
+
+    def test_lessons_context_required(self):
+        from .serializers.write import AttendanceBulkWriteSerializer
+
+        data = {"lesson": self.schedule1.pk, "attendances": [{"student": self.student1.pk, "was_present": True}]}
+        with self.assertRaises(ValueError):
+            AttendanceBulkWriteSerializer(data=data)
+
+
+class TestBulkGrades(BaseSetupDB):
+
+    url = "/api/schedule/grades/bulk/"
+
+    def test_upsert_keeps_comment_when_omitted(self):
+        Grade.objects.create(org=self.org, lesson=self.schedule1, student=self.student1, value=3, comment="устно")
+        data = {
+            "grades": [
+                {"student": self.student1.pk, "lesson": self.schedule1.pk, "value": 5},
+                {"student": self.student1.pk, "lesson": self.schedule3.pk, "value": 4, "comment": "тест"},
+            ]
+        }
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        updated = Grade.objects.get(lesson=self.schedule1, student=self.student1)
+        self.assertEqual((updated.value, updated.comment), (5, "устно"))
+        created = Grade.objects.get(lesson=self.schedule3, student=self.student1)
+        self.assertEqual((created.grade_date, created.comment), (self.schedule3.date, "тест"))
+
+    def test_whole_group_without_per_row_queries(self):
+        roster = fill_group(self, self.group1)
+        Grade.objects.create(org=self.org, lesson=self.schedule1, student=self.student1, value=3)
+        data = {
+            "lesson": self.schedule1.pk,
+            "grades": [{"student": student.pk, "value": 5} for student in roster],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Занятия, ученики, существующие оценки и запись - без запросов на каждую строку
+        self.assertLessEqual(len(ctx), 8)
+        self.assertEqual(len(response.data), len(roster))
+        self.assertEqual(
+            list(Grade.objects.filter(lesson=self.schedule1).order_by("student_id").values_list("student_id", "value")),
+            [(student.pk, 5) for student in roster],
+        )
+
+    def test_errors_reported_per_row(self):
+        data = {
+            "lesson": self.schedule1.pk,
+            "grades": [
+                {"student": self.student1.pk, "value": 5},
+                {"student": self.student2.pk, "value": 4},
+            ],
+        }
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["grades"][0], {})
+        self.assertIn("student", response.data["grades"][1])
+        self.assertFalse(Grade.objects.exists())
+
+    def test_lessons_context_required(self):
+        from .serializers.write import GradeBulkWriteSerializer
+
+        data = {"lesson": self.schedule1.pk, "grades": [{"student": self.student1.pk, "value": 5}]}
+        with self.assertRaises(ValueError):
+            GradeBulkWriteSerializer(data=data)
@@ -1,36 +1,182 @@
-from datetime import time, timedelta, datetime
+from calendar import monthrange
+from datetime import date, time, timedelta, datetime
 from typing import Type, TYPE_CHECKING
 from typing import List
+import heapq
 import json
 from collections import defaultdict
-from rest_framework.response import Response
+from itertools import groupby
+from operator import itemgetter
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from mainapp.cache import DEFAULT_REPEAT_LESSONS_UNTIL, get_org_meta
+from mainapp.fast_serializers import get_fast_plan
+from mainapp.pagination import KeysetPagination
+from mainapp.streaming import is_stream_requested, streaming_json_response
+from django.conf import settings
+from django.utils import timezone
+from django.db import connections, transaction
+from django.db.models.constants import OnConflict
+from django.db.models.sql import InsertQuery
+from django.db.models import Exists, F, OuterRef, Q
+from django.dispatch import Signal
 from django_celery_beat.models import PeriodicTask, IntervalSchedule
-from .models import Attendance, Lesson
+from .models import Attendance, Grade, Lesson, PeriodLesson
 
     
 
 if TYPE_CHECKING:
-    from mainapp.models import Organization
+    from django.db.models import QuerySet
+
+
+ATTENDANCE_BACKFILL_BATCH_SIZE = 1000
+GRADES_UPSERT_BATCH_SIZE = 1000
+ATTENDANCE_BACKFILL_WATERMARK_KEY = "lesson_schedule:attendance_backfill_watermark"
+# Запас по времени для уроков, завершенных транзакциями, которые
+# зафиксировались уже после старта предыдущего прогона
+ATTENDANCE_BACKFILL_OVERLAP = timedelta(minutes=5)
+
+# Поля периодического расписания, которые не переносятся в занятия
+PERIOD_LESSON_OWN_FIELDS = (
+    "date",
+    "created_by",
+    "id",
+    "period",
+    "repeat_lessons_until_date",
+    "start_date",
+    "title",
+    "is_virtual",
+    "materialized_until",
+)
+
+# Размер пачки расписаний, обрабатываемых ночной задачей продления горизонта
+MATERIALIZATION_BATCH_SIZE = 500
+DEFAULT_MATERIALIZATION_HORIZON_WEEKS = 8
+
+# Массовые изменения занятий и посещений в обход save (bulk_create, update).
+# Аргумент days - множество пар (id организации, дата)
+lesson_days_changed = Signal()
+
+
+def _iter_grouped_schedules(lessons, key_field, exclude_fields):
+    """
+    Пары (id ключа, список сериализованных занятий) за один проход
+    по отсортированной по ключу выборке
+    """
+    from .serializers.read import ScheduleReadSerializer
+
+    plan = get_fast_plan(ScheduleReadSerializer, exclude_fields=exclude_fields)
+    if plan is not None:
+        rows = plan.iter_serialize_keyed(lessons, key_field)
+    else:
+        lessons = list(lessons)
+        data = ScheduleReadSerializer(lessons, many=True, exclude_fields=exclude_fields).data
+        rows = zip((getattr(lesson, key_field) for lesson in lessons), data)
+
+    for key_id, group in groupby(rows, key=itemgetter(0)):
+        yield key_id, [schedule for _, schedule in group]
+
+
+def _schedule_sort_key(schedule: dict) -> tuple:
+    """Порядок сериализованных занятий внутри группы: дата, время начала (пустое - в конце)"""
+    return schedule["date"], schedule["start_time"] is None, schedule["start_time"] or ""
+
+
+def _group_virtual_schedules(lessons: list[Lesson], key_field, exclude_fields) -> dict:
+    """Сериализованные виртуальные занятия по id ключа, каждый список отсортирован"""
+    from .serializers.read import ScheduleReadSerializer
+
+    data = ScheduleReadSerializer(lessons, many=True, exclude_fields=exclude_fields).data
+    grouped = defaultdict(list)
+    for lesson, schedule in zip(lessons, data):
+        grouped[getattr(lesson, key_field)].append(schedule)
+    for schedules in grouped.values():
+        schedules.sort(key=_schedule_sort_key)
+    return grouped
+
+
+def _merge_virtual_groups(groups, virtual_groups: dict):
+    """
+    Вливает виртуальные занятия в группы, отсортированные по id ключа.
+    Ключи, у которых есть только виртуальные занятия, становятся отдельными группами
+    """
+    pending = sorted(virtual_groups)
+    index = 0
+    for key_id, schedule_list in groups:
+        while index < len(pending) and pending[index] < key_id:
+            yield pending[index], virtual_groups[pending[index]]
+            index += 1
+        if index < len(pending) and pending[index] == key_id:
+            # При равном времени виртуальные занятия идут первыми, как и в списке занятий
+            schedule_list = list(heapq.merge(virtual_groups[key_id], schedule_list, key=_schedule_sort_key))
+            index += 1
+        yield key_id, schedule_list
+    for key_id in pending[index:]:
+        yield key_id, virtual_groups[key_id]
 
 
 def _grouped_response(self, field_name=None, serializer_class=None):
+    """
+    Расписание, сгруппированное по преподавателю, группе или аудитории.
+
+    Ключи группировки загружаются одним запросом, занятия читаются одним
+    запросом, отсортированным по id ключа, и группируются за один проход.
+    Если в запросе указано окно дат, в группы вливаются вычисленные занятия
+    виртуальных расписаний, как и в списке занятий.
+    Группы отдаются страницами по ключам (?page_size=20&cursor=...),
+    ?stream=true без page_size/cursor выгружает все группы.
+    """
+    key_field = f"{field_name}_id"
     schedules = self.get_queryset().exclude(**{f"{field_name}__isnull": True})
     filterset = self.filterset_class(self.request.GET, queryset=schedules)
     schedules = filterset.qs
+    virtual_lessons = [
+        lesson for lesson in self._get_virtual_lessons(self.request)
+        if getattr(lesson, key_field) is not None
+    ]
 
-    grouped = defaultdict(list)
-    for schedule in schedules:
-        key = getattr(schedule, field_name)
-        grouped[key].append(schedule)
-
-    response_data = []
-    for key_obj, schedule_list in grouped.items():
-        serializer = serializer_class(
-            instance={f"{field_name}": key_obj, "schedules": schedule_list}
-        )
-        response_data.append(serializer.data)
+    group_serializer = serializer_class()
+    key_serializer = group_serializer.fields[field_name]
+    group_fields = list(group_serializer.fields)
 
-    return Response(response_data)
+    key_model = schedules.model._meta.get_field(field_name).related_model
+    nested = [
+        name for name, field in key_serializer.fields.items()
+        if isinstance(field, BaseSerializer) and not isinstance(field, ListSerializer)
+    ]
+    keys_filter = Q(pk__in=schedules.values(key_field))
+    if virtual_lessons:
+        keys_filter |= Q(pk__in={getattr(lesson, key_field) for lesson in virtual_lessons})
+    keys = (
+        key_model.objects.filter(keys_filter)
+        .select_related(*nested)
+        .order_by("pk")
+    )
+
+    paginator = KeysetPagination()
+    page = None
+    if is_stream_requested(self.request) and not paginator.is_requested(self.request):
+        keys = keys.in_bulk()
+    else:
+        page = paginator.paginate_queryset(keys, self.request)
+        keys = {key.pk: key for key in page}
+        schedules = schedules.filter(**{f"{key_field}__in": list(keys)})
+        virtual_lessons = [lesson for lesson in virtual_lessons if getattr(lesson, key_field) in keys]
+
+    lessons = schedules.order_by(key_field, "date", F("start_time").asc(nulls_last=True), "id")
+    virtual_groups = _group_virtual_schedules(virtual_lessons, key_field, serializer_class.exclude_fields)
+
+    def iter_groups():
+        groups = _iter_grouped_schedules(lessons, key_field, serializer_class.exclude_fields)
+        for key_id, schedule_list in _merge_virtual_groups(groups, virtual_groups):
+            group = {
+                "schedules": schedule_list,
+                field_name: key_serializer.to_representation(keys[key_id]),
+            }
+            yield {name: group[name] for name in group_fields}
+
+    if page is None:
+        return streaming_json_response(iter_groups())
+    return paginator.get_paginated_response(list(iter_groups()))
 
 
 # Создает таску
@@ -49,6 +195,21 @@ def init_task_create_update_complete_lessons_task():
         },
     )
 
+def init_task_extend_lessons_horizon():
+    schedule, _ = IntervalSchedule.objects.get_or_create(
+        every=1, period=IntervalSchedule.DAYS
+    )
+
+    PeriodicTask.objects.update_or_create(
+        name="Задача продление горизонта созданных занятий периодических расписаний",
+        defaults={
+            "interval": schedule,
+            "task": "lesson_schedule.tasks.extend_lessons_horizon",
+            "args": json.dumps([]),
+            "kwargs": json.dumps({}),
+        },
+    )
+
 def init_task_create_attendences_for_all_passes():
     schedule, _ = IntervalSchedule.objects.get_or_create(
         every=1, period=IntervalSchedule.MINUTES
@@ -154,24 +315,318 @@ class LessonSlot:
         )
 
 
-def _create_missing_attendances_for_lesson(lesson: Lesson) -> list[Attendance]:
-    org = lesson.get_org
-    group_students = lesson.group.students.all()
-    lesson_date = lesson.date
-    existing_students_ids = Attendance.objects.filter(lesson=lesson).values_list(
-        "student_id", flat=True
+def _missing_attendance_rows(lessons: "QuerySet[Lesson]") -> "QuerySet":
+    """
+    Возвращает пары (урок, ученик группы урока), для которых нет записи о посещении.
+    Выполняется одним запросом с anti-join (NOT EXISTS) по таблице посещений.
+    """
+    return (
+        lessons.annotate(student_id=F("group__students"))
+        .filter(student_id__isnull=False)
+        .filter(
+            ~Exists(
+                Attendance.objects.filter(
+                    lesson=OuterRef("pk"), student=OuterRef("student_id")
+                )
+            )
+        )
+        .order_by()
+        .values_list("pk", "student_id", "org_id", "date")
     )
-    missing_students = group_students.exclude(id__in=existing_students_ids)
 
-    return [
-        Attendance(student=student, lesson=lesson, org=org, was_present=False, lesson_date=lesson_date)
-        for student in missing_students
-    ]
 
+def _insert_ignoring_conflicts(attendances: list[Attendance]) -> int:
+    """
+    INSERT ... ON CONFLICT DO NOTHING, возвращает число реально вставленных строк.
+    bulk_create(ignore_conflicts=True) его не сообщает, а пару могли отметить
+    параллельно, пока шла выборка недостающих
+    """
+    connection = connections[Attendance.objects.db]
+    fields = [
+        field for field in Attendance._meta.concrete_fields
+        if not field.primary_key and not field.generated
+    ]
+    batch_size = max(connection.ops.bulk_batch_size(fields, attendances), 1)
+
+    inserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(attendances), batch_size):
+            query = InsertQuery(Attendance, on_conflict=OnConflict.IGNORE)
+            query.insert_values(fields, attendances[start:start + batch_size])
+            for statement, params in query.get_compiler(connection=connection).as_sql():
+                cursor.execute(statement, params)
+                inserted += cursor.rowcount
+    return inserted
+
+
+def _bulk_create_missing_attendances(lessons: "QuerySet[Lesson]") -> int:
+    """Создает пропуски для всех пар без посещения пачками, возвращает количество вставленных"""
+    created = 0
+    batch = []
+
+    rows = _missing_attendance_rows(lessons).iterator(
+        chunk_size=ATTENDANCE_BACKFILL_BATCH_SIZE
+    )
+    days = set()
+    for lesson_id, student_id, org_id, lesson_date in rows:
+        days.add((org_id, lesson_date))
+        batch.append(
+            Attendance(
+                lesson_id=lesson_id,
+                student_id=student_id,
+                org_id=org_id,
+                lesson_date=lesson_date,
+                was_present=False,
+            )
+        )
+        if len(batch) >= ATTENDANCE_BACKFILL_BATCH_SIZE:
+            created += _insert_ignoring_conflicts(batch)
+            batch = []
+
+    if batch:
+        created += _insert_ignoring_conflicts(batch)
+
+    if days:
+        lesson_days_changed.send(sender=Attendance, days=days)
+    return created
+
+
+def bulk_mark_attendances(lesson: Lesson, marks: list[dict], org, created_by=None) -> "QuerySet[Attendance]":
+    """
+    Отмечает посещения учеников занятия одной вставкой с обновлением
+    при конфликте (lesson, student). marks - [{"student": id, "was_present": bool}].
+    Возвращает посещения отмеченных учеников
+    """
+    attendances = [
+        Attendance(
+            lesson=lesson,
+            student_id=mark["student"],
+            was_present=mark["was_present"],
+            lesson_date=lesson.date,
+            org=org,
+            created_by=created_by,
+        )
+        for mark in marks
+    ]
+    Attendance.objects.bulk_create(
+        attendances,
+        update_conflicts=True,
+        unique_fields=["lesson", "student"],
+        update_fields=["was_present", "lesson_date"],
+    )
+    lesson_days_changed.send(
+        sender=Attendance, days={(org.pk, lesson.date), (lesson.org_id, lesson.date)}
+    )
+    return Attendance.objects.filter(
+        lesson=lesson, student_id__in=[mark["student"] for mark in marks]
+    ).order_by("student_id")
+
+
+def bulk_upsert_grades(rows: list[dict], org, created_by=None) -> list[dict]:
+    """
+    Выставляет оценки вставкой с обновлением при конфликте (student, lesson).
+    rows - [{"student": id, "lesson": Lesson, "value": int | None, "comment": str}],
+    comment необязателен: строки без него не меняют комментарий существующей оценки.
+    Дата оценки берется из занятия. Возвращает выставленные оценки
+    """
+    with_comment, without_comment = [], []
+    for row in rows:
+        grade = Grade(
+            student_id=row["student"],
+            lesson=row["lesson"],
+            value=row["value"],
+            comment=row.get("comment", ""),
+            grade_date=row["lesson"].date,
+            org=org,
+            created_by=created_by,
+        )
+        (with_comment if "comment" in row else without_comment).append(grade)
+
+    update_fields = ["value", "grade_date", "updated_at"]
+    with transaction.atomic():
+        for grades, fields in ((with_comment, [*update_fields, "comment"]), (without_comment, update_fields)):
+            if grades:
+                Grade.objects.bulk_create(
+                    grades,
+                    batch_size=GRADES_UPSERT_BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=["student", "lesson"],
+                    update_fields=fields,
+                )
+
+    days = set()
+    for row in rows:
+        days.update({(org.pk, row["lesson"].date), (row["lesson"].org_id, row["lesson"].date)})
+    lesson_days_changed.send(sender=Grade, days=days)
+
+    pairs = {(row["lesson"].pk, row["student"]) for row in rows}
+    grades = Grade.objects.filter(
+        lesson_id__in={lesson_id for lesson_id, _ in pairs},
+        student_id__in={student_id for _, student_id in pairs},
+    ).order_by("lesson_id", "student_id").values("id", "student", "lesson", "value", "comment", "grade_date")
+    return [grade for grade in grades if (grade["lesson"], grade["student"]) in pairs]
+
+
+def _period_lesson_data(instance: PeriodLesson, skip_none=False) -> dict:
+    """Атрибуты периодического расписания, на основе которых создаются занятия"""
+    return {
+        f.name: getattr(instance, f.name)
+        for f in instance._meta.fields
+        if f.name not in PERIOD_LESSON_OWN_FIELDS
+        and not (skip_none and getattr(instance, f.name) is None)
+    }
+
+
+def get_repeat_until(period_lesson: PeriodLesson) -> date:
+    """
+    Дата, до которой повторяется расписание.
+    Если у расписания не указана своя дата, берется ближайшая после start_date
+    дата окончания повторений из настроек организации (хранится без года).
+    """
+    if period_lesson.repeat_lessons_until_date:
+        return period_lesson.repeat_lessons_until_date
+
+    meta = get_org_meta(period_lesson.org_id)
+    month_day = meta.repeat_lessons_until if meta else DEFAULT_REPEAT_LESSONS_UNTIL
+    start_date = period_lesson.start_date
+
+    def in_year(year):
+        return date(year, month_day.month, min(month_day.day, monthrange(year, month_day.month)[1]))
+
+    until = in_year(start_date.year)
+    return until if until >= start_date else in_year(start_date.year + 1)
+
+
+def iter_period_dates(period_lesson: PeriodLesson, start: date | None = None, end: date | None = None):
+    """Даты занятий периодического расписания в окне [start, end]"""
+    if not period_lesson.period or not period_lesson.start_date:
+        return
+
+    step = timedelta(days=period_lesson.period)
+    current = period_lesson.start_date
+    until = get_repeat_until(period_lesson)
+    if end is not None:
+        until = min(until, end)
+
+    if start is not None and start > current:
+        # Округляем количество шагов вверх, чтобы попасть на первую дату внутри окна
+        steps = -(-(start - current).days // period_lesson.period)
+        current += step * steps
+
+    while current <= until:
+        yield current
+        current += step
+
+
+def build_period_occurrence(period_lesson: PeriodLesson, lesson_date: date, data: dict | None = None) -> Lesson:
+    """Создает (не сохраняя) занятие периодического расписания на указанную дату"""
+    if data is None:
+        data = _period_lesson_data(period_lesson)
+
+    lesson = Lesson(
+        date=lesson_date,
+        created_by=period_lesson.created_by,
+        week_day=lesson_date.isoweekday(),
+        period_schedule=period_lesson,
+        **data,
+    )
+    lesson.duration = lesson.calc_duration
+    return lesson
+
+
+def build_virtual_lessons(
+    period_lessons: "QuerySet[PeriodLesson]",
+    start: date,
+    end: date,
+    now: datetime | None = None,
+) -> list[Lesson]:
+    """
+    Вычисляет виртуальные занятия расписаний в окне дат.
+    Даты, на которые уже есть реальное занятие расписания (отмена, посещения,
+    оценки, переопределение), пропускаются. Занятия считаются завершенными,
+    если их время по переданному локальному времени уже прошло.
+    """
+    period_lessons = list(period_lessons)
+    if not period_lessons:
+        return []
+
+    materialized = set(
+        Lesson.objects.filter(
+            period_schedule__in=period_lessons, date__range=(start, end)
+        ).values_list("period_schedule_id", "date")
+    )
 
-def _get_complited_lessons_for_org(org: "Organization") -> list[Lesson]:
-    return Lesson.objects.filter_by_org(org).filter(
-        is_canceled=False, is_completed=True
+    lessons = []
+    for period_lesson in period_lessons:
+        data = _period_lesson_data(period_lesson)
+        for lesson_date in iter_period_dates(period_lesson, start, end):
+            if (period_lesson.pk, lesson_date) in materialized:
+                continue
+            lesson = build_period_occurrence(period_lesson, lesson_date, data)
+            if now is not None and lesson.end_time:
+                lesson.is_completed = (lesson.date, lesson.end_time) <= (now.date(), now.time())
+            lessons.append(lesson)
+
+    return lessons
+
+
+def materialize_occurrence(period_lesson: PeriodLesson, lesson_date: date) -> tuple[Lesson, bool]:
+    """Сохраняет занятие виртуального расписания на дату, если его еще нет"""
+    lesson = Lesson.objects.filter(period_schedule=period_lesson, date=lesson_date).first()
+    if lesson is not None:
+        return lesson, False
+
+    lesson = build_period_occurrence(period_lesson, lesson_date)
+    lesson.save()
+    return lesson, True
+
+
+def get_materialization_horizon(today: date | None = None) -> date:
+    """Дата, до которой занятия периодических расписаний должны быть созданы"""
+    weeks = getattr(
+        settings,
+        "LESSONS_MATERIALIZATION_HORIZON_WEEKS",
+        DEFAULT_MATERIALIZATION_HORIZON_WEEKS,
     )
+    return (today or timezone.localdate()) + timedelta(weeks=weeks)
+
+
+def extend_materialized_lessons(period_lessons: list[PeriodLesson], horizon: date) -> int:
+    """
+    Создает занятия расписаний от их водяного знака materialized_until до horizon
+    (но не дальше даты окончания повторений) и сдвигает водяной знак.
+    Работает пачкой: одна вставка занятий и одно обновление расписаний.
+    Возвращает количество созданных занятий.
+    """
+    lessons_to_create = []
+    period_lessons_to_update = []
+
+    for period_lesson in period_lessons:
+        if period_lesson.is_virtual or not period_lesson.period or not period_lesson.start_date:
+            continue
+
+        until = min(horizon, get_repeat_until(period_lesson))
+        watermark = period_lesson.materialized_until
+        if watermark is not None and watermark >= until:
+            continue
+
+        start = watermark + timedelta(days=1) if watermark is not None else None
+        data = _period_lesson_data(period_lesson)
+        lessons_to_create.extend(
+            build_period_occurrence(period_lesson, lesson_date, data)
+            for lesson_date in iter_period_dates(period_lesson, start, until)
+        )
+        period_lesson.materialized_until = until
+        period_lessons_to_update.append(period_lesson)
 
+    if lessons_to_create:
+        Lesson.objects.bulk_create(lessons_to_create, batch_size=MATERIALIZATION_BATCH_SIZE)
+        lesson_days_changed.send(
+            sender=Lesson, days={(lesson.org_id, lesson.date) for lesson in lessons_to_create}
+        )
+    if period_lessons_to_update:
+        PeriodLesson.objects.bulk_update(
+            period_lessons_to_update, ["materialized_until"], batch_size=MATERIALIZATION_BATCH_SIZE
+        )
 
+    return len(lessons_to_create)
@@ -1,22 +1,36 @@
+import heapq
+from datetime import date, time
 from typing import Tuple
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import action
 from rest_framework.response import Response
 import django_filters
-from django.db.models import Q, QuerySet
+from django.db.models import F, Q, QuerySet
 
 from mainapp.models import User
-from .filters import LessonFilter
+from .filters import LessonFilter, PeriodLessonFilter
 from .serializers.read import AttendanceReadSerializer, ClassroomReadSerializer, GradeReadSerializer, ScheduleReadSerializer, SubjectReadSerializer, PeriodScheduleReadSerializer
-from .serializers.write import AttendanceWriteSerializer, ClassroomWriteSerializer, GradeWriteSerializer, PeriodScheduleWriteSerializer, ScheduleWriteSerializer, SubjectWriteSerializer
+from .serializers.write import AttendanceBulkWriteSerializer, AttendanceWriteSerializer, GradeBulkWriteSerializer, ClassroomWriteSerializer, GradeWriteSerializer, PeriodScheduleWriteSerializer, ScheduleWriteSerializer, SubjectWriteSerializer
 from mainapp.views import BaseViewSetWithOrdByOrg, SelectRelatedViewSet
-from mainapp.decorators import base_search
+from search.constants import SearchKind
+from search.decorators import indexed_search
+from search.services import search as search_documents
+from search.mixins import AutocompleteMixin
 from mainapp.filters import DateRangeMixin
-from .utils import _grouped_response
+from .utils import _grouped_response, build_virtual_lessons, bulk_mark_attendances, bulk_upsert_grades, get_materialization_horizon, iter_period_dates, materialize_occurrence
 from .models import Attendance, Lesson, Subject, PeriodLesson, Grade, Classroom, AbstrctLesson
 from .mixins import SerializerUpdateMixin, LessonValidationMixin
 from .serializers.other import GroupScheduleSerializer, TeacherScheduleSerializer, ClassroomScheduleSerializer
 from mainapp.constants import UserRole 
+from mainapp.utils import get_org_local_datetime
+from mainapp.streaming import (
+    STREAM_CHUNK_SIZE,
+    is_stream_requested,
+    iter_serialized,
+    streaming_json_response,
+)
 
 
 # filters
@@ -61,8 +75,7 @@ class AbstractScheduleViewSet(
         queryset = Lesson.objects.all()
         return queryset
 
-    def get_queryset(self) -> QuerySet:
-        qs: AbstrctLesson = super().get_queryset()
+    def _filter_by_role(self, qs: QuerySet) -> QuerySet:
         user: User = self.request.user
         user_profile, role = user.get_user_profile()
         if role == UserRole.TEACHER:
@@ -71,6 +84,10 @@ class AbstractScheduleViewSet(
             qs = qs.filter(student=user_profile.student)
         return qs
 
+    def get_queryset(self) -> QuerySet:
+        qs: AbstrctLesson = super().get_queryset()
+        return self._filter_by_role(qs)
+
     def update(self, request, *args, **kwargs):
         is_force_update = request.query_params.get("is_force_update") == "true"
         data = request.data
@@ -93,7 +110,7 @@ class ScheduleViewSet(AbstractScheduleViewSet):
     filterset_class = LessonFilter
     read_serializer_class = ScheduleReadSerializer
     write_serializer_class = ScheduleWriteSerializer
-
+    pagination_ordering = ("date", "start_time", "id")
 
     critical_fields = (
         "classroom",
@@ -120,11 +137,129 @@ class ScheduleViewSet(AbstractScheduleViewSet):
         "by-classrooms": ("classroom", ClassroomScheduleSerializer),
     }
 
+    virtual_select_related_fields = [
+        "teacher__employer",
+        "subject__color",
+        "group",
+        "classroom",
+    ]
+
     def _can_update(self, serializer, is_force_update) -> bool:
         return self.can_update_alone_lesson(
             serializer=serializer, is_force_update=is_force_update
         )
 
+    def _get_date_window(self, request) -> tuple[date, date] | None:
+        """Окно дат запроса, только для него можно вычислить виртуальные занятия"""
+        params = request.query_params
+        try:
+            if lesson_date := parse_date(params.get("date", "")):
+                return lesson_date, lesson_date
+            start = parse_date(params.get("start_date", ""))
+            end = parse_date(params.get("end_date", ""))
+        except ValueError:
+            return None
+        return (start, end) if start and end else None
+
+    def _matches_lesson_params(self, lesson: Lesson, params) -> bool:
+        """Фильтры Lesson, которые нельзя применить к PeriodLesson, проверяются в памяти"""
+        for name in ("is_canceled", "is_completed"):
+            value = params.get(name, "").lower()
+            if value in ("true", "false") and getattr(lesson, name) != (value == "true"):
+                return False
+        for name in ("week_day", "period_schedule"):
+            if name in params and str(getattr(lesson, f"{name}_id", getattr(lesson, name))) != params[name]:
+                return False
+        return True
+
+    def _get_virtual_period_lessons(self, request, **lookup) -> QuerySet:
+        """Виртуальные расписания, доступные пользователю"""
+        return self._filter_by_role(
+            PeriodLesson.objects.filter(
+                Q(org=request.user.get_org) | Q(org__isnull=True), is_virtual=True, **lookup
+            ).select_related(*self.virtual_select_related_fields)
+        )
+
+    def _get_local_now(self, request):
+        user_org = request.user.get_org
+        return get_org_local_datetime(user_org) if user_org else timezone.localtime()
+
+    def _get_virtual_lessons(self, request) -> list[Lesson]:
+        window = self._get_date_window(request)
+        if window is None:
+            return []
+
+        period_lessons = self._get_virtual_period_lessons(request, start_date__lte=window[1])
+        period_lessons = PeriodLessonFilter(request.query_params, queryset=period_lessons).qs
+
+        return [
+            lesson
+            for lesson in build_virtual_lessons(period_lessons, *window, now=self._get_local_now(request))
+            if self._matches_lesson_params(lesson, request.query_params)
+        ]
+
+    def _search_virtual_lessons(self, request, query, limit, documents) -> list[Lesson]:
+        """
+        Занятия виртуальных расписаний, найденных поиском, от сегодня до горизонта,
+        до которого создаются занятия обычных расписаний
+        """
+        schedule_ids = search_documents(SearchKind.SCHEDULE, query, limit, documents=documents)
+        if not schedule_ids:
+            return []
+
+        now = self._get_local_now(request)
+        period_lessons = self._get_virtual_period_lessons(request, pk__in=schedule_ids)
+        lessons = build_virtual_lessons(
+            period_lessons, now.date(), get_materialization_horizon(now.date()), now=now
+        )
+        rank = {pk: position for position, pk in enumerate(schedule_ids)}
+        lessons.sort(key=lambda lesson: (rank[lesson.period_schedule_id], lesson.date))
+        return lessons[:limit]
+
+    @staticmethod
+    def _pagination_key(lesson: Lesson) -> tuple:
+        """
+        Значения ключа пагинации (date, start_time, id). У виртуальных занятий нет id,
+        вместо него - минус id расписания: они идут перед сохраненными занятиями
+        того же времени, и курсор остается тем же
+        """
+        lesson_id = lesson.pk if lesson.pk is not None else -lesson.period_schedule_id
+        return lesson.date, lesson.start_time, lesson_id
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список занятий. Если в запросе указано окно дат (date или start_date и end_date),
+        к сохраненным занятиям добавляются вычисленные занятия виртуальных расписаний.
+        Пагинация такого списка идет по тому же ключу (date, start_time, id)
+        """
+        virtual_lessons = self._get_virtual_lessons(request)
+        if not virtual_lessons:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+
+        if is_stream_requested(request) and not self.paginator.is_requested(request):
+            # Сохраненные занятия уже отсортированы базой, виртуальные вливаются по ходу чтения
+            sort_key = lambda lesson: self.paginator.sort_key(self._pagination_key(lesson))
+            lessons = heapq.merge(
+                queryset.order_by("date", F("start_time").asc(nulls_last=True), "id").iterator(
+                    chunk_size=STREAM_CHUNK_SIZE
+                ),
+                sorted(virtual_lessons, key=sort_key),
+                key=sort_key,
+            )
+            return streaming_json_response(
+                iter_serialized(
+                    lessons, self.get_serializer_class(), context=self.get_serializer_context()
+                )
+            )
+
+        page = self.paginator.paginate_merged(
+            queryset, virtual_lessons, request, view=self, key=self._pagination_key
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.paginator.get_paginated_response(serializer.data)
+
     def _grouped_action(self, key):
         field_name, serializer = self.grouped_fields[key]
         return _grouped_response(self, field_name, serializer)
@@ -142,29 +277,9 @@ class ScheduleViewSet(AbstractScheduleViewSet):
         return self._grouped_action("by-classrooms")
 
     @action(detail=False, methods=["post"], url_path="search")
-    @base_search
-    def search(self, request, query=None):
-        q = Q()
-
-        for word in query.split():
-            q |= (
-                Q(title__icontains=word)
-                | Q(start_time__icontains=word)
-                | Q(end_time__icontains=word)
-                | Q(date__icontains=word)
-                | Q(teacher__employer__name__icontains=word)
-                | Q(teacher__employer__surname__icontains=word)
-                | Q(teacher__employer__patronymic__icontains=word)
-                | Q(classroom__title__icontains=word)
-                | Q(classroom__floor__icontains=word)
-                | Q(classroom__building__icontains=word)
-                | Q(group__name__icontains=word)
-                | Q(subject__name__icontains=word)
-            )
-
-        results = self.get_queryset().filter(q)
-        serializer = self.serializer_class(results, many=True)
-        return Response(serializer.data)
+    @indexed_search(SearchKind.LESSON, extra_results="_search_virtual_lessons")
+    def search(self, request):
+        return self.get_queryset()
 
 
 class PeriodScheduleViewSet(AbstractScheduleViewSet):
@@ -179,11 +294,36 @@ class PeriodScheduleViewSet(AbstractScheduleViewSet):
         "teacher",
         "classroom",
         "group",
+        "period",
+        "start_date",
+        "repeat_lessons_until_date",
     )
 
     def _can_update(self, serializer, is_force_update) -> bool:
         return self.can_update_period_lesson(serializer=serializer, is_force_update=is_force_update)
 
+    @action(detail=True, methods=["post"])
+    def materialize(self, request, pk=None):
+        """
+        Сохраняет занятие расписания на дату из тела запроса ({"date": "YYYY-MM-DD"}).
+        Нужен для виртуальных расписаний перед отметкой посещений, выставлением оценок,
+        отменой или изменением отдельного занятия.
+        Новое занятие проверяется на пересечения, ?is_force_create=true отключает проверку.
+        """
+        is_force_create = request.query_params.get("is_force_create") == "true"
+        period_lesson = self.get_object()
+        try:
+            lesson_date = parse_date(str(request.data.get("date", "")))
+        except ValueError:
+            lesson_date = None
+
+        if lesson_date is None or not any(iter_period_dates(period_lesson, lesson_date, lesson_date)):
+            raise ValidationError({"date": "На эту дату у расписания нет занятия"})
+
+        self.can_materialize_period_lesson(period_lesson, lesson_date, is_force_create)
+        lesson, created = materialize_occurrence(period_lesson, lesson_date)
+        return Response(ScheduleReadSerializer(lesson).data, status=201 if created else 200)
+
 
 class SubjectViewSet(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
     queryset = Subject.objects.all()
@@ -191,10 +331,11 @@ class SubjectViewSet(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
     write_serializer_class = SubjectWriteSerializer
 
 
-class ClassroomViewSet(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
+class ClassroomViewSet(AutocompleteMixin, SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
     queryset = Classroom.objects.all()
     read_serializer_class = ClassroomReadSerializer
     write_serializer_class = ClassroomWriteSerializer
+    autocomplete_source = "classroom"
 
 
 class GradeViewSet(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
@@ -213,12 +354,45 @@ class GradeViewSet(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
 
         return queryset
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """Выставление оценок по занятию или ведомости одним запросом"""
+        user = self.get_current_user()
+        org = self.get_current_org(user)
+        serializer = GradeBulkWriteSerializer(
+            data=request.data,
+            context={"lessons": Lesson.objects.filter(Q(org=org) | Q(org__isnull=True))},
+        )
+        serializer.is_valid(raise_exception=True)
+
+        grades = bulk_upsert_grades(serializer.validated_data["grades"], org=org, created_by=user)
+        return Response(grades)
+
 
 class AttendanceViewSet(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
     queryset = Attendance.objects.all()
     read_serializer_class = AttendanceReadSerializer
     write_serializer_class = AttendanceWriteSerializer
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """Отметка посещений всех учеников занятия одним запросом"""
+        user = self.get_current_user()
+        org = self.get_current_org(user)
+        serializer = AttendanceBulkWriteSerializer(
+            data=request.data,
+            context={"lessons": Lesson.objects.filter(Q(org=org) | Q(org__isnull=True))},
+        )
+        serializer.is_valid(raise_exception=True)
+
+        attendances = bulk_mark_attendances(
+            serializer.validated_data["lesson"],
+            serializer.validated_data["attendances"],
+            org=org,
+            created_by=user,
+        )
+        return Response(AttendanceReadSerializer(attendances, many=True).data)
+
     def perform_create(self, serializer):        
         lesson = serializer.validated_data.get('lesson')
         date = lesson.date  
@@ -8,3 +8,5 @@ class MainappConfig(AppConfig):
 
     def ready(self):
         import mainapp.signals
+        # Подключает обработчики сигналов Celery для метрик задач
+        import mainapp.metrics
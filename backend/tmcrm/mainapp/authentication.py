@@ -0,0 +1,108 @@
+from __future__ import annotations
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .cache import get_cached_user, set_cached_user
+
+
+# Все, что нужно запросу о пользователе: организация, ее настройки и профиль роли
+TENANT_SELECT_RELATED = (
+    "org",
+    "org__settings",
+    "teacher_profile__teacher",
+    "manager_profile__employer",
+    "student_profile__student",
+)
+
+# Атрибут HttpRequest, в котором JWTMiddleware оставляет результат аутентификации
+REQUEST_AUTH_ATTR = "tenant_auth"
+
+
+class TenantJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация, которая загружает пользователя вместе с организацией,
+    настройками организации и профилем одним запросом.
+
+    Если запрос уже аутентифицирован в JWTMiddleware тем же токеном,
+    результат берется оттуда и пользователь повторно не запрашивается.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        django_request = getattr(request, "_request", request)
+        cached = getattr(django_request, REQUEST_AUTH_ATTR, None)
+        if cached is not None and cached[0] == raw_token:
+            return cached[1]
+
+        validated_token = self.get_validated_token(raw_token)
+        user_auth_tuple = self.get_user(validated_token), validated_token
+        setattr(django_request, REQUEST_AUTH_ATTR, (raw_token, user_auth_tuple))
+        return user_auth_tuple
+
+    def get_user_queryset(self):
+        return self.user_model.objects.select_related(*TENANT_SELECT_RELATED)
+
+    def get_user(self, validated_token):
+        user = self.load_user(self.get_user_id(validated_token))
+        self.check_user(user, validated_token)
+        return user
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def load_user(self, user_id):
+        try:
+            return self.get_user_queryset().get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+    def check_user(self, user, validated_token) -> None:
+        """Те же проверки, что и в JWTAuthentication.get_user"""
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+
+class CachedJWTAuthentication(TenantJWTAuthentication):
+    """
+    TenantJWTAuthentication с кэшем пользователей по user_id: в памяти процесса
+    и в общем кэше. Кэшируется пользователь вместе с организацией и профилем,
+    поэтому повторные запросы с тем же токеном не обращаются к базе.
+
+    Кэш сбрасывается сигналами при изменении пользователя, его профиля,
+    организации и при занесении токена в черный список (mainapp.signals).
+    Сброс виден другим процессам только через общий кэш, поэтому без него
+    (settings.AUTH_USERS_CACHE) пользователь всегда читается из базы.
+    Проверки активности и смены пароля выполняются на каждом запросе.
+    Статистика попаданий - mainapp.cache.users_cache_stats.
+    """
+
+    def load_user(self, user_id):
+        if not settings.AUTH_USERS_CACHE:
+            return super().load_user(user_id)
+
+        user = get_cached_user(user_id)
+        if user is None:
+            user = super().load_user(user_id)
+            set_cached_user(user_id, user)
+        return user
@@ -0,0 +1,279 @@
+from __future__ import annotations
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple
+import pytz
+from django.core.cache import cache
+from .metrics import record_cache
+from .utils import DateFieldExcludeYear
+
+
+logger = logging.getLogger(__name__)
+
+ORGS_CACHE_KEY = "mainapp:orgs_meta"
+ORGS_VERSION_KEY = "mainapp:orgs_meta:version"
+# Сколько живут метаданные организаций в общем кэше
+ORGS_CACHE_TIMEOUT = 60 * 10
+# Сколько процесс доверяет своей копии, не сверяясь с версией в общем кэше
+ORGS_LOCAL_TTL = 5
+
+USERS_CACHE_KEY = "mainapp:auth_user"
+# Сколько живет пользователь для аутентификации в общем кэше
+USERS_CACHE_TIMEOUT = 60 * 5
+# Сколько процесс доверяет своей копии пользователя. Изменения из других
+# процессов (блокировка, смена пароля) видны не позже чем через это время
+USERS_LOCAL_TTL = 5
+# Раз в сколько обращений статистика кэша пользователей пишется в лог
+USERS_STATS_LOG_EVERY = 1000
+
+DEFAULT_ORG_TIMEZONE = "UTC"
+DEFAULT_REPEAT_LESSONS_UNTIL = DateFieldExcludeYear(8, 31)
+
+
+class LocalLRUCache:
+    """
+    Кэш в памяти процесса с ограничением размера (LRU) и временем жизни записей.
+    Стоит перед общим кэшем, чтобы частые чтения не ходили в Redis/базу.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class CacheStats:
+    """
+    Счетчики попаданий многоуровневого кэша в пределах процесса.
+    Те же значения уходят в метрику tmcrm_cache_requests с меткой cache=name
+    """
+
+    def __init__(self, name: str, log_every: int = 0):
+        self.name = name
+        self.log_every = log_every
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.local_hits = self.shared_hits = self.misses = 0
+
+    def record(self, level: str | None) -> None:
+        """level - "local", "shared" или None при промахе"""
+        with self._lock:
+            if level == "local":
+                self.local_hits += 1
+            elif level == "shared":
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+            total = self.local_hits + self.shared_hits + self.misses
+        record_cache(self.name, level)
+        if self.log_every and total % self.log_every == 0:
+            logger.info("Кэш %s: %s", self.name, self.as_dict())
+
+    def as_dict(self) -> dict:
+        total = self.local_hits + self.shared_hits + self.misses
+        hits = self.local_hits + self.shared_hits
+        return {
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+
+class OrgMeta(NamedTuple):
+    """Метаданные организации вместе с ее настройками"""
+    id: int
+    name: str
+    timezone: str
+    repeat_lessons_until: DateFieldExcludeYear
+
+    @property
+    def tzinfo(self):
+        return pytz.timezone(self.timezone)
+
+
+local_cache = LocalLRUCache(maxsize=256, ttl=ORGS_LOCAL_TTL)
+users_local_cache = LocalLRUCache(maxsize=1024, ttl=USERS_LOCAL_TTL)
+users_cache_stats = CacheStats("jwt_users", log_every=USERS_STATS_LOG_EVERY)
+orgs_cache_stats = CacheStats("orgs_meta")
+
+
+def _load_orgs_meta(org_ids=None) -> dict[int, OrgMeta]:
+    """Организации и их настройки одним запросом"""
+    from .models import Organization, OrgSettings
+
+    repeat_until_field = OrgSettings._meta.get_field("repeat_lessons_until")
+    queryset = Organization.objects.all()
+    if org_ids is not None:
+        queryset = queryset.filter(pk__in=org_ids)
+
+    rows = queryset.values_list(
+        "id", "name", "settings__timezone", "settings__repeat_lessons_until"
+    )
+    return {
+        org_id: OrgMeta(
+            org_id,
+            name,
+            tz_name or DEFAULT_ORG_TIMEZONE,
+            repeat_until_field.to_python(repeat_until) or DEFAULT_REPEAT_LESSONS_UNTIL,
+        )
+        for org_id, name, tz_name, repeat_until in rows
+    }
+
+
+def _new_version() -> int:
+    return time.time_ns()
+
+
+def get_versions(keys) -> tuple[int, ...]:
+    """
+    Счетчики версий в общем кэше (settings.CACHES), одни для всех процессов.
+    Отсутствующий счетчик (еще не создан или вытеснен) начинается не с 1,
+    а с текущего времени: иначе после вытеснения снова читались бы записи
+    под прежними версиями
+    """
+    keys = list(keys)
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), timeout=None)
+        # Счетчик мог одновременно создать другой процесс - берется записанное значение
+        versions.update(cache.get_many(missing))
+    return tuple(versions.get(key, 0) for key in keys)
+
+
+def bump_versions(keys) -> None:
+    """Меняет версии: записи под прежними версиями больше не читаются ни одним процессом"""
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), timeout=None)
+
+
+def get_orgs_version() -> int:
+    return get_versions([ORGS_VERSION_KEY])[0]
+
+
+def invalidate_orgs_cache() -> None:
+    """
+    Сбрасывает метаданные организаций: меняет версию в общем кэше
+    (старые записи больше не читаются) и локальную копию процесса.
+    Остальные процессы увидят изменения не позже чем через ORGS_LOCAL_TTL.
+    """
+    bump_versions([ORGS_VERSION_KEY])
+    local_cache.delete(ORGS_CACHE_KEY)
+
+
+def get_orgs_meta() -> dict[int, OrgMeta]:
+    """
+    {org_id: OrgMeta} для всех организаций.
+    Порядок поиска: память процесса -> общий кэш по текущей версии -> база.
+    """
+    orgs = local_cache.get(ORGS_CACHE_KEY)
+    if orgs is not None:
+        orgs_cache_stats.record("local")
+        return orgs
+
+    key = f"{ORGS_CACHE_KEY}:{get_orgs_version()}"
+    orgs = cache.get(key)
+    if orgs is None:
+        orgs_cache_stats.record(None)
+        orgs = _load_orgs_meta()
+        cache.set(key, orgs, timeout=ORGS_CACHE_TIMEOUT)
+    else:
+        orgs_cache_stats.record("shared")
+
+    local_cache.set(ORGS_CACHE_KEY, orgs)
+    return orgs
+
+
+def get_org_meta(org) -> OrgMeta | None:
+    """Метаданные одной организации по объекту или id"""
+    org_id = getattr(org, "pk", org)
+    if org_id is None:
+        return None
+
+    meta = get_orgs_meta().get(org_id)
+    if meta is None:
+        # Организация могла появиться после того, как копия процесса была загружена
+        meta = _load_orgs_meta([org_id]).get(org_id)
+    return meta
+
+
+def _user_cache_key(user_id) -> str:
+    return f"{USERS_CACHE_KEY}:{user_id}"
+
+
+def get_cached_user(user_id):
+    """
+    Пользователь для аутентификации вместе с загруженными связями
+    (организация, профиль) или None.
+    Порядок поиска: память процесса -> общий кэш.
+    Каждый вызов возвращает отдельный экземпляр, запросы не делят объект между собой.
+    """
+    key = _user_cache_key(user_id)
+    data = users_local_cache.get(key)
+    if data is not None:
+        users_cache_stats.record("local")
+        return pickle.loads(data)
+
+    data = cache.get(key)
+    if data is None:
+        users_cache_stats.record(None)
+        return None
+
+    users_local_cache.set(key, data)
+    users_cache_stats.record("shared")
+    return pickle.loads(data)
+
+
+def set_cached_user(user_id, user) -> None:
+    key = _user_cache_key(user_id)
+    data = pickle.dumps(user, protocol=pickle.HIGHEST_PROTOCOL)
+    cache.set(key, data, timeout=USERS_CACHE_TIMEOUT)
+    users_local_cache.set(key, data)
+
+
+def invalidate_users_cache(user_ids) -> None:
+    """Сбрасывает закэшированных пользователей в общем кэше и в памяти процесса"""
+    keys = [_user_cache_key(user_id) for user_id in user_ids if user_id is not None]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    for key in keys:
+        users_local_cache.delete(key)
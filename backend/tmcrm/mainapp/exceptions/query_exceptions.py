@@ -0,0 +1,5 @@
+class QueryBudgetExceeded(AssertionError):
+    """
+    Вьюсет выполнил больше запросов к базе, чем разрешено QUERY_INSPECTOR["BUDGETS"].
+    Наследуется от AssertionError, чтобы в тестах считаться проваленной проверкой
+    """
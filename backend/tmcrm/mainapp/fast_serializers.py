@@ -0,0 +1,187 @@
+from __future__ import annotations
+import threading
+from typing import Any, Callable, NamedTuple, TYPE_CHECKING
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+
+class FastField(NamedTuple):
+    """
+    Описание поля для быстрого режима, которое нельзя получить из колонки модели
+    (например SerializerMethodField).
+
+    paths - пути полей относительно модели сериализатора, как в values()
+    build - функция, получающая значения путей и возвращающая представление поля
+    """
+    paths: tuple[str, ...]
+    build: Callable[..., Any]
+
+
+class UnsupportedField(Exception):
+    """Поле сериализатора нельзя вычислить по колонкам выборки"""
+
+
+# Текущий часовой пояс определяется один раз на сериализацию списка,
+# а не для каждого значения DateTimeField
+_local = threading.local()
+
+
+def _current_timezone():
+    return timezone.get_current_timezone() if settings.USE_TZ else None
+
+
+def _datetime_to_representation(field: serializers.DateTimeField):
+    """
+    То же, что DateTimeField.to_representation для aware-значений в формате ISO 8601,
+    но с часовым поясом, вычисленным заранее. Остальные случаи отдаются полю DRF.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if hasattr(field, "timezone") or output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    def to_representation(value):
+        field_timezone = getattr(_local, "timezone", None)
+        if field_timezone is None or isinstance(value, str) or not timezone.is_aware(value):
+            return field.to_representation(value)
+        try:
+            value = value.astimezone(field_timezone).isoformat()
+        except OverflowError:
+            return field.to_representation(value)
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    return to_representation
+
+
+class FastSerializationPlan:
+    """
+    Скомпилированный план быстрой сериализации.
+
+    Вместо создания объектов моделей и обхода полей сериализатора для каждой строки
+    план один раз раскладывает поля (включая вложенные сериализаторы по FK)
+    на пути для values_list(), а затем собирает словари прямо из кортежей выборки.
+    Для значений используется to_representation тех же полей DRF, поэтому
+    результат совпадает с обычным сериализатором.
+
+    Поддерживаются обычные поля модели, PrimaryKeyRelatedField, вложенные
+    сериализаторы по прямым FK и поля из fast_fields сериализатора.
+    Для остальных полей (M2M, файлы, source с точкой и т.п.) план не строится.
+    """
+
+    def __init__(self, serializer: serializers.ModelSerializer):
+        self.paths: list[str] = []
+        self._indexes: dict[str, int] = {}
+        self._build = self._compile(serializer, prefix="")
+
+    def serialize(self, queryset: "QuerySet") -> list[dict]:
+        build = self._build
+        _local.timezone = _current_timezone()
+        return [build(row) for row in queryset.values_list(*self.paths)]
+
+    def iter_serialize(self, queryset: "QuerySet", chunk_size: int = 2000):
+        build = self._build
+        field_timezone = _current_timezone()
+        for row in queryset.values_list(*self.paths).iterator(chunk_size=chunk_size):
+            # Генератор может продолжаться в другом потоке (ASGI)
+            _local.timezone = field_timezone
+            yield build(row)
+
+    def iter_serialize_keyed(self, queryset: "QuerySet", key_path: str, chunk_size: int = 2000):
+        """Пары (значение key_path, представление строки) - для группировки за один проход"""
+        build = self._build
+        field_timezone = _current_timezone()
+        key_index = len(self.paths)
+        rows = queryset.values_list(*self.paths, key_path).iterator(chunk_size=chunk_size)
+        for row in rows:
+            _local.timezone = field_timezone
+            yield row[key_index], build(row)
+
+    def _index(self, path: str) -> int:
+        if path not in self._indexes:
+            self._indexes[path] = len(self.paths)
+            self.paths.append(path)
+        return self._indexes[path]
+
+    def _compile(self, serializer, prefix: str) -> Callable[[tuple], dict]:
+        model = serializer.Meta.model
+        fast_fields = getattr(type(serializer), "fast_fields", {})
+        getters = []
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            getters.append((name, self._compile_field(model, name, field, fast_fields, prefix)))
+
+        def build(row):
+            return {name: getter(row) for name, getter in getters}
+
+        return build
+
+    def _compile_field(self, model, name, field, fast_fields, prefix):
+        if name in fast_fields:
+            fast_field = fast_fields[name]
+            indexes = [self._index(prefix + path) for path in fast_field.paths]
+            fast_build = fast_field.build
+            return lambda row: fast_build(*[row[i] for i in indexes])
+
+        source = field.source
+        if source == "*" or "." in source:
+            raise UnsupportedField(name)
+        if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField,
+                              serializers.FileField, serializers.SerializerMethodField)):
+            raise UnsupportedField(name)
+
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            raise UnsupportedField(name)
+        if not model_field.concrete or model_field.many_to_many:
+            raise UnsupportedField(name)
+
+        index = self._index(prefix + source)
+
+        if isinstance(field, serializers.BaseSerializer):
+            if not model_field.is_relation:
+                raise UnsupportedField(name)
+            nested_build = self._compile(field, prefix=f"{prefix}{source}__")
+            return lambda row: None if row[index] is None else nested_build(row)
+
+        if isinstance(field, serializers.RelatedField):
+            if type(field) is not serializers.PrimaryKeyRelatedField or field.pk_field is not None:
+                raise UnsupportedField(name)
+            return lambda row: row[index]
+
+        if model_field.is_relation:
+            raise UnsupportedField(name)
+
+        if isinstance(field, serializers.DateTimeField):
+            to_representation = _datetime_to_representation(field)
+        else:
+            to_representation = field.to_representation
+        return lambda row: None if row[index] is None else to_representation(row[index])
+
+
+_plans: dict[tuple, FastSerializationPlan | None] = {}
+
+
+def get_fast_plan(serializer_class, **kwargs) -> FastSerializationPlan | None:
+    """
+    План для класса сериализатора и набора исключений (exclude_fields / un_exclude_fields).
+    Компилируется один раз, None - если сериализатор нельзя ускорить.
+    """
+    key = (
+        serializer_class,
+        tuple(kwargs.get("exclude_fields", ())),
+        tuple(kwargs.get("un_exclude_fields", ())),
+    )
+    if key not in _plans:
+        try:
+            _plans[key] = FastSerializationPlan(serializer_class(**kwargs))
+        except UnsupportedField:
+            _plans[key] = None
+    return _plans[key]
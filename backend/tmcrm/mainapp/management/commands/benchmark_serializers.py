@@ -0,0 +1,131 @@
+import time as timer
+from datetime import date, time, timedelta
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from mainapp.fast_serializers import get_fast_plan
+from mainapp.models import Organization, User, SubjectColor
+from employers.models import Employer, Teacher
+from students.models import Student, StudentGroup
+from lesson_schedule.models import Attendance, Classroom, Lesson, Subject
+from lesson_schedule.serializers.read import AttendanceReadSerializer, ScheduleReadSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает обычную и быструю сериализацию списков занятий и посещений. "
+        "Данные создаются во временной транзакции и откатываются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        rows, repeat = options["rows"], options["repeat"]
+
+        with transaction.atomic():
+            org = self._create_data(rows)
+            lessons = Lesson.objects.filter(org=org).select_related(
+                "teacher__employer", "subject__color", "group", "classroom", "period_schedule"
+            )
+            attendances = Attendance.objects.filter(org=org)
+
+            failed = False
+            for serializer_class, queryset in (
+                (ScheduleReadSerializer, lessons),
+                (AttendanceReadSerializer, attendances),
+            ):
+                failed |= not self._compare(serializer_class, queryset, repeat)
+
+            transaction.set_rollback(True)
+
+        if failed:
+            raise CommandError("Результаты быстрой сериализации отличаются")
+
+    def _compare(self, serializer_class, queryset, repeat) -> bool:
+        renderer = JSONRenderer()
+        plan = get_fast_plan(serializer_class)
+        if plan is None:
+            raise CommandError(f"{serializer_class.__name__} не поддерживает быстрый режим")
+
+        def drf():
+            return renderer.render(serializer_class(queryset.all(), many=True).data)
+
+        def fast():
+            return renderer.render(plan.serialize(queryset.all()))
+
+        drf_time, drf_body = self._measure(drf, repeat)
+        fast_time, fast_body = self._measure(fast, repeat)
+        equal = drf_body == fast_body
+
+        self.stdout.write(
+            f"{serializer_class.__name__}: {queryset.count()} строк, "
+            f"DRF {drf_time:.3f} c, быстрый режим {fast_time:.3f} c, "
+            f"ускорение x{drf_time / fast_time:.1f}, "
+            f"{len(fast_body)} байт, совпадение: {'да' if equal else 'нет'}"
+        )
+        return equal
+
+    @staticmethod
+    def _measure(func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            started = timer.perf_counter()
+            result = func()
+            elapsed = timer.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    @staticmethod
+    def _create_data(rows: int) -> Organization:
+        user = User.objects.create_user(username="benchmark_serializers", password=None)
+        org = Organization.objects.create(name="benchmark_serializers", created_by=user)
+        kwargs = {"org": org, "created_by": user}
+
+        employer = Employer.objects.create(name="Иван", surname="Иванов", **kwargs)
+        teacher = Teacher.objects.create(employer=employer, **kwargs)
+        color = SubjectColor.objects.create(color_hex="#123456", title="Бенчмарк", **kwargs)
+        subject = Subject.objects.create(name="Математика", color=color, **kwargs)
+        classroom = Classroom.objects.create(title="101", floor=1, **kwargs)
+        student = Student.objects.create(
+            name="Алексей", surname="Смирнов", birthday=date(2005, 3, 15), **kwargs
+        )
+        group = StudentGroup.objects.create(name="benchmark_serializers", **kwargs)
+        group.students.set([student])
+
+        start = date(2025, 1, 1)
+        lessons = []
+        for i in range(rows):
+            lesson_date = start + timedelta(days=i // 8)
+            lesson = Lesson(
+                title=f"Занятие {i}",
+                date=lesson_date,
+                week_day=lesson_date.isoweekday(),
+                start_time=time(8 + i % 8),
+                end_time=time(8 + i % 8, 45),
+                teacher=teacher,
+                subject=subject,
+                group=group if i % 3 else None,
+                classroom=classroom if i % 5 else None,
+                **kwargs,
+            )
+            lesson.duration = lesson.calc_duration
+            lessons.append(lesson)
+        lessons = Lesson.objects.bulk_create(lessons, batch_size=1000)
+
+        Attendance.objects.bulk_create(
+            [
+                Attendance(
+                    lesson=lesson,
+                    student=student,
+                    lesson_date=lesson.date,
+                    was_present=bool(i % 2),
+                    **kwargs,
+                )
+                for i, lesson in enumerate(lessons)
+            ],
+            batch_size=1000,
+        )
+        return org
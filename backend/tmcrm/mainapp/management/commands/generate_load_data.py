@@ -0,0 +1,68 @@
+import time as timer
+from datetime import date
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError
+from mainapp.models import Organization
+from mainapp.services.load_data import LoadDataConfig, LoadDataGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует синтетические данные нескольких организаций для нагрузочного тестирования: "
+        "сотрудники, ученики, группы, периодические расписания, занятия, посещения, оценки, "
+        "начисления и снимки учеников. При одинаковом --seed данные совпадают"
+    )
+
+    def add_arguments(self, parser):
+        defaults = LoadDataConfig()
+        parser.add_argument("--orgs", type=int, default=defaults.orgs)
+        parser.add_argument("--teachers", type=int, default=defaults.teachers, help="Преподавателей в организации")
+        parser.add_argument("--groups", type=int, default=defaults.groups, help="Групп в организации")
+        parser.add_argument("--students-per-group", type=int, default=defaults.students_per_group)
+        parser.add_argument("--classrooms", type=int, default=defaults.classrooms)
+        parser.add_argument("--subjects", type=int, default=defaults.subjects)
+        parser.add_argument(
+            "--lessons-per-week", type=int, default=defaults.lessons_per_group_week,
+            help="Периодических расписаний на группу",
+        )
+        parser.add_argument("--years", type=float, default=2, help="Длительность периода занятий в годах")
+        parser.add_argument("--start-date", type=date.fromisoformat, default=defaults.start_date)
+        parser.add_argument(
+            "--completed-until", type=date.fromisoformat, default=None,
+            help="Занятия до этой даты завершены и имеют посещения (по умолчанию - все)",
+        )
+        parser.add_argument("--seed", type=int, default=defaults.seed)
+        parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+        parser.add_argument("--prefix", default=defaults.prefix, help="Префикс имен организаций и пользователей")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        config = LoadDataConfig(
+            orgs=options["orgs"],
+            teachers=options["teachers"],
+            groups=options["groups"],
+            students_per_group=options["students_per_group"],
+            classrooms=options["classrooms"],
+            subjects=options["subjects"],
+            lessons_per_group_week=options["lessons_per_week"],
+            start_date=options["start_date"],
+            weeks=max(1, round(options["years"] * 52)),
+            completed_until=options["completed_until"],
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            prefix=options["prefix"],
+        )
+
+        if Organization.objects.filter(name__startswith=f"{config.prefix}_").exists():
+            raise CommandError(f"Данные с префиксом {config.prefix} уже созданы, укажите другой --prefix")
+
+        students = config.students_per_group * config.groups
+        lessons = config.groups * config.lessons_per_group_week * config.weeks
+        self.stdout.write(self.style.NOTICE(
+            f"Организаций: {config.orgs}, на каждую ~{students} учеников, ~{lessons} занятий "
+            f"и ~{lessons * config.students_per_group} посещений"
+        ))
+
+        started = timer.perf_counter()
+        generator = LoadDataGenerator(config, log=self.stdout.write)
+        generator.generate()
+        self.stdout.write(self.style.SUCCESS(f"Готово за {timer.perf_counter() - started:.1f} c"))
@@ -0,0 +1,160 @@
+"""
+Метрики Prometheus: время ответа по действиям вьюсетов, запросы к базе на запрос,
+длительность и обработанные строки фоновых задач, попадания в кэши.
+
+При запуске в нескольких процессах (gunicorn, celery prefork) нужно задать
+переменную окружения PROMETHEUS_MULTIPROC_DIR - общий каталог, в который процессы
+пишут значения, /metrics собирает их вместе. Каталог очищается перед стартом,
+а в конфиге gunicorn вызывается mark_process_dead:
+
+    def child_exit(server, worker):
+        from mainapp.metrics import mark_process_dead
+        mark_process_dead(worker.pid)
+
+/metrics отдается только сборщику по токену METRICS_TOKEN в заголовке
+Authorization: Bearer. Доступ по адресам METRICS_ALLOWED_IPS включается явно
+и не подходит для запуска за локальным прокси (см. settings).
+"""
+from __future__ import annotations
+import hmac
+import os
+import time
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Запросы, не сопоставленные ни с одним маршрутом, пишутся под одной меткой,
+# чтобы произвольные URL не порождали новые временные ряды
+UNMATCHED_VIEW = "unmatched"
+
+REQUEST_LATENCY = Histogram(
+    "tmcrm_http_request_duration_seconds",
+    "Время обработки запроса",
+    ["view", "action", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "tmcrm_http_request_db_queries",
+    "Количество запросов к базе за один HTTP-запрос",
+    ["view", "action"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+)
+REQUEST_DB_TIME = Histogram(
+    "tmcrm_http_request_db_duration_seconds",
+    "Суммарное время запросов к базе за один HTTP-запрос",
+    ["view", "action"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+TASK_DURATION = Histogram(
+    "tmcrm_celery_task_duration_seconds",
+    "Длительность выполнения задачи Celery",
+    ["task", "state"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+TASK_ROWS = Counter(
+    "tmcrm_celery_task_rows",
+    "Строки, созданные или измененные задачей",
+    ["task"],
+)
+
+CACHE_REQUESTS = Counter(
+    "tmcrm_cache_requests",
+    "Обращения к кэшам: result - local, shared или miss",
+    ["cache", "result"],
+)
+
+
+def track_task_rows(task: str, rows: int) -> None:
+    if rows:
+        TASK_ROWS.labels(task=task).inc(rows)
+
+
+def record_cache(cache: str, level: str | None) -> None:
+    """level - "local", "shared" или None при промахе"""
+    CACHE_REQUESTS.labels(cache=cache, result=level or "miss").inc()
+
+
+def view_labels(request) -> tuple[str, str]:
+    """
+    Имя вьюсета и действие. Для вьюсетов DRF действие берется из карты
+    метод -> действие маршрута (list, retrieve, by_teachers, ...)
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return UNMATCHED_VIEW, ""
+
+    func = match.func
+    view_class = getattr(func, "cls", None) or getattr(func, "view_class", None)
+    if view_class is None:
+        return match.view_name or getattr(func, "__name__", UNMATCHED_VIEW), ""
+
+    actions = getattr(func, "actions", None) or {}
+    return view_class.__name__, actions.get(request.method.lower(), request.method.lower())
+
+
+class QueryStats:
+    """Обертка execute_wrapper: считает запросы к базе и их суммарное время"""
+
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+_task_started: dict[str, float] = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        TASK_DURATION.labels(task=task.name, state=state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+def get_registry():
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def mark_process_dead(pid: int) -> None:
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        multiprocess.mark_process_dead(pid)
+
+
+def _metrics_allowed(request) -> bool:
+    """Сборщик узнается по токену METRICS_TOKEN или по адресу из явно заданного METRICS_ALLOWED_IPS"""
+    if request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    return bool(token) and scheme.lower() == "bearer" and hmac.compare_digest(credentials.encode(), token.encode())
+
+
+def metrics_view(request):
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
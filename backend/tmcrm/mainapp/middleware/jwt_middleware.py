@@ -1,10 +1,15 @@
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from mainapp.authentication import CachedJWTAuthentication
 
 
 class JWTMiddleware:
+    """
+    Аутентифицирует запрос по JWT до DRF, чтобы пользователь был доступен
+    остальным middleware. Результат сохраняется в запросе и переиспользуется
+    при аутентификации DRF, поэтому пользователь загружается один раз
+    """
     def __init__(self, get_response):
         self.get_response = get_response
-        self.authenticator = JWTAuthentication()
+        self.authenticator = CachedJWTAuthentication()
 
     def __call__(self, request):
         try:
@@ -0,0 +1,36 @@
+import time
+from django.db import connection
+from mainapp.metrics import (
+    QueryStats, REQUEST_DB_QUERIES, REQUEST_DB_TIME, REQUEST_LATENCY, view_labels,
+)
+from mainapp.streaming import observe_streaming_response
+
+
+class PrometheusMiddleware:
+    """
+    Время ответа, количество и время запросов к базе для каждого запроса.
+    Метки - вьюсет и действие, а не URL, поэтому число рядов не растет с данными.
+    Ставится первым в MIDDLEWARE, чтобы учитывать остальные middleware.
+    Потоковый ответ замеряется до конца отдачи: запросы к базе идут при чтении содержимого
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryStats()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+
+        def observe():
+            view, action = view_labels(request)
+            REQUEST_LATENCY.labels(
+                view=view, action=action, method=request.method, status=f"{response.status_code // 100}xx"
+            ).observe(time.perf_counter() - started)
+            REQUEST_DB_QUERIES.labels(view=view, action=action).observe(queries.count)
+            REQUEST_DB_TIME.labels(view=view, action=action).observe(queries.duration)
+
+        if not observe_streaming_response(response, queries, observe):
+            observe()
+        return response
@@ -0,0 +1,58 @@
+import random
+from functools import partial
+from django.db import connection
+from mainapp.exceptions.query_exceptions import QueryBudgetExceeded
+from mainapp.metrics import view_labels
+from mainapp.query_inspector import QueryInspector, get_budget, get_config, log_report
+from mainapp.streaming import observe_streaming_response
+
+
+class QueryInspectorMiddleware:
+    """
+    Отчет о запросах к базе за HTTP-запрос: повторяющиеся отпечатки (N+1),
+    суммарное время и самые медленные запросы с местом вызова.
+    Включается QUERY_INSPECTOR["ENABLED"], в продакшене - с SAMPLE_RATE < 1.
+    Для потокового ответа отчет пишется после отдачи, а превышение бюджета
+    только логируется: заголовки к этому моменту уже отправлены
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_config()
+        if not config["ENABLED"] or random.random() >= config["SAMPLE_RATE"]:
+            return self.get_response(request)
+
+        inspector = QueryInspector(config["SLOW_QUERY_MS"])
+        with connection.execute_wrapper(inspector):
+            response = self.get_response(request)
+
+        finish = partial(self.log_report, request, response, inspector, config)
+        if observe_streaming_response(response, inspector, finish):
+            return response
+
+        report = finish()
+        if report["over_budget"] and config["RAISE_ON_BUDGET"]:
+            raise QueryBudgetExceeded(
+                f"{report['view']}.{report['action']}: {report['queries']} запросов при бюджете {report['budget']}"
+            )
+        return response
+
+    @staticmethod
+    def log_report(request, response, inspector, config) -> dict:
+        view, action = view_labels(request)
+        budget = get_budget(config, view, action)
+
+        report = inspector.report(
+            config,
+            method=request.method,
+            path=request.path,
+            view=view,
+            action=action,
+            status=response.status_code,
+            budget=budget,
+            over_budget=budget is not None and inspector.total > budget,
+        )
+        log_report(report)
+        return report
@@ -16,6 +16,10 @@ def get_current_user() -> 'User | None':
     return current_user.get()
 
 def get_current_org() -> 'Organization | None':
+    org = current_org.get()
+    if org is not None:
+        return org
+
     user = get_current_user() 
 
     if not user:
@@ -23,11 +27,23 @@ def get_current_org() -> 'Organization | None':
     return user.get_org
 
 class GetCurrentUserMiddleware():
+    """
+    Кладет пользователя и его организацию в ContextVar на время запроса.
+    Организация уже загружена вместе с пользователем при аутентификации,
+    после ответа значения сбрасываются
+    """
 
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
         user = request.user
-        current_user.set(user)
-        return self.get_response(request)
+        org = getattr(user, "org", None) if getattr(user, "is_authenticated", False) else None
+
+        user_token = current_user.set(user)
+        org_token = current_org.set(org)
+        try:
+            return self.get_response(request)
+        finally:
+            current_org.reset(org_token)
+            current_user.reset(user_token)
@@ -106,6 +106,14 @@ class SubjectColor(BaseModelOrg):
         return f"{self.title}"
 
 
+# Связи User с профилями по ролям
+ROLE_PROFILE_RELATED_NAMES = {
+    UserRole.TEACHER: "teacher_profile",
+    UserRole.MANAGER: "manager_profile",
+    UserRole.STUDENT: "student_profile",
+}
+
+
 class User(AbstractUser, BaseModelOrg):
     role = models.CharField(max_length=20, choices=UserRole.choices, default=UserRole.USER)
 
@@ -125,7 +133,10 @@ class User(AbstractUser, BaseModelOrg):
     #     return None
 
     def get_user_profile(self):
-        return getattr(self, "profile", None), self.role
+        """Профиль, соответствующий роли пользователя, и сама роль"""
+        related_name = ROLE_PROFILE_RELATED_NAMES.get(self.role)
+        profile = getattr(self, related_name, None) if related_name else None
+        return profile, self.role
 
     def get_student_profile(self):
         return getattr(self, "student_profile", None), UserRole.STUDENT
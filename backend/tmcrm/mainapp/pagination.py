@@ -0,0 +1,220 @@
+from __future__ import annotations
+import base64
+import heapq
+import json
+from itertools import islice
+from typing import TYPE_CHECKING
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (keyset / cursor).
+
+    Записи упорядочиваются по полям ordering, курсор хранит значения этих полей
+    у последней записи страницы, а следующая страница выбирается условием
+    "строго после курсора" - (a > x) OR (a = x AND b > y) OR ... Поэтому стоимость
+    запроса не зависит от того, насколько глубоко пролистан список.
+
+    Ключ берется из атрибута вьюсета pagination_ordering (по умолчанию ("id",)),
+    последнее поле ключа должно быть уникальным. Поля с "-" сортируются по убыванию,
+    пустые значения всегда идут в конце.
+
+    Список всегда отдается страницами (по умолчанию page_size записей)
+    в виде {"next": ..., "results": [...]}. Старые клиенты, ожидающие массив,
+    передают ?legacy=true, а вьюсет может оставить массив атрибутом
+    legacy_list_response = True. Такой ответ тоже ограничен: без page_size
+    в нем не больше max_page_size записей, ссылка на следующую страницу
+    передается в заголовке Link: <url>; rel="next".
+    """
+
+    page_size = 50
+    max_page_size = 1000
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    legacy_query_param = "legacy"
+    ordering = ("id",)
+    invalid_cursor_message = "Неверный курсор"
+
+    def __init__(self):
+        self.next_cursor = None
+        self.request = None
+        self.legacy = False
+
+    def is_requested(self, request) -> bool:
+        """Клиент сам запросил страницу (page_size или cursor)"""
+        params = request.query_params
+        return self.page_size_query_param in params or self.cursor_query_param in params
+
+    def is_legacy(self, request, view=None) -> bool:
+        """Ответ - массив без обертки (старый формат)"""
+        return (
+            getattr(view, "legacy_list_response", False)
+            or request.query_params.get(self.legacy_query_param) == "true"
+        )
+
+    def get_ordering(self, view) -> tuple[str, ...]:
+        return tuple(getattr(view, "pagination_ordering", None) or self.ordering)
+
+    def get_page_size(self, request) -> int:
+        # Старый формат без page_size раньше отдавал весь список - даем максимум
+        default = self.max_page_size if self.legacy else self.page_size
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return default
+        if page_size <= 0:
+            return default
+        return min(page_size, self.max_page_size)
+
+    def _start_page(self, request, view) -> None:
+        self.request = request
+        self.next_cursor = None
+        self.legacy = self.is_legacy(request, view)
+
+    def paginate_queryset(self, queryset: "QuerySet", request, view=None):
+        # Уже ограниченную выборку (например, ?last=N) нельзя пересортировать
+        if queryset.query.is_sliced:
+            return None
+
+        self._start_page(request, view)
+        ordering = self.get_ordering(view)
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self._order_by(ordering))
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            values = self.decode_cursor(encoded, queryset.model, ordering)
+            queryset = queryset.filter(self._after_cursor_q(queryset.model, ordering, values))
+
+        page = list(queryset[: page_size + 1])
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self.encode_cursor(page[-1], ordering)
+
+        return page
+
+    def get_paginated_response(self, data):
+        if self.legacy:
+            next_link = self.get_next_link()
+            headers = {"Link": f'<{next_link}>; rel="next"'} if next_link else None
+            return Response(data, headers=headers)
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self) -> str | None:
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def paginate_merged(self, queryset: "QuerySet", items: list, request, view=None, key=None):
+        """
+        Страница выборки, в которую вливаются объекты не из базы (items), например
+        вычисленные занятия. key(obj) - значения полей ключа объекта (по умолчанию -
+        его поля), у объектов items они должны быть заполнены. Поля ключа - только
+        по возрастанию. Курсор тот же, что и у paginate_queryset
+        """
+        self._start_page(request, view)
+        ordering = self.get_ordering(view)
+        if any(self._split(field)[1] for field in ordering):
+            raise ValueError("paginate_merged поддерживает только ключ по возрастанию")
+        key = key or (lambda obj: self._values(obj, ordering))
+        sort_key = lambda obj: self.sort_key(key(obj))
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self._order_by(ordering))
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            values = self.decode_cursor(encoded, queryset.model, ordering)
+            queryset = queryset.filter(self._after_cursor_q(queryset.model, ordering, values))
+            after = self.sort_key(values)
+            items = [item for item in items if sort_key(item) > after]
+
+        merged = heapq.merge(queryset[: page_size + 1], sorted(items, key=sort_key), key=sort_key)
+        page = list(islice(merged, page_size + 1))
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = self._encode_values(key(page[-1]))
+
+        return page
+
+    @staticmethod
+    def sort_key(values) -> tuple:
+        """Ключ сортировки в памяти в том же порядке, что и в базе: пустые значения в конце"""
+        return tuple((value is None, value) for value in values)
+
+    @staticmethod
+    def _split(field: str) -> tuple[str, bool]:
+        return (field[1:], True) if field.startswith("-") else (field, False)
+
+    def _order_by(self, ordering):
+        expressions = []
+        for field in ordering:
+            name, descending = self._split(field)
+            expression = F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_last=True)
+            expressions.append(expression)
+        return expressions
+
+    def _after_cursor_q(self, model, ordering, values) -> Q:
+        """Условие "запись строго после курсора" для составного ключа"""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name, descending = self._split(field)
+            if value is None:
+                # Пустые значения стоят в конце, после них по этому полю ничего нет
+                after, same = Q(pk__in=[]), Q(**{f"{name}__isnull": True})
+            else:
+                lookup = "lt" if descending else "gt"
+                after = Q(**{f"{name}__{lookup}": value})
+                if model._meta.get_field(name).null:
+                    after |= Q(**{f"{name}__isnull": True})
+                same = Q(**{name: value})
+            condition |= equal & after
+            equal &= same
+        return condition
+
+    def _values(self, instance, ordering) -> list:
+        return [
+            getattr(instance, instance._meta.get_field(self._split(field)[0]).attname)
+            for field in ordering
+        ]
+
+    def _encode_values(self, values) -> str:
+        payload = json.dumps(list(values), cls=DjangoJSONEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def encode_cursor(self, instance, ordering) -> str:
+        return self._encode_values(self._values(instance, ordering))
+
+    def decode_cursor(self, encoded: str, model, ordering) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            return [
+                None if value is None else model._meta.get_field(self._split(field)[0]).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import json
+import logging
+import re
+import time
+import traceback
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": False,
+    # Доля инспектируемых запросов (1 - все)
+    "SAMPLE_RATE": 1.0,
+    # Сколько одинаковых запросов за запрос считается N+1
+    "N_PLUS_ONE_THRESHOLD": 5,
+    # Запросы медленнее этого попадают в отчет всегда
+    "SLOW_QUERY_MS": 100,
+    # Сколько самых медленных запросов показывать в отчете
+    "SLOWEST": 5,
+    # Бюджет запросов: {"ScheduleViewSet": 10, "ScheduleViewSet.by_teachers": 15}
+    "BUDGETS": {},
+    # Бросать QueryBudgetExceeded при превышении бюджета (для тестов)
+    "RAISE_ON_BUDGET": False,
+}
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACES = re.compile(r"\s+")
+
+# Кадры стека из этих путей не считаются местом вызова запроса
+_SKIP_FRAMES = ("site-packages", "/django/", "/rest_framework/", "query_inspector.py", "middleware/")
+
+
+def get_config() -> dict:
+    return {**DEFAULTS, **getattr(settings, "QUERY_INSPECTOR", {})}
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Отпечаток запроса без значений: списки IN любой длины, числа и строки
+    заменяются заглушками, поэтому одинаковые запросы с разными параметрами совпадают
+    """
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def _origin() -> str | None:
+    """Ближайший к запросу кадр кода проекта: файл:строка функция"""
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        if not any(part in frame.filename for part in _SKIP_FRAMES):
+            return f"{frame.filename}:{frame.lineno} {frame.name}"
+    return None
+
+
+class QueryInspector:
+    """
+    Обертка для connection.execute_wrapper: собирает отпечатки, время
+    и место вызова запросов. Стек снимается только для первого запроса
+    с каждым отпечатком и для медленных запросов
+    """
+
+    def __init__(self, slow_query_ms: float):
+        self.slow_query_ms = slow_query_ms
+        self.total = 0
+        self.duration = 0.0
+        # отпечаток -> [количество, место первого вызова]
+        self.fingerprints: dict[str, list] = {}
+        self.slow: list[tuple[float, str, str | None]] = []
+        self.timings: list[tuple[float, str]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.total += 1
+            self.duration += elapsed_ms
+
+            key = fingerprint(sql)
+            entry = self.fingerprints.get(key)
+            if entry is None:
+                self.fingerprints[key] = [1, _origin()]
+            else:
+                entry[0] += 1
+
+            self.timings.append((elapsed_ms, key))
+            if elapsed_ms >= self.slow_query_ms:
+                self.slow.append((elapsed_ms, sql, _origin()))
+
+    def report(self, config: dict, **meta) -> dict:
+        n_plus_one = [
+            {"fingerprint": key, "count": count, "origin": origin}
+            for key, (count, origin) in self.fingerprints.items()
+            if count >= config["N_PLUS_ONE_THRESHOLD"]
+        ]
+        n_plus_one.sort(key=lambda item: -item["count"])
+
+        slowest = sorted(self.timings, reverse=True)[:config["SLOWEST"]]
+        return {
+            **meta,
+            "queries": self.total,
+            "db_ms": round(self.duration, 2),
+            "n_plus_one": n_plus_one,
+            "slowest": [
+                {"ms": round(ms, 2), "fingerprint": key, "origin": self.fingerprints[key][1]}
+                for ms, key in slowest
+            ],
+            "slow": [
+                {"ms": round(ms, 2), "sql": sql, "origin": origin} for ms, sql, origin in self.slow
+            ],
+        }
+
+
+def get_budget(config: dict, view: str, action: str) -> int | None:
+    budgets = config["BUDGETS"]
+    return budgets.get(f"{view}.{action}", budgets.get(view))
+
+
+def log_report(report: dict) -> None:
+    has_issues = report["n_plus_one"] or report["slow"] or report.get("over_budget")
+    logger.log(
+        logging.WARNING if has_issues else logging.DEBUG,
+        "query report %s",
+        json.dumps(report, ensure_ascii=False, default=str),
+    )
@@ -1,6 +1,7 @@
 from typing import Type
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db.models import Manager, prefetch_related_objects
 from .models import Organization, SubjectColor
 from .constants import HttpMethodLiteral
 
@@ -44,11 +45,44 @@ class BaseSerializerExcludeFields(serializers.ModelSerializer):
         model = None
         fields = '__all__'
 
+class PrefetchListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer, который перед сериализацией догружает связанные объекты
+    сразу для всех строк - по одному запросу на связь, независимо от числа строк.
+
+    Связи берутся из Meta.list_prefetch_related дочернего сериализатора
+    в виде {поле: (lookup, ...)}, учитываются только поля, которые остались
+    после exclude_fields. Уже загруженные через select_related связи
+    повторно не запрашиваются.
+    """
+
+    def get_prefetch_lookups(self) -> list[str]:
+        lookups_by_field = getattr(self.child.Meta, "list_prefetch_related", {})
+        fields = self.child.fields
+        return [
+            lookup
+            for field_name, lookups in lookups_by_field.items()
+            if field_name in fields
+            for lookup in lookups
+        ]
+
+    def to_representation(self, data):
+        instances = list(data.all() if isinstance(data, Manager) else data)
+        lookups = self.get_prefetch_lookups()
+        if instances and lookups:
+            prefetch_related_objects(instances, *lookups)
+        return [self.child.to_representation(item) for item in instances]
+
+
 class BaseReadSerializer(BaseSerializerExcludeFields):
-    def __init__(self, *args, **kwargs): # Все поля по умолчанию read_only
-        super().__init__(*args, **kwargs)
-        for field in self.fields.values():
+    # Быстрый режим списков через values_list (см. mainapp.fast_serializers)
+    fast_serialization = False
+
+    def get_fields(self): # Все поля по умолчанию read_only
+        fields = super().get_fields()
+        for field in fields.values():
             field.read_only = True
+        return fields
 
     class Meta(BaseSerializerExcludeFields.Meta):
         ...
@@ -0,0 +1,309 @@
+import random
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Iterable, NamedTuple
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from employers.models import Employer, Teacher
+from lesson_schedule.models import (
+    Attendance, Classroom, GRADE_CHOICES, Grade, Lesson, PeriodLesson, Subject,
+)
+from lesson_schedule.utils import extend_materialized_lessons, MATERIALIZATION_BATCH_SIZE
+from search.constants import SearchKind
+from search.services import schedule_reindex
+from students.constants import AccuralCategory
+from students.models import Accrual, Student, StudentGroup, StudentsSnapshot
+from ..constants import UserRole
+from ..models import Organization, SubjectColor, TeacherProfile
+
+User = get_user_model()
+
+NAMES = ("Иван", "Мария", "Алексей", "Анна", "Дмитрий", "Елена", "Сергей", "Ольга", "Павел", "Наталья")
+SURNAMES = ("Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов")
+SUBJECTS = ("Математика", "Физика", "Химия", "Информатика", "Биология", "История", "Литература", "Английский")
+GRADE_VALUES = tuple(value for value, _ in GRADE_CHOICES)
+ACCRUAL_CATEGORIES = tuple(AccuralCategory.values)
+
+# Первое занятие в день и количество пар подряд
+FIRST_LESSON_HOUR = 8
+LESSON_SLOTS = 10
+
+
+class LoadDataConfig(NamedTuple):
+    """Размеры синтетических данных одной организации"""
+    orgs: int = 3
+    teachers: int = 10
+    groups: int = 20
+    students_per_group: int = 12
+    classrooms: int = 8
+    subjects: int = 6
+    # Периодических расписаний (занятий в неделю) на группу
+    lessons_per_group_week: int = 3
+    start_date: date = date(2025, 1, 6)
+    weeks: int = 12
+    # Занятия до этой даты помечаются завершенными и получают посещения и оценки
+    completed_until: date | None = None
+    presence_share: float = 0.85
+    grade_share: float = 0.3
+    # Начислений баллов на ученика в месяц
+    accruals_per_student_month: int = 2
+    seed: int = 42
+    batch_size: int = 5000
+    prefix: str = "load"
+
+
+class LoadDataGenerator:
+    """
+    Генератор синтетических данных нескольких организаций: сотрудники,
+    ученики, группы, периодические расписания и созданные по ним занятия,
+    посещения и оценки.
+
+    Все записи создаются пачками: самые объемные таблицы (посещения, оценки,
+    начисления) на PostgreSQL пишутся через COPY из кортежей без создания
+    объектов моделей, на остальных СУБД - через bulk_create.
+    Сигналы моделей (кроме создания организации и пользователя) не вызываются.
+    Результат детерминирован для одного и того же seed.
+    """
+
+    def __init__(self, config: LoadDataConfig = LoadDataConfig(), log: Callable[[str], None] | None = None):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.log = log or (lambda message: None)
+
+    @property
+    def end_date(self) -> date:
+        return self.config.start_date + timedelta(weeks=self.config.weeks, days=-1)
+
+    @property
+    def completed_until(self) -> date:
+        return self.config.completed_until or self.end_date + timedelta(days=1)
+
+    def generate(self) -> list[Organization]:
+        orgs = []
+        for index in range(self.config.orgs):
+            # Дневные итоги аналитики и поисковые документы занятий обновляются
+            # после фиксации транзакции по сигналу создания занятий,
+            # их дни покрывают и посещения, и оценки
+            with transaction.atomic():
+                orgs.append(self.generate_org(index))
+        return orgs
+
+    def generate_org(self, index: int) -> Organization:
+        name = f"{self.config.prefix}_{index}"
+        user = User.objects.create_user(username=name, password=None, role=UserRole.ADMIN)
+        # Настройки организации создаются сигналом
+        org = Organization.objects.create(name=name, created_by=user)
+        user.org = org
+        user.save(update_fields=["org"])
+        kwargs = {"org": org, "created_by": user}
+
+        teachers = self._create_teachers(kwargs)
+        subjects = self._create_subjects(kwargs)
+        classrooms = Classroom.objects.bulk_create(
+            [Classroom(title=str(100 + i), floor=1 + i // 10, **kwargs) for i in range(self.config.classrooms)]
+        )
+        groups, students = self._create_groups(name, kwargs)
+
+        period_lessons = self._create_period_lessons(groups, teachers, subjects, classrooms, kwargs)
+        lessons = self._materialize(period_lessons)
+        attendances, grades = self._create_attendances_and_grades(org, user)
+        accruals = self._create_accruals(teachers, students, kwargs)
+        snapshots = self._create_snapshots(len(students), kwargs)
+
+        self.log(
+            f"{name}: {len(groups)} групп, {len(students)} учеников, {len(period_lessons)} расписаний, "
+            f"{lessons} занятий, {attendances} посещений, {grades} оценок, "
+            f"{accruals} начислений, {snapshots} снимков"
+        )
+        return org
+
+    def _person(self) -> dict:
+        return {"name": self.rng.choice(NAMES), "surname": self.rng.choice(SURNAMES)}
+
+    def _create_teachers(self, kwargs) -> list[Teacher]:
+        employers = Employer.objects.bulk_create(
+            [Employer(**self._person(), **kwargs) for _ in range(self.config.teachers)]
+        )
+        return Teacher.objects.bulk_create([Teacher(employer=employer, **kwargs) for employer in employers])
+
+    def _create_subjects(self, kwargs) -> list[Subject]:
+        colors = list(SubjectColor.objects.filter(org__isnull=True).order_by("pk"))
+        return Subject.objects.bulk_create(
+            [
+                Subject(
+                    name=SUBJECTS[i % len(SUBJECTS)],
+                    color=colors[i % len(colors)] if colors else None,
+                    **kwargs,
+                )
+                for i in range(self.config.subjects)
+            ]
+        )
+
+    def _create_groups(self, prefix: str, kwargs) -> list[StudentGroup]:
+        groups = StudentGroup.objects.bulk_create(
+            [StudentGroup(name=f"{prefix}-{i + 1}", **kwargs) for i in range(self.config.groups)]
+        )
+        students = Student.objects.bulk_create(
+            [
+                Student(
+                    **self._person(),
+                    birthday=date(2005, 1, 1) + timedelta(days=self.rng.randrange(365 * 8)),
+                    **kwargs,
+                )
+                for _ in range(self.config.groups * self.config.students_per_group)
+            ],
+            batch_size=self.config.batch_size,
+        )
+
+        size = self.config.students_per_group
+        StudentGroup.students.through.objects.bulk_create(
+            [
+                StudentGroup.students.through(studentgroup_id=group.pk, student_id=student.pk)
+                for i, group in enumerate(groups)
+                for student in students[i * size:(i + 1) * size]
+            ],
+            batch_size=self.config.batch_size,
+        )
+        # bulk_create не отправляет сигналы, документы учеников и групп - после фиксации
+        schedule_reindex(SearchKind.STUDENT, [student.pk for student in students])
+        schedule_reindex(SearchKind.GROUP, [group.pk for group in groups])
+        return groups, students
+
+    def _create_period_lessons(self, groups, teachers, subjects, classrooms, kwargs) -> list[PeriodLesson]:
+        period_lessons = []
+        for group_index, group in enumerate(groups):
+            for k in range(self.config.lessons_per_group_week):
+                weekday = (group_index + 2 * k) % 5
+                slot = (group_index + k) % LESSON_SLOTS
+                period_lessons.append(
+                    PeriodLesson(
+                        title=f"{group.name} #{k + 1}",
+                        start_time=time(FIRST_LESSON_HOUR + slot),
+                        end_time=time(FIRST_LESSON_HOUR + slot, 45),
+                        teacher=self.rng.choice(teachers),
+                        classroom=self.rng.choice(classrooms),
+                        group=group,
+                        subject=self.rng.choice(subjects),
+                        period=7,
+                        start_date=self.config.start_date + timedelta(days=weekday),
+                        repeat_lessons_until_date=self.end_date,
+                        **kwargs,
+                    )
+                )
+        return PeriodLesson.objects.bulk_create(period_lessons, batch_size=self.config.batch_size)
+
+    def _materialize(self, period_lessons) -> int:
+        created = 0
+        for i in range(0, len(period_lessons), MATERIALIZATION_BATCH_SIZE):
+            created += extend_materialized_lessons(
+                period_lessons[i:i + MATERIALIZATION_BATCH_SIZE], self.end_date
+            )
+        return created
+
+    def _create_attendances_and_grades(self, org, user) -> tuple[int, int]:
+        completed = Lesson.objects.filter(org=org, date__lt=self.completed_until)
+        now = timezone.now()
+        completed.update(is_completed=True, completed_at=now)
+
+        group_students: dict[int, list[int]] = {}
+        for group_id, student_id in (
+            StudentGroup.students.through.objects.filter(studentgroup__org=org)
+            .order_by("studentgroup_id", "student_id")
+            .values_list("studentgroup_id", "student_id")
+        ):
+            group_students.setdefault(group_id, []).append(student_id)
+
+        # Занятия читаются целиком заранее: пока идет COPY, соединение занято
+        lessons = list(
+            completed.filter(group__isnull=False).order_by("pk").values_list("pk", "group_id", "date")
+        )
+
+        attendance_fields = ("lesson_id", "student_id", "lesson_date", "was_present", "org_id", "created_by_id", "created_at")
+        grade_fields = ("lesson_id", "student_id", "grade_date", "value", "comment", "org_id", "created_by_id", "created_at", "updated_at")
+        attendances, grades = [], []
+        created_attendances = created_grades = 0
+
+        for lesson_id, group_id, lesson_date in lessons:
+            for student_id in group_students.get(group_id, ()):
+                was_present = self.rng.random() < self.config.presence_share
+                attendances.append((lesson_id, student_id, lesson_date, was_present, org.pk, user.pk, now))
+                if was_present and self.rng.random() < self.config.grade_share:
+                    grades.append(
+                        (lesson_id, student_id, lesson_date, self.rng.choice(GRADE_VALUES), "", org.pk, user.pk, now, now)
+                    )
+
+            if len(attendances) >= self.config.batch_size:
+                created_attendances += self._insert_rows(Attendance, attendance_fields, attendances)
+                created_grades += self._insert_rows(Grade, grade_fields, grades)
+                attendances, grades = [], []
+
+        created_attendances += self._insert_rows(Attendance, attendance_fields, attendances)
+        created_grades += self._insert_rows(Grade, grade_fields, grades)
+        return created_attendances, created_grades
+
+    def _create_accruals(self, teachers, students, kwargs) -> int:
+        profiles = TeacherProfile.objects.bulk_create([TeacherProfile(teacher=teacher, **kwargs) for teacher in teachers])
+        org_id, user_id = kwargs["org"].pk, kwargs["created_by"].pk
+        days = (self.end_date - self.config.start_date).days + 1
+        months = max(1, self.config.weeks * 7 // 30)
+
+        fields = ("amount", "teacher_profile_id", "student_id", "category", "comment", "org_id", "created_by_id", "created_at")
+        rows, created = [], 0
+        for student in students:
+            for month in range(months):
+                for _ in range(self.config.accruals_per_student_month):
+                    rows.append(
+                        (
+                            self.rng.randint(1, 10), self.rng.choice(profiles).pk, student.pk,
+                            self.rng.choice(ACCRUAL_CATEGORIES), None, org_id, user_id,
+                            self._accrual_created_at(month, days),
+                        )
+                    )
+            if len(rows) >= self.config.batch_size:
+                created += self._insert_rows(Accrual, fields, rows)
+                rows = []
+        return created + self._insert_rows(Accrual, fields, rows)
+
+    def _accrual_created_at(self, month: int, days: int) -> datetime:
+        """Время начисления: случайный день своего месяца периода в рабочие часы"""
+        day = min(month * 30 + self.rng.randrange(30), days - 1)
+        moment = time(FIRST_LESSON_HOUR + self.rng.randrange(LESSON_SLOTS), self.rng.randrange(60))
+        return timezone.make_aware(datetime.combine(self.config.start_date + timedelta(days=day), moment))
+
+    def _create_snapshots(self, total_students: int, kwargs) -> int:
+        """Ежедневные снимки количества учеников: рост с 70% до текущего состава"""
+        days = (self.end_date - self.config.start_date).days + 1
+        snapshots = [
+            StudentsSnapshot(
+                date=self.config.start_date + timedelta(days=day),
+                total_clients=round(total_students * (0.7 + 0.3 * day / max(days - 1, 1))),
+                **kwargs,
+            )
+            for day in range(days)
+        ]
+        StudentsSnapshot.objects.bulk_create(snapshots, batch_size=self.config.batch_size)
+        return len(snapshots)
+
+    def _insert_rows(self, model, fields: tuple[str, ...], rows: Iterable[tuple]) -> int:
+        """
+        Вставляет кортежи значений (поля заданы по attname).
+        На PostgreSQL - одной командой COPY, иначе через bulk_create.
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+
+        if connection.vendor == "postgresql":
+            columns = ", ".join(
+                connection.ops.quote_name(model._meta.get_field(field).column) for field in fields
+            )
+            table = connection.ops.quote_name(model._meta.db_table)
+            with connection.cursor() as cursor:
+                with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+        else:
+            model.objects.bulk_create(
+                [model(**dict(zip(fields, row))) for row in rows], batch_size=self.config.batch_size
+            )
+        return len(rows)
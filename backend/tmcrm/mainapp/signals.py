@@ -1,7 +1,13 @@
 from django.db.models.signals import post_migrate, post_save, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 from .utils import checkout_table, checkout_interval_schedule_table, delete_cache
-from .models import User, UserSettings, Organization, OrgSettings, SubjectColor
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .cache import invalidate_orgs_cache, invalidate_users_cache
+from .models import (
+    User, UserSettings, Organization, OrgSettings, SubjectColor,
+    ManagerProfile, TeacherProfile, StudentProfile,
+)
 
 
 colors = [
@@ -65,15 +71,54 @@ def create_org_settings(sender, instance, created, **kwargs):
             org=instance, 
             created_by=instance.created_by 
         )
-        created_by = instance.created_by
-        User.objects.filter(username=created_by).update(org=instance)
+        users = User.objects.filter(pk=instance.created_by_id)
+        user_ids = list(users.values_list("pk", flat=True))
+        users.update(org=instance)
+        _invalidate_users(user_ids)
 
 
 
-# Обновляет кеш организаций
+# Обновляет кеш организаций и их метаданных (часовой пояс, настройки)
 @receiver([post_save, post_delete], sender=Organization)
+@receiver([post_save, post_delete], sender=OrgSettings)
 def clear_orgs_cache_on_save(sender, instance=None, **kwargs):
     delete_cache('mainapp.Organization')
+    invalidate_orgs_cache()
+    # Повторно после коммита, чтобы другой процесс не успел закэшировать старые данные
+    transaction.on_commit(invalidate_orgs_cache)
+
+    # Пользователи кэшируются для аутентификации вместе с организацией и ее настройками
+    org_id = instance.pk if sender is Organization else instance.org_id
+    if org_id is not None:
+        _invalidate_users(User.objects.filter(org_id=org_id).values_list("pk", flat=True))
+
+
+def _invalidate_users(user_ids):
+    """Сбрасывает пользователей в кэше аутентификации сейчас и после коммита"""
+    user_ids = list(user_ids)
+    invalidate_users_cache(user_ids)
+    transaction.on_commit(lambda: invalidate_users_cache(user_ids))
+
+
+# Сбрасывает кэш аутентификации при изменении пользователя
+@receiver([post_save, post_delete], sender=User)
+def clear_user_auth_cache(sender, instance, **kwargs):
+    _invalidate_users([instance.pk])
+
+
+# Профиль кэшируется вместе с пользователем
+@receiver([post_save, post_delete], sender=ManagerProfile)
+@receiver([post_save, post_delete], sender=TeacherProfile)
+@receiver([post_save, post_delete], sender=StudentProfile)
+def clear_user_auth_cache_on_profile(sender, instance, **kwargs):
+    _invalidate_users([instance.user_id])
+
+
+# Токен пользователя занесен в черный список (выход, ротация, блокировка)
+@receiver(post_save, sender=BlacklistedToken)
+def clear_user_auth_cache_on_blacklist(sender, instance, created, **kwargs):
+    if created:
+        _invalidate_users([instance.token.user_id])
 
 # Инициализирует задачи Celery
 @receiver(post_migrate)
@@ -82,9 +127,13 @@ def setup_periodic_tasks(sender, **kwargs):
     from lesson_schedule.utils import (
         init_task_create_update_complete_lessons_task,
         init_task_create_attendences_for_all_passes,
+        init_task_extend_lessons_horizon,
     )
     from students.utils import init_task_save_clients_snapshot
+    from analisys.utils import init_task_rebuild_recent_daily_rollups
 
     init_task_create_update_complete_lessons_task()
     init_task_create_attendences_for_all_passes()
+    init_task_extend_lessons_horizon()
     init_task_save_clients_snapshot()
+    init_task_rebuild_recent_daily_rollups()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+import json
+from itertools import islice
+from typing import Callable, Iterable, Iterator, TYPE_CHECKING
+from django.db import connection
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+from .fast_serializers import get_fast_plan
+
+if TYPE_CHECKING:
+    from rest_framework.request import Request
+
+
+STREAM_QUERY_PARAM = "stream"
+STREAM_CHUNK_SIZE = 2000
+# Примерный размер куска ответа, который отдается серверу за раз
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def is_stream_requested(request: "Request") -> bool:
+    return request.query_params.get(STREAM_QUERY_PARAM, "").lower() in ("1", "true")
+
+
+def _json_encoder() -> json.JSONEncoder:
+    """Кодировщик с теми же настройками, что и JSONRenderer DRF"""
+    return encoders.JSONEncoder(
+        ensure_ascii=not api_settings.UNICODE_JSON,
+        allow_nan=not api_settings.STRICT_JSON,
+        separators=(",", ":") if api_settings.COMPACT_JSON else (", ", ": "),
+    )
+
+
+def iter_serialized(
+    items: Iterable,
+    serializer_class,
+    context: dict | None = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    **serializer_kwargs,
+) -> Iterator[dict]:
+    """
+    Сериализует выборку по частям, не держа в памяти весь результат.
+    Для сериализаторов с быстрым режимом строки читаются через values_list,
+    для остальных объекты сериализуются пачками по chunk_size.
+    """
+    if isinstance(items, QuerySet):
+        if getattr(serializer_class, "fast_serialization", False):
+            plan = get_fast_plan(serializer_class, **serializer_kwargs)
+            if plan is not None:
+                yield from plan.iter_serialize(items, chunk_size=chunk_size)
+                return
+        items = items.iterator(chunk_size=chunk_size)
+
+    items = iter(items)
+    while chunk := list(islice(items, chunk_size)):
+        yield from serializer_class(chunk, many=True, context=context, **serializer_kwargs).data
+
+
+def iter_json_array(items: Iterable, head: dict | None = None, key: str | None = None) -> Iterator[bytes]:
+    """
+    Пишет JSON-массив по элементам. Если переданы head и key,
+    массив становится значением key в объекте с остальными полями из head.
+    """
+    encoder = _json_encoder()
+    colon = ":" if api_settings.COMPACT_JSON else ": "
+    comma = "," if api_settings.COMPACT_JSON else ", "
+
+    def encode(value) -> str:
+        # Как в JSONRenderer: эти символы допустимы в JSON, но не в JavaScript
+        return encoder.encode(value).replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+    if key is not None:
+        opening = encode(head or {})[:-1]
+        opening += (comma if head else "") + encode(key) + colon + "["
+        closing = "]}"
+    else:
+        opening, closing = "[", "]"
+
+    buffer, size = [opening], len(opening)
+    separator = ""
+    for item in items:
+        chunk = separator + encode(item)
+        separator = comma
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= STREAM_BUFFER_SIZE:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+
+    buffer.append(closing)
+    yield "".join(buffer).encode()
+
+
+def streaming_json_response(items: Iterable, head: dict | None = None, key: str | None = None) -> StreamingHttpResponse:
+    return StreamingHttpResponse(
+        iter_json_array(items, head=head, key=key), content_type="application/json"
+    )
+
+
+class _ObservedContent:
+    """
+    Содержимое потокового ответа, которое отдается под оберткой запросов к базе.
+    close вызывается через response.close после отдачи ответа или при обрыве соединения
+    """
+
+    def __init__(self, content: Iterable, wrapper, on_close: Callable[[], None]):
+        self.content = content
+        self.wrapper = wrapper
+        self.on_close = on_close
+        self.iterator = None
+
+    def _iterate(self) -> Iterator:
+        with connection.execute_wrapper(self.wrapper):
+            yield from self.content
+
+    def __iter__(self) -> Iterator:
+        self.iterator = self._iterate()
+        return self.iterator
+
+    def close(self) -> None:
+        # Прерванная отдача снимает обертку до отчета, а не при сборке мусора
+        if self.iterator is not None:
+            self.iterator.close()
+        on_close, self.on_close = self.on_close, None
+        if on_close is not None:
+            on_close()
+
+
+def observe_streaming_response(response, wrapper, on_close: Callable[[], None]) -> bool:
+    """
+    Продлевает наблюдение за запросом на отдачу потокового ответа: запросы к базе
+    при чтении содержимого идут через wrapper, а on_close вызывается после отдачи.
+    Возвращает False для обычных и асинхронных потоковых ответов - их middleware
+    завершает сама
+    """
+    if not getattr(response, "streaming", False) or getattr(response, "is_async", False):
+        return False
+    # Закрытие исходного содержимого Django уже зарегистрировал при его установке
+    response.streaming_content = _ObservedContent(response.streaming_content, wrapper, on_close)
+    return True
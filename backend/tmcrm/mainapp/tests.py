@@ -1,5 +1,5 @@
 from datetime import date, time
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.db.models import Q
 from rest_framework.test import APITestCase
@@ -8,7 +8,7 @@ from employers.models import Employer, Teacher
 from students.models import Student, StudentGroup
 from lesson_schedule.models import Lesson, Classroom, Subject
 from .services.orgs import create_user_with_org
-from auth.tokens import token
+from accounts.tokens import token
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from datetime import datetime, timedelta
@@ -36,13 +36,16 @@ class BaseSetupDB(APITestCase):
 
     @classmethod
     def setUpTestData(cls) -> None:
-        # Организация
-        cls.org = Organization.objects.create(name="Test_Org")
-
+        # Пользователь создается первым: настройки организации записываются от его имени,
+        # и сигнал создания организации сам закрепляет его за ней
         cls.user = create_user_with_org(
-            org=cls.org, password="pass123", username="testuser"
+            org=None, password="pass123", username="testuser"
         )
 
+        # Организация
+        cls.org = Organization.objects.create(name="Test_Org", created_by=cls.user)
+        cls.user.refresh_from_db()
+
         cls.employer1 = Employer.create_manager.create(
             org=cls.org,
             name="Иван",
@@ -147,8 +150,8 @@ class BaseSetupDB(APITestCase):
             week_day=6,
             is_canceled=False,
             is_completed=False,
-            start_time="12:00:00",
-            end_time="13:30:00",
+            start_time=time(12, 0),
+            end_time=time(13, 30),
             org=cls.org,
             created_by=cls.user,
         )
@@ -162,8 +165,8 @@ class BaseSetupDB(APITestCase):
             week_day=6,
             is_canceled=False,
             is_completed=False,
-            start_time="13:00:00",
-            end_time="14:00:00",
+            start_time=time(13, 0),
+            end_time=time(14, 0),
             org=cls.org,
             created_by=cls.user,
         )
@@ -177,8 +180,8 @@ class BaseSetupDB(APITestCase):
             week_day=6,
             is_canceled=False,
             is_completed=False,
-            start_time="13:50:00",
-            end_time="15:00:00",
+            start_time=time(13, 50),
+            end_time=time(15, 0),
             org=cls.org,
             created_by=cls.user,
         )
@@ -187,6 +190,230 @@ class BaseSetupDB(APITestCase):
 
 class TestSignals(BaseSetupDB):
 
-    def test_settings_signal(self):                      
-        url=f'/api/'
-        self.client.post(url=url, data=data, format="json")
\ No newline at end of file
+    def test_settings_signal(self):
+        from .models import OrgSettings
+
+        settings = OrgSettings.objects.get(org=self.org)
+        self.assertEqual(settings.created_by, self.user)
+        self.assertEqual(self.user.org, self.org)
+
+class TestOrgsMetaCache(BaseSetupDB):
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .cache import local_cache
+
+        super().setUp()
+        local_cache.clear()
+        cache.clear()
+
+    def test_cached_and_invalidated_by_settings(self):
+        from .cache import get_org_meta, get_orgs_meta
+        from .models import OrgSettings
+
+        get_orgs_meta()
+        with self.assertNumQueries(0):
+            meta = get_org_meta(self.org)
+        self.assertEqual(meta.name, self.org.name)
+
+        org_settings, _ = OrgSettings.objects.get_or_create(org=self.org)
+        org_settings.timezone = "Europe/Moscow"
+        org_settings.save()
+
+        self.assertEqual(get_org_meta(self.org.pk).timezone, "Europe/Moscow")
+
+    def test_invalidation_from_other_process(self):
+        from .cache import ORGS_VERSION_KEY, bump_versions, get_org_meta, local_cache
+
+        get_org_meta(self.org)
+        Organization.objects.filter(pk=self.org.pk).update(name="Renamed")
+        # Другой процесс меняет версию в общем кэше, копию этого процесса он не видит
+        bump_versions([ORGS_VERSION_KEY])
+        self.assertEqual(get_org_meta(self.org).name, self.org.name)
+
+        # Истек ORGS_LOCAL_TTL
+        local_cache.clear()
+        self.assertEqual(get_org_meta(self.org).name, "Renamed")
+
+    def test_version_not_reused_after_eviction(self):
+        from django.core.cache import cache
+        from .cache import ORGS_VERSION_KEY, get_orgs_version, invalidate_orgs_cache
+
+        first = get_orgs_version()
+        invalidate_orgs_cache()
+        cache.delete(ORGS_VERSION_KEY)
+        self.assertNotIn(get_orgs_version(), (first, first + 1))
+
+
+class TestTenantAuthentication(BaseSetupDB):
+
+    def setUp(self):
+        super().setUp()
+        self._clear_users_cache()
+
+    def tearDown(self):
+        # Пользователь из кэша переживает откат транзакции теста
+        self._clear_users_cache()
+        super().tearDown()
+
+    def _clear_users_cache(self):
+        from django.core.cache import cache
+        from .cache import users_local_cache
+
+        users_local_cache.clear()
+        cache.clear()
+
+    def test_user_loaded_once_per_request(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/schedule/classrooms/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        user_queries = [q for q in ctx.captured_queries if 'FROM "mainapp_user"' in q["sql"]]
+        self.assertEqual(len(user_queries), 1)
+        # Организация подтягивается тем же запросом
+        self.assertFalse(any('FROM "mainapp_organization"' in q["sql"] for q in ctx.captured_queries))
+
+    @override_settings(AUTH_USERS_CACHE=True)
+    def test_user_cached_and_invalidated_on_save(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def user_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get("/api/schedule/classrooms/")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return sum('FROM "mainapp_user"' in q["sql"] for q in ctx.captured_queries)
+
+        user_queries()
+        self.assertEqual(user_queries(), 0)
+
+        self.user.first_name = "Петр"
+        self.user.save()
+        self.assertEqual(user_queries(), 1)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get("/api/schedule/classrooms/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_not_cached_without_shared_cache(self):
+        from .cache import _user_cache_key, users_local_cache
+
+        with override_settings(AUTH_USERS_CACHE=False):
+            self.client.get("/api/schedule/classrooms/")
+        self.assertIsNone(users_local_cache.get(_user_cache_key(self.user.pk)))
+
+
+class TestPrometheusMetrics(BaseSetupDB):
+
+    def test_request_metrics_by_viewset_action(self):
+        from prometheus_client import REGISTRY
+
+        labels = {"view": "ClassroomViewSet", "action": "list"}
+
+        def sample(name, extra=None):
+            return REGISTRY.get_sample_value(name, {**labels, **(extra or {})}) or 0
+
+        before = sample("tmcrm_http_request_duration_seconds_count", {"method": "GET", "status": "2xx"})
+        queries_before = sample("tmcrm_http_request_db_queries_count")
+
+        self.client.get("/api/schedule/classrooms/")
+
+        self.assertEqual(
+            sample("tmcrm_http_request_duration_seconds_count", {"method": "GET", "status": "2xx"}), before + 1
+        )
+        self.assertEqual(sample("tmcrm_http_request_db_queries_count"), queries_before + 1)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer secret")
+        with override_settings(METRICS_TOKEN="secret"):
+            response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b"tmcrm_http_request_duration_seconds", response.content)
+
+    def test_metrics_closed_by_default(self):
+        # За локальным прокси все запросы приходят с 127.0.0.1
+        self.client.credentials()
+        self.assertEqual(self.client.get("/metrics").status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(METRICS_ALLOWED_IPS=["127.0.0.1"], METRICS_TOKEN="secret")
+    def test_metrics_only_for_collector(self):
+        # Без токена пользователя из setUp: сборщик приходит со своим
+        self.client.credentials()
+        external = {"REMOTE_ADDR": "203.0.113.5"}
+        self.assertEqual(self.client.get("/metrics", **external).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong", **external).status_code,
+            status.HTTP_403_FORBIDDEN,
+        )
+        self.assertEqual(
+            self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret", **external).status_code,
+            status.HTTP_200_OK,
+        )
+
+    def test_streaming_response_measured_until_consumed(self):
+        from prometheus_client import REGISTRY
+
+        labels = {"view": "ScheduleViewSet", "action": "list"}
+
+        def db_queries():
+            return REGISTRY.get_sample_value("tmcrm_http_request_db_queries_sum", labels) or 0
+
+        before = db_queries()
+        response = self.client.get("/api/schedule/lessons/?stream=true")
+        self.assertTrue(response.streaming)
+        # Запросы к базе идут при чтении содержимого, метрика пишется после отдачи
+        self.assertEqual(db_queries(), before)
+        b"".join(response.streaming_content)
+        self.assertGreater(db_queries(), before)
+
+
+class TestQueryInspector(BaseSetupDB):
+
+    def test_fingerprint_ignores_values(self):
+        from .query_inspector import fingerprint
+
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "name" = \'a\''),
+            fingerprint('SELECT * FROM  "t" WHERE "id" IN (%s) AND "name" = \'b\''),
+        )
+
+    def test_n_plus_one_reported(self):
+        from django.db import connection
+        from .query_inspector import QueryInspector, get_config
+
+        inspector = QueryInspector(slow_query_ms=1000)
+        with connection.execute_wrapper(inspector):
+            for employer in Employer.objects.all():
+                Organization.objects.filter(pk=employer.org_id).first()
+
+        report = inspector.report({**get_config(), "N_PLUS_ONE_THRESHOLD": 2})
+        self.assertEqual(len(report["n_plus_one"]), 1)
+        self.assertIn("test_n_plus_one_reported", report["n_plus_one"][0]["origin"])
+
+    def test_budget_exceeded_raises(self):
+        from django.test import override_settings
+        from .exceptions.query_exceptions import QueryBudgetExceeded
+
+        config = {"ENABLED": True, "BUDGETS": {"ClassroomViewSet.list": 0}, "RAISE_ON_BUDGET": True}
+        with override_settings(QUERY_INSPECTOR=config):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get("/api/schedule/classrooms/")
+
+    def test_streaming_report_after_response_consumed(self):
+        import json
+        from django.test import override_settings
+
+        config = {"ENABLED": True, "BUDGETS": {"ScheduleViewSet.list": 0}, "RAISE_ON_BUDGET": True}
+        with override_settings(QUERY_INSPECTOR=config):
+            with self.assertNoLogs("mainapp.query_inspector"):
+                response = self.client.get("/api/schedule/lessons/?stream=true")
+            self.assertTrue(response.streaming)
+            with self.assertLogs("mainapp.query_inspector") as logs:
+                b"".join(response.streaming_content)
+
+        report = json.loads(logs.records[-1].getMessage().split(" ", 2)[2])
+        self.assertTrue(report["over_budget"])
+        self.assertGreater(report["queries"], 1)
@@ -11,6 +11,9 @@ from django.core.cache import cache
 from django.utils import timezone
 
 
+CACHE_TIMEOUT = 60 * 10
+
+
 class CacheType(str, Enum):
     MODEL = "model"
     OTHER = 'other'
@@ -50,7 +53,8 @@ def get_cache(key: str, cache_type: CacheType='model'):
     if result is None:
         raise ValueError(f"Не удалось получить значение для ключа: {key} (тип кэша: {cache_type})")
 
-    cache.set(key, result, timeout=0)
+    # timeout=0 в Django означает немедленное истечение, поэтому задается явный срок
+    cache.set(key, result, timeout=CACHE_TIMEOUT)
     return result
 
 
@@ -58,12 +62,33 @@ def delete_cache(key):
     cache.delete(key)
 
 def get_org_local_datetime(org):
-    """"Функция возвращает локальное время для заданной организации"""
+    """"Функция возвращает локальное время для заданной организации (объект или id)"""
+    from .cache import get_org_meta
 
-    tz = pytz.timezone(org.settings.timezone)
+    meta = get_org_meta(org)
+    tz = meta.tzinfo if meta else pytz.timezone("UTC")
     return timezone.now().astimezone(tz)
 
 
+def group_orgs_by_timezone(orgs=None) -> dict[str, dict[int, str]]:
+    """
+    Группирует организации по часовому поясу по закэшированным метаданным.
+    Возвращает {timezone: {org_id: org_name}}.
+    Организации без настроек попадают в UTC (значение по умолчанию OrgSettings).
+    """
+    from .cache import get_orgs_meta
+
+    orgs_meta = get_orgs_meta()
+    if orgs:
+        org_ids = {getattr(org, "pk", org) for org in orgs}
+        orgs_meta = {org_id: meta for org_id, meta in orgs_meta.items() if org_id in org_ids}
+
+    grouped: dict[str, dict[int, str]] = {}
+    for meta in orgs_meta.values():
+        grouped.setdefault(meta.timezone, {})[meta.id] = meta.name
+    return grouped
+
+
 # Декоратор который передает в функцию дополнительный
 # позиционный аргумент который получает все возможные организации
 def request_orgs(func):
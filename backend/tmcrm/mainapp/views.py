@@ -18,6 +18,9 @@ from .serializers import ColorSerializer, OrganizationWriteSerializer, Organizat
 from .permissions import OrgNameMatchPermission, IsAuthenticatedAndSameOrganization
 from .models import User, SubjectColor
 from .middleware.threadlocals import get_current_user
+from .pagination import KeysetPagination
+from .fast_serializers import get_fast_plan
+from .streaming import is_stream_requested, iter_serialized, streaming_json_response
 
 if TYPE_CHECKING:
     from rest_framework import permissions
@@ -127,6 +130,9 @@ class BaseViewSetWithOrdByOrg(GetCurrentSerializerMixin, ModelViewSet):
     abstract = True
 
     filter_backends = [DjangoFilterBackend]
+    pagination_class = KeysetPagination
+    # Ключ пагинации, последнее поле должно быть уникальным
+    pagination_ordering: tuple[str, ...] = ("id",)
 
 
     def perform_create(self, serializer, **kwargs):        
@@ -149,6 +155,39 @@ class BaseViewSetWithOrdByOrg(GetCurrentSerializerMixin, ModelViewSet):
         user_org = self.request.user.get_org
         return queryset.filter(Q(org=user_org) | Q(org__isnull=True))
 
+    def get_fast_plan(self):
+        """План быстрой сериализации списка, если сериализатор его поддерживает"""
+        serializer_class = self.get_serializer_class()
+        if not getattr(serializer_class, "fast_serialization", False):
+            return None
+        return get_fast_plan(serializer_class)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # ?stream=true без page_size/cursor - явная выгрузка всего списка:
+        # ответ пишется по мере чтения выборки, без сборки всего списка
+        if is_stream_requested(request) and not self.paginator.is_requested(request):
+            return streaming_json_response(
+                iter_serialized(
+                    queryset,
+                    self.get_serializer_class(),
+                    context=self.get_serializer_context(),
+                )
+            )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        plan = self.get_fast_plan()
+        if plan is not None:
+            return Response(plan.serialize(queryset))
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=["GET"])
     def post_schema(self, request): 
         serializer: BaseWriteSerializer = self.get_serializer()
@@ -0,0 +1,151 @@
+"""
+Автодополнение имен учеников, преподавателей, групп и аудиторий.
+
+Для каждой организации в памяти процесса хранится отсортированный список
+слов всех подписей (префиксный индекс): поиск - бинарный поиск первого слова
+запроса и проверка остальных слов по префиксам. Список строится одним
+запросом и живет AUTOCOMPLETE_LOCAL_TTL секунд под версией данных
+организации. Версия - счетчик в общем кэше (settings.CACHES, в продакшене
+Redis), он меняется при правке подписей и еще раз после ее коммита, поэтому
+следующий запрос в любом процессе строит список заново. С кэшем в памяти процесса
+(TMCRM_CACHE=locmem) версия своя у каждого процесса, и правки из других
+процессов видны не позже чем через AUTOCOMPLETE_LOCAL_TTL - как и массовые
+вставки без сигналов. Браузер может показывать прежний ответ еще
+AUTOCOMPLETE_MAX_AGE секунд.
+"""
+from __future__ import annotations
+import hashlib
+from bisect import bisect_left
+from typing import Callable, NamedTuple
+from django.apps import apps as django_apps
+from django.db.models import Q
+from mainapp.cache import CacheStats, LocalLRUCache, bump_versions, get_versions
+
+
+AUTOCOMPLETE_VERSION_KEY = "search:autocomplete:version"
+# Сколько процесс хранит список имен организации
+AUTOCOMPLETE_LOCAL_TTL = 60 * 5
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+# Сколько браузер может повторно показывать ответ без запроса (ввод с задержкой)
+AUTOCOMPLETE_MAX_AGE = 10
+
+NO_ORG_SCOPE = "none"
+
+autocomplete_local_cache = LocalLRUCache(maxsize=512, ttl=AUTOCOMPLETE_LOCAL_TTL)
+autocomplete_cache_stats = CacheStats("autocomplete")
+
+
+class AutocompleteSource(NamedTuple):
+    """Откуда берутся подписи: модель, поля и сборка подписи из их значений"""
+    model: str
+    fields: tuple[str, ...]
+    label: Callable[..., str]
+
+
+def _join(*values) -> str:
+    return " ".join(str(value) for value in values if value not in (None, ""))
+
+
+SOURCES = {
+    "student": AutocompleteSource("students.Student", ("surname", "name"), _join),
+    "teacher": AutocompleteSource(
+        "employers.Teacher", ("employer__surname", "employer__name", "employer__patronymic"), _join
+    ),
+    "group": AutocompleteSource("students.StudentGroup", ("name",), _join),
+    "classroom": AutocompleteSource(
+        "lesson_schedule.Classroom",
+        ("title", "building"),
+        lambda title, building: f"{title} ({building})" if building else title,
+    ),
+}
+
+
+class AutocompleteIndex:
+    """
+    Подписи, отсортированные по алфавиту, и отсортированные слова подписей
+    со ссылками на них. Неизменяемый, поэтому один экземпляр безопасно
+    читают параллельные запросы
+    """
+
+    def __init__(self, rows):
+        entries = sorted(((label.lower(), object_id, label) for object_id, label in rows))
+        self.entries = [(object_id, label) for _, object_id, label in entries]
+        self.words = [tuple(lowered.split()) for lowered, *_ in entries]
+
+        tokens = sorted((word, position) for position, words in enumerate(self.words) for word in set(words))
+        self.tokens = [word for word, _ in tokens]
+        self.positions = [position for _, position in tokens]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def lookup(self, query: str, limit: int = AUTOCOMPLETE_LIMIT) -> list[dict]:
+        words = query.lower().split()
+        if not words:
+            return []
+        first, rest = words[0], words[1:]
+
+        found = set()
+        start = bisect_left(self.tokens, first)
+        for index in range(start, len(self.tokens)):
+            if not self.tokens[index].startswith(first):
+                break
+            found.add(self.positions[index])
+
+        results = []
+        for position in sorted(found):
+            entry_words = self.words[position]
+            if all(any(word.startswith(prefix) for word in entry_words) for prefix in rest):
+                object_id, label = self.entries[position]
+                results.append({"id": object_id, "label": label})
+                if len(results) >= limit:
+                    break
+        return results
+
+
+def _scope(org_id) -> str:
+    return NO_ORG_SCOPE if org_id is None else str(org_id)
+
+
+def _version_key(entity: str, scope: str) -> str:
+    return f"{AUTOCOMPLETE_VERSION_KEY}:{entity}:{scope}"
+
+
+def get_autocomplete_versions(entity: str, org_id) -> tuple[int, ...]:
+    # Записи без организации видны всем, их версия входит в ключ каждой организации
+    scopes = [_scope(org_id), NO_ORG_SCOPE] if org_id is not None else [NO_ORG_SCOPE]
+    return get_versions(_version_key(entity, scope) for scope in scopes)
+
+
+def invalidate_autocomplete(entity: str, org_ids) -> None:
+    bump_versions({_version_key(entity, _scope(org_id)) for org_id in org_ids})
+
+
+def _load_index(entity: str, org_id) -> AutocompleteIndex:
+    source = SOURCES[entity]
+    model = django_apps.get_model(source.model)
+    rows = model.objects.filter(Q(org_id=org_id) | Q(org__isnull=True)).values_list("pk", *source.fields)
+    return AutocompleteIndex((object_id, source.label(*values)) for object_id, *values in rows)
+
+
+def get_autocomplete_index(entity: str, org_id, versions: tuple[int, ...] | None = None) -> AutocompleteIndex:
+    """Индекс подписей организации: память процесса по текущей версии -> база"""
+    if versions is None:
+        versions = get_autocomplete_versions(entity, org_id)
+    key = (entity, org_id, versions)
+
+    index = autocomplete_local_cache.get(key)
+    if index is not None:
+        autocomplete_cache_stats.record("local")
+        return index
+
+    autocomplete_cache_stats.record(None)
+    index = _load_index(entity, org_id)
+    autocomplete_local_cache.set(key, index)
+    return index
+
+
+def get_etag(entity: str, org_id, versions: tuple[int, ...], query: str, limit: int) -> str:
+    raw = repr((entity, org_id, versions, query.lower().split(), limit))
+    return f'"{hashlib.sha1(raw.encode()).hexdigest()}"'
@@ -0,0 +1,8 @@
+from django.db import models
+
+
+class SearchKind(models.TextChoices):
+    LESSON = "lesson", "Занятие"
+    STUDENT = "student", "Ученик"
+    GROUP = "group", "Группа"
+    SCHEDULE = "schedule", "Виртуальное расписание"
@@ -0,0 +1,63 @@
+from functools import wraps
+from django.db.models import Q
+from rest_framework.request import Request
+from rest_framework.response import Response
+from mainapp.views import BaseViewSetWithOrdByOrg
+from .models import SearchDocument
+from .services import MAX_SEARCH_LIMIT, SEARCH_LIMIT, search
+
+
+def _parse_limit(value) -> int | None:
+    if value in (None, ""):
+        return SEARCH_LIMIT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return None
+    return min(limit, MAX_SEARCH_LIMIT) if limit > 0 else None
+
+
+def indexed_search(kind: str, extra_results: str | None = None):
+    """
+    Поиск по индексу документов вида kind. Метод представления возвращает queryset,
+    из которого берутся найденные объекты; порядок ответа - по релевантности.
+    select_related/prefetch_related этого queryset и optimize_queryset представления
+    применяются к найденным объектам, поэтому сериализация не делает N+1.
+    extra_results - имя метода представления (request, query, limit, documents),
+    объекты которого добавляются после найденных, пока не набран limit.
+    Тело запроса: {"query": "...", "limit": 50}
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(
+            self: BaseViewSetWithOrdByOrg, request: Request, *args, **kwargs
+        ) -> Response:
+            query = str(request.data.get("query", "")).strip()
+
+            if not query:
+                return Response({"error": "Пустой запрос"}, status=400)
+
+            limit = _parse_limit(request.data.get("limit"))
+            if limit is None:
+                return Response({"error": "limit должен быть положительным числом"}, status=400)
+
+            # Документы в той же области, что и queryset представления
+            documents = SearchDocument.objects.filter(Q(org=request.user.get_org) | Q(org__isnull=True))
+            object_ids = search(kind, query, limit, documents=documents)
+            queryset = func(self, request, *args, **kwargs)
+            if hasattr(self, "optimize_queryset"):
+                queryset = self.optimize_queryset(queryset)
+            objects = queryset.in_bulk(object_ids)
+            results = [objects[pk] for pk in object_ids if pk in objects]
+            if extra_results and len(results) < limit:
+                results += getattr(self, extra_results)(request, query, limit - len(results), documents)
+
+            # Результат поиска - чтение, даже если запрос пришел POST
+            serializer_class = self.read_serializer_class or self.serializer_class
+            serializer = serializer_class(results, many=True)
+            return Response(serializer.data)
+
+        return wrapper
+
+    return decorator
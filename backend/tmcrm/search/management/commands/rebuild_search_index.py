@@ -0,0 +1,21 @@
+import time as timer
+from typing import Any
+from django.core.management.base import BaseCommand
+from search.services import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересоздает поисковые документы занятий, учеников и групп. "
+        "Без параметров - для всех организаций"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--org", type=int, action="append", dest="orgs", help="id организации, можно несколько")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        started = timer.perf_counter()
+        written = rebuild_search_index(org_ids=options["orgs"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Записано {written} документов за {timer.perf_counter() - started:.1f} c"
+        ))
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def fill_search_documents(apps, schema_editor):
+    from search.services import rebuild_search_index
+
+    rebuild_search_index(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_search_indexes'),
+        ('lesson_schedule', '0008_hot_query_indexes'),
+        ('students', '0001_initial'),
+        ('employers', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:49
+
+from django.db import migrations, models
+
+
+def fill_schedule_documents(apps, schema_editor):
+    from search.services import rebuild_search_index
+
+    rebuild_search_index(apps=apps, kinds=["schedule"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0003_fill_search_documents'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchdocument',
+            name='kind',
+            field=models.CharField(choices=[('lesson', 'Занятие'), ('student', 'Ученик'), ('group', 'Группа'), ('schedule', 'Виртуальное расписание')], max_length=16),
+        ),
+        migrations.RunPython(fill_schedule_documents, migrations.RunPython.noop),
+    ]
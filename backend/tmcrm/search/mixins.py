@@ -0,0 +1,55 @@
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .autocomplete import (
+    AUTOCOMPLETE_LIMIT,
+    AUTOCOMPLETE_MAX_AGE,
+    MAX_AUTOCOMPLETE_LIMIT,
+    get_autocomplete_index,
+    get_autocomplete_versions,
+    get_etag,
+)
+
+
+class AutocompleteMixin:
+    """
+    GET autocomplete/?q=...&limit=10 - id и подпись объектов, слова которых
+    начинаются со слов запроса. autocomplete_source - ключ search.autocomplete.SOURCES
+    """
+
+    autocomplete_source: str = ""
+
+    def _autocomplete_limit(self, value):
+        if value in (None, ""):
+            return AUTOCOMPLETE_LIMIT
+        try:
+            limit = int(value)
+        except (TypeError, ValueError):
+            return None
+        return min(limit, MAX_AUTOCOMPLETE_LIMIT) if limit > 0 else None
+
+    @action(detail=False, methods=["get"], url_path="autocomplete")
+    def autocomplete(self, request):
+        query = request.query_params.get("q", "").strip()
+        limit = self._autocomplete_limit(request.query_params.get("limit"))
+        if limit is None:
+            return Response({"error": "limit должен быть положительным числом"}, status=400)
+
+        # Та же область, что и у queryset представления: организация пользователя и записи без нее
+        org = request.user.get_org
+        org_id = org.pk if org else None
+        versions = get_autocomplete_versions(self.autocomplete_source, org_id)
+        etag = get_etag(self.autocomplete_source, org_id, versions, query, limit)
+
+        if etag in (tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            index = get_autocomplete_index(self.autocomplete_source, org_id, versions)
+            response = Response(index.lookup(query, limit))
+
+        response["ETag"] = etag
+        # Повторы того же запроса при наборе отдаются браузером, дальше - сверка по ETag
+        patch_cache_control(response, private=True, max_age=AUTOCOMPLETE_MAX_AGE)
+        patch_vary_headers(response, ["Authorization"])
+        return response
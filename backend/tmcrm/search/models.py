@@ -0,0 +1,30 @@
+from django.db import models
+from mainapp.models import BaseModelOrg
+from .constants import SearchKind
+
+
+class SearchDocument(BaseModelOrg):
+    """
+    Поисковый документ объекта: текст всех полей, по которым ищут, в нижнем регистре.
+    Индексы под поиск создаются миграцией 0002 отдельно для каждой СУБД:
+    на PostgreSQL - вычисляемый столбец tsvector с GIN и триграммный GIN по content,
+    на SQLite - таблица FTS5, которую синхронизируют триггеры
+    """
+
+    kind = models.CharField(max_length=16, choices=SearchKind.choices)
+    object_id = models.PositiveBigIntegerField()
+    content = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Поисковый документ"
+        verbose_name_plural = "Поисковые документы"
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="unique_search_document"),
+        ]
+        indexes = [
+            models.Index(fields=["org", "kind"], name="search_document_org_kind_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.get_kind_display()} {self.object_id}"
@@ -0,0 +1,336 @@
+"""
+Поисковые документы занятий, учеников и групп и поиск по ним.
+
+Документ - денормализованный текст объекта вместе со связанными именами
+(преподаватель, аудитория, группа, предмет, ученики группы), поэтому поиск
+не соединяет таблицы. Занятия виртуальных расписаний не хранятся, поэтому
+индексируются сами виртуальные расписания (вид SCHEDULE). Документы
+обновляются сигналами при сохранении объектов и связанных с ними записей,
+полный пересчет - rebuild_search_index.
+"""
+from __future__ import annotations
+import re
+import threading
+from collections import defaultdict
+from datetime import date, time
+from typing import Iterable
+from django.apps import apps as django_apps
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .constants import SearchKind
+
+
+SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 200
+INDEX_BATCH_SIZE = 1000
+
+# Таблица FTS5 для SQLite, создается миграцией 0002
+FTS_TABLE = "search_searchdocument_fts"
+
+LESSON_FIELDS = (
+    "title",
+    "start_time",
+    "end_time",
+    "date",
+    "teacher__employer__name",
+    "teacher__employer__surname",
+    "teacher__employer__patronymic",
+    "classroom__title",
+    "classroom__floor",
+    "classroom__building",
+    "group__name",
+    "subject__name",
+)
+# Дата у расписания - дата создания, а не занятий, поэтому в документ не входит
+SCHEDULE_FIELDS = tuple(field for field in LESSON_FIELDS if field != "date")
+STUDENT_FIELDS = ("name", "surname", "phone_number", "birthday", "email")
+
+_TOKEN = re.compile(r"\w+")
+
+_pending = threading.local()
+
+
+def _get_models(apps=None):
+    apps = apps or django_apps
+    return (
+        apps.get_model("lesson_schedule", "Lesson"),
+        apps.get_model("students", "Student"),
+        apps.get_model("students", "StudentGroup"),
+        apps.get_model("search", "SearchDocument"),
+        apps.get_model("lesson_schedule", "PeriodLesson"),
+    )
+
+
+def _format(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, time):
+        return value.strftime("%H:%M")
+    if isinstance(value, date):
+        # Дату ищут и в ISO, и в привычном виде
+        return f"{value.isoformat()} {value.strftime('%d.%m.%Y')}"
+    return str(value)
+
+
+def build_content(*values) -> str:
+    return " ".join(filter(None, (_format(value) for value in values))).lower()
+
+
+def _upsert(SearchDocument, documents: Iterable) -> int:
+    written = 0
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            written += _write_batch(SearchDocument, batch)
+            batch = []
+    if batch:
+        written += _write_batch(SearchDocument, batch)
+    return written
+
+
+def _write_batch(SearchDocument, batch) -> int:
+    SearchDocument.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=["kind", "object_id"],
+        update_fields=["org", "content", "updated_at"],
+    )
+    return len(batch)
+
+
+def _index_lessons(SearchDocument, queryset) -> int:
+    rows = queryset.order_by().values_list("pk", "org_id", *LESSON_FIELDS).iterator(chunk_size=INDEX_BATCH_SIZE)
+    return _upsert(SearchDocument, (
+        SearchDocument(kind=SearchKind.LESSON, object_id=pk, org_id=org_id, content=build_content(*values))
+        for pk, org_id, *values in rows
+    ))
+
+
+def _index_schedules(SearchDocument, queryset) -> int:
+    rows = queryset.order_by().values_list("pk", "org_id", *SCHEDULE_FIELDS).iterator(chunk_size=INDEX_BATCH_SIZE)
+    return _upsert(SearchDocument, (
+        SearchDocument(kind=SearchKind.SCHEDULE, object_id=pk, org_id=org_id, content=build_content(*values))
+        for pk, org_id, *values in rows
+    ))
+
+
+def _index_students(SearchDocument, queryset) -> int:
+    rows = queryset.order_by().values_list("pk", "org_id", *STUDENT_FIELDS).iterator(chunk_size=INDEX_BATCH_SIZE)
+    return _upsert(SearchDocument, (
+        SearchDocument(kind=SearchKind.STUDENT, object_id=pk, org_id=org_id, content=build_content(*values))
+        for pk, org_id, *values in rows
+    ))
+
+
+def _iter_group_documents(SearchDocument, queryset):
+    """Документы групп вместе с именами учеников, ученики читаются одним запросом на пачку"""
+    Membership = queryset.model._meta.get_field("students").remote_field.through
+    groups = queryset.order_by("pk").values_list("pk", "org_id", "name").iterator(chunk_size=INDEX_BATCH_SIZE)
+
+    batch = []
+    for group in groups:
+        batch.append(group)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            yield from _build_group_documents(SearchDocument, Membership, batch)
+            batch = []
+    if batch:
+        yield from _build_group_documents(SearchDocument, Membership, batch)
+
+
+def _build_group_documents(SearchDocument, Membership, groups):
+    members = {}
+    rows = Membership.objects.filter(studentgroup_id__in=[pk for pk, *_ in groups]).values_list(
+        "studentgroup_id", "student__name", "student__surname"
+    )
+    for group_id, name, surname in rows:
+        members.setdefault(group_id, []).extend((name, surname))
+
+    for pk, org_id, name in groups:
+        yield SearchDocument(
+            kind=SearchKind.GROUP, object_id=pk, org_id=org_id, content=build_content(name, *members.get(pk, ()))
+        )
+
+
+def _index_groups(SearchDocument, queryset) -> int:
+    return _upsert(SearchDocument, _iter_group_documents(SearchDocument, queryset))
+
+
+def _indexed_objects(kind: str, apps=None):
+    """Объекты вида kind, у которых есть документы, и функция их индексации"""
+    Lesson, Student, StudentGroup, _, PeriodLesson = _get_models(apps)
+    return {
+        SearchKind.LESSON: (Lesson.objects.all(), _index_lessons),
+        SearchKind.STUDENT: (Student.objects.all(), _index_students),
+        SearchKind.GROUP: (StudentGroup.objects.all(), _index_groups),
+        SearchKind.SCHEDULE: (PeriodLesson.objects.filter(is_virtual=True), _index_schedules),
+    }[kind]
+
+
+def reindex_documents(kind: str, object_ids: Iterable[int]) -> int:
+    """
+    Обновляет документы объектов вида kind. Документы объектов,
+    которых больше нет (или которые больше не индексируются), удаляются
+    """
+    SearchDocument = _get_models()[3]
+    objects, indexer = _indexed_objects(kind)
+
+    object_ids = sorted(set(object_ids))
+    written = 0
+    for start in range(0, len(object_ids), INDEX_BATCH_SIZE):
+        batch = object_ids[start:start + INDEX_BATCH_SIZE]
+        queryset = objects.filter(pk__in=batch)
+        SearchDocument.objects.filter(kind=kind, object_id__in=batch).exclude(
+            object_id__in=queryset.values("pk")
+        ).delete()
+        written += indexer(SearchDocument, queryset)
+    return written
+
+
+def _lesson_ids_for_days(days) -> set[int]:
+    Lesson = _get_models()[0]
+    dates_by_org = defaultdict(set)
+    for org_id, day in days:
+        dates_by_org[org_id].add(day)
+
+    lookup = Q()
+    for org_id, dates in dates_by_org.items():
+        lookup |= Q(org_id=org_id, date__in=dates)
+    return set(Lesson.objects.filter(lookup).values_list("pk", flat=True)) if lookup else set()
+
+
+def schedule_reindex(kind: str, object_ids: Iterable[int] = (), days: Iterable = ()) -> None:
+    """
+    Откладывает обновление документов до фиксации транзакции, как пересчет
+    итогов аналитики: изменения всей транзакции обновляются одним колбэком.
+    days - пары (id организации, дата), все занятия которых нужно переиндексировать
+    """
+    object_ids = {object_id for object_id in object_ids if object_id is not None}
+    days = {(org_id, day) for org_id, day in days if day is not None}
+    if not object_ids and not days:
+        return
+    if not hasattr(_pending, "ids"):
+        _pending.ids = defaultdict(set)
+        _pending.days = set()
+    _pending.ids[kind].update(object_ids)
+    _pending.days.update(days)
+    transaction.on_commit(_flush_pending_documents, robust=True)
+
+
+def _flush_pending_documents() -> None:
+    ids = _pending.__dict__.pop("ids", None)
+    days = _pending.__dict__.pop("days", None)
+    if ids is None:
+        return
+    if days:
+        ids[SearchKind.LESSON].update(_lesson_ids_for_days(days))
+    for kind, object_ids in ids.items():
+        if object_ids:
+            reindex_documents(kind, object_ids)
+
+
+def rebuild_search_index(org_ids=None, apps=None, kinds=None) -> int:
+    """
+    Пересоздает документы организаций (по умолчанию - всех) видов kinds
+    (по умолчанию - всех). apps передается из миграций
+    """
+    SearchDocument = _get_models(apps)[3]
+    kinds = list(kinds or SearchKind.values)
+    documents = SearchDocument.objects.filter(kind__in=kinds)
+    if org_ids is not None:
+        documents = documents.filter(org_id__in=org_ids)
+    documents.delete()
+
+    written = 0
+    for kind in kinds:
+        queryset, indexer = _indexed_objects(kind, apps)
+        if org_ids is not None:
+            queryset = queryset.filter(org_id__in=org_ids)
+        written += indexer(SearchDocument, queryset)
+    return written
+
+
+def parse_words(query: str) -> list[str]:
+    return query.lower().split()
+
+
+def _word_tokens(words) -> list[list[str]]:
+    return [tokens for tokens in (_TOKEN.findall(word) for word in words) if tokens]
+
+
+def search(kind: str, query: str, limit: int = SEARCH_LIMIT, documents=None) -> list[int]:
+    """
+    id объектов вида kind, подходящих под любое слово запроса, от лучших к худшим.
+    documents - документы, среди которых искать, по умолчанию - доступные пользователю
+    """
+    words = parse_words(query)
+    if not words:
+        return []
+
+    if documents is None:
+        documents = _get_models()[3].org_objects.all()
+    documents = documents.filter(kind=kind)
+
+    vendor = connections[documents.db].vendor
+    if vendor == "postgresql":
+        return _search_postgresql(documents, words, limit)
+    if vendor == "sqlite":
+        return _search_sqlite(documents, words, limit)
+    return _search_contains(documents, words, limit)
+
+
+def _contains_any(words) -> Q:
+    match = Q()
+    for word in words:
+        match |= Q(content__contains=word)
+    return match
+
+
+def _search_postgresql(documents, words, limit) -> list[int]:
+    """
+    Подстроки ищутся через триграммный индекс (LIKE '%слово%'),
+    порядок - ранг по префиксам слов (tsvector) плюс триграммное сходство
+    """
+    table = documents.model._meta.db_table
+    # Слово из нескольких лексем (12:00, 09.08.2025) - фраза, последняя лексема - префикс
+    tsquery = " | ".join(
+        "({}:*)".format(" <-> ".join(tokens)) for tokens in _word_tokens(words)
+    )
+    rank = RawSQL(
+        f'ts_rank("{table}"."search_vector", to_tsquery(\'simple\', %s)) + similarity("{table}"."content", %s)',
+        [tsquery, " ".join(words)],
+    ) if tsquery else RawSQL(f'similarity("{table}"."content", %s)', [" ".join(words)])
+
+    return list(
+        documents.filter(_contains_any(words))
+        .annotate(rank=rank)
+        .order_by("-rank", "pk")
+        .values_list("object_id", flat=True)[:limit]
+    )
+
+
+def _search_sqlite(documents, words, limit) -> list[int]:
+    """Поиск по префиксам слов в FTS5, порядок - bm25"""
+    phrases = _word_tokens(words)
+    if not phrases:
+        return _search_contains(documents, words, limit)
+
+    # Слово из нескольких лексем - фраза, последняя лексема - префикс
+    match = " OR ".join('"{}"*'.format(" ".join(tokens)) for tokens in phrases)
+    scoped_sql, scoped_params = documents.values("pk").query.sql_with_params()
+    table = documents.model._meta.db_table
+    sql = (
+        f'SELECT d.object_id FROM {FTS_TABLE} JOIN "{table}" d ON d.id = {FTS_TABLE}.rowid '
+        f"WHERE {FTS_TABLE} MATCH %s AND d.id IN ({scoped_sql}) "
+        f"ORDER BY {FTS_TABLE}.rank LIMIT %s"
+    )
+    with connections[documents.db].cursor() as cursor:
+        cursor.execute(sql, [match, *scoped_params, limit])
+        return [object_id for (object_id,) in cursor.fetchall()]
+
+
+def _search_contains(documents, words, limit) -> list[int]:
+    return list(
+        documents.filter(_contains_any(words)).order_by("pk").values_list("object_id", flat=True)[:limit]
+    )
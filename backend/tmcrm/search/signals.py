@@ -0,0 +1,154 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from employers.models import Employer, Teacher
+from lesson_schedule.models import Classroom, Lesson, PeriodLesson, Subject
+from lesson_schedule.utils import lesson_days_changed
+from students.models import Student, StudentGroup
+from .autocomplete import invalidate_autocomplete
+from .constants import SearchKind
+from .services import schedule_reindex
+
+
+# Модели, от которых зависят подписи автодополнения
+AUTOCOMPLETE_ENTITIES = {
+    Student: "student",
+    StudentGroup: "group",
+    Classroom: "classroom",
+    Employer: "teacher",
+    Teacher: "teacher",
+}
+
+# Поля, которые попадают в документы других объектов:
+# при их изменении переиндексируются зависимые занятия и группы
+DEPENDENT_FIELDS = {
+    Employer: ("name", "surname", "patronymic"),
+    Classroom: ("title", "floor", "building"),
+    Subject: ("name",),
+    StudentGroup: ("name",),
+    Student: ("name", "surname"),
+}
+
+
+def _reindex_lessons(**lookup):
+    """Переиндексирует занятия и виртуальные расписания, подходящие под lookup"""
+    schedule_reindex(SearchKind.LESSON, Lesson.objects.filter(**lookup).values_list("pk", flat=True))
+    schedule_reindex(
+        SearchKind.SCHEDULE,
+        PeriodLesson.objects.filter(is_virtual=True, **lookup).values_list("pk", flat=True),
+    )
+
+
+@receiver(pre_save, sender=Employer)
+@receiver(pre_save, sender=Classroom)
+@receiver(pre_save, sender=Subject)
+@receiver(pre_save, sender=StudentGroup)
+@receiver(pre_save, sender=Student)
+def remember_dependent_fields(sender, instance, **kwargs):
+    instance._search_dependents_changed = False
+    if instance._state.adding:
+        return
+    fields = DEPENDENT_FIELDS[sender]
+    previous = sender.objects.filter(pk=instance.pk).values_list(*fields).first()
+    instance._search_dependents_changed = previous != tuple(getattr(instance, field) for field in fields)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def reindex_lesson(sender, instance, **kwargs):
+    schedule_reindex(SearchKind.LESSON, [instance.pk])
+
+
+@receiver(post_save, sender=PeriodLesson)
+@receiver(post_delete, sender=PeriodLesson)
+def reindex_period_lesson(sender, instance, **kwargs):
+    # Документ удаляется и у расписания, которое перестало быть виртуальным
+    schedule_reindex(SearchKind.SCHEDULE, [instance.pk])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def reindex_student(sender, instance, **kwargs):
+    schedule_reindex(SearchKind.STUDENT, [instance.pk])
+    if getattr(instance, "_search_dependents_changed", False):
+        schedule_reindex(SearchKind.GROUP, instance.groups.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Student)
+def reindex_student_groups_on_delete(sender, instance, **kwargs):
+    # После удаления связи ученика с группами уже не прочитать
+    schedule_reindex(SearchKind.GROUP, instance.groups.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=StudentGroup)
+@receiver(post_delete, sender=StudentGroup)
+def reindex_group(sender, instance, **kwargs):
+    schedule_reindex(SearchKind.GROUP, [instance.pk])
+    if getattr(instance, "_search_dependents_changed", False):
+        _reindex_lessons(group=instance)
+
+
+@receiver(post_save, sender=Employer)
+def reindex_employer_lessons(sender, instance, **kwargs):
+    if instance._search_dependents_changed:
+        _reindex_lessons(teacher__employer=instance)
+
+
+@receiver(post_save, sender=Classroom)
+def reindex_classroom_lessons(sender, instance, **kwargs):
+    if instance._search_dependents_changed:
+        _reindex_lessons(classroom=instance)
+
+
+@receiver(pre_delete, sender=Classroom)
+def reindex_classroom_lessons_on_delete(sender, instance, **kwargs):
+    # Аудитория у занятий обнуляется update без сигналов занятий
+    _reindex_lessons(classroom=instance)
+
+
+@receiver(post_save, sender=Subject)
+def reindex_subject_lessons(sender, instance, **kwargs):
+    if instance._search_dependents_changed:
+        _reindex_lessons(subject=instance)
+
+
+@receiver(m2m_changed, sender=StudentGroup.students.through)
+def reindex_group_students(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove"):
+        schedule_reindex(SearchKind.GROUP, pk_set if reverse else [instance.pk])
+    elif action == "pre_clear":
+        schedule_reindex(
+            SearchKind.GROUP, instance.groups.values_list("pk", flat=True) if reverse else [instance.pk]
+        )
+
+
+@receiver(lesson_days_changed, sender=Lesson)
+def reindex_changed_days_lessons(sender, days, **kwargs):
+    schedule_reindex(SearchKind.LESSON, days=days)
+
+
+def _invalidate_autocomplete(entity, org_id):
+    # Сброс сразу и после фиксации: список, собранный параллельным запросом
+    # по данным до фиксации, не останется под новой версией
+    invalidate_autocomplete(entity, [org_id])
+    transaction.on_commit(lambda: invalidate_autocomplete(entity, [org_id]))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=StudentGroup)
+@receiver(post_save, sender=Classroom)
+@receiver(post_save, sender=Employer)
+@receiver(post_save, sender=Teacher)
+def invalidate_autocomplete_on_save(sender, instance, created, **kwargs):
+    # У преподавателя подпись берется из сотрудника, сам он меняет ее только сменой сотрудника
+    if created or sender is Teacher or instance._search_dependents_changed:
+        _invalidate_autocomplete(AUTOCOMPLETE_ENTITIES[sender], instance.org_id)
+
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=StudentGroup)
+@receiver(post_delete, sender=Classroom)
+@receiver(post_delete, sender=Employer)
+@receiver(post_delete, sender=Teacher)
+def invalidate_autocomplete_on_delete(sender, instance, **kwargs):
+    _invalidate_autocomplete(AUTOCOMPLETE_ENTITIES[sender], instance.org_id)
@@ -0,0 +1,148 @@
+from rest_framework import status
+from mainapp.tests import BaseSetupDB
+from students.models import StudentGroup
+from .autocomplete import autocomplete_local_cache
+from .constants import SearchKind
+from .models import SearchDocument
+from .services import rebuild_search_index
+
+
+class TestSearchIndex(BaseSetupDB):
+
+    def setUp(self):
+        super().setUp()
+        rebuild_search_index(org_ids=[self.org.pk])
+
+    def _ids(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in response.data]
+
+    def test_lesson_search_by_related_names_and_time(self):
+        response = self.client.post("/api/schedule/lessons/search/", {"query": "Петрова"}, format="json")
+        self.assertEqual(self._ids(response), [self.schedule2.pk])
+
+        response = self.client.post("/api/schedule/lessons/search/", {"query": "12:00"}, format="json")
+        self.assertEqual(self._ids(response), [self.schedule1.pk])
+
+    def test_student_and_group_search(self):
+        response = self.client.post("/api/students/students/search/", {"query": "смирн"}, format="json")
+        self.assertEqual(self._ids(response), [self.student1.pk])
+
+        response = self.client.post("/api/students/student_groups/search/", {"query": "Марина"}, format="json")
+        self.assertEqual(self._ids(response), [self.group2.pk])
+
+    def test_student_search_queries_do_not_grow_with_results(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        url = "/api/students/students/search/"
+        with CaptureQueriesContext(connection) as one:
+            self.assertEqual(len(self._ids(self.client.post(url, {"query": "смирн"}, format="json"))), 1)
+        with CaptureQueriesContext(connection) as both:
+            response = self.client.post(url, {"query": "смирн марина"}, format="json")
+        self.assertEqual(len(self._ids(response)), 2)
+        self.assertEqual(len(both.captured_queries), len(one.captured_queries))
+        self.assertTrue(all("groups" in item for item in response.data))
+
+    def test_empty_query_and_bad_limit(self):
+        response = self.client.post("/api/students/students/search/", {"query": " "}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post("/api/students/students/search/", {"query": "а", "limit": 0}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_documents_follow_changes_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.employer1.surname = "Кузнецов"
+            self.employer1.save()
+            self.student2.name = "Дарья"
+            self.student2.save()
+            self.schedule3.delete()
+
+        lesson = SearchDocument.objects.get(kind=SearchKind.LESSON, object_id=self.schedule1.pk)
+        self.assertIn("кузнецов", lesson.content)
+        group = SearchDocument.objects.get(kind=SearchKind.GROUP, object_id=self.group2.pk)
+        self.assertIn("дарья", group.content)
+        self.assertFalse(SearchDocument.objects.filter(kind=SearchKind.LESSON, object_id=self.schedule3.pk).exists())
+
+    def test_virtual_schedule_occurrences_found(self):
+        from datetime import time
+        from django.utils import timezone
+        from lesson_schedule.models import PeriodLesson
+
+        with self.captureOnCommitCallbacks(execute=True):
+            period_lesson = PeriodLesson.create_manager.create(
+                org=self.org,
+                created_by=self.user,
+                title="Вебинар",
+                teacher=self.teacher2,
+                start_time=time(23, 58),
+                end_time=time(23, 59),
+                period=7,
+                start_date=timezone.localdate(),
+                is_virtual=True,
+            )
+
+        response = self.client.post("/api/schedule/lessons/search/", {"query": "вебинар", "limit": 3}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+        self.assertTrue(all(row["is_virtual"] and row["id"] is None for row in response.data))
+        self.assertEqual(response.data[0]["date"], timezone.localdate().isoformat())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            period_lesson.is_virtual = False
+            period_lesson.save()
+        self.assertFalse(SearchDocument.objects.filter(kind=SearchKind.SCHEDULE).exists())
+
+
+class TestAutocomplete(BaseSetupDB):
+
+    def setUp(self):
+        super().setUp()
+        autocomplete_local_cache.clear()
+
+    def test_prefix_of_any_word(self):
+        response = self.client.get("/api/students/students/autocomplete/", {"q": "смир ал"})
+        self.assertEqual(response.data, [{"id": self.student1.pk, "label": "Смирнов Алексей"}])
+
+        response = self.client.get("/api/employers/teachers/autocomplete/", {"q": "пет"})
+        self.assertEqual(response.data, [{"id": self.teacher2.pk, "label": "Петрова Мария Александровна"}])
+
+        response = self.client.get("/api/schedule/classrooms/autocomplete/", {"q": "44", "limit": 1})
+        self.assertEqual(len(response.data), 1)
+
+    def test_etag_and_rename(self):
+        url = "/api/students/student_groups/autocomplete/"
+        response = self.client.get(url, {"q": "testgroup2"})
+        self.assertIn("max-age", response["Cache-Control"])
+
+        not_modified = self.client.get(url, {"q": "testgroup2"}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.group2.name = "Вечерняя"
+        self.group2.save()
+        response = self.client.get(url, {"q": "веч"}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.data, [{"id": self.group2.pk, "label": "Вечерняя"}])
+
+    def test_rename_from_other_process(self):
+        import tempfile
+        from unittest import mock
+        from django.core.cache.backends.filebased import FileBasedCache
+        from .autocomplete import get_autocomplete_index, invalidate_autocomplete
+
+        with tempfile.TemporaryDirectory() as location:
+            # Два процесса со своими экземплярами одного общего кэша
+            first, second = FileBasedCache(location, {}), FileBasedCache(location, {})
+
+            with mock.patch("mainapp.cache.cache", first):
+                self.assertEqual(get_autocomplete_index("group", self.org.pk).lookup("веч"), [])
+
+            StudentGroup.objects.filter(pk=self.group2.pk).update(name="Вечерняя")
+            with mock.patch("mainapp.cache.cache", second):
+                invalidate_autocomplete("group", [self.org.pk])
+
+            with mock.patch("mainapp.cache.cache", first):
+                self.assertEqual(
+                    get_autocomplete_index("group", self.org.pk).lookup("веч"),
+                    [{"id": self.group2.pk, "label": "Вечерняя"}],
+                )
@@ -101,7 +101,7 @@ class StudentsSnapshot(BaseModelOrg):
 
     def save(self, *args, **kwargs):
         if not self.date:
-            self.date = get_org_local_datetime(self.get_org).date()
+            self.date = get_org_local_datetime(self.org_id).date()
         super().save(*args, **kwargs)
 
 
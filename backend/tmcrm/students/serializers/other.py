@@ -0,0 +1,18 @@
+from rest_framework import serializers
+
+
+# Самый длинный период журнала - учебный год
+GRADEBOOK_MAX_DAYS = 366
+
+
+class GradebookParamsSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, attrs):
+        days = (attrs["end_date"] - attrs["start_date"]).days
+        if days < 0:
+            raise serializers.ValidationError("end_date раньше start_date.")
+        if days >= GRADEBOOK_MAX_DAYS:
+            raise serializers.ValidationError(f"Период журнала не больше {GRADEBOOK_MAX_DAYS} дней.")
+        return attrs
@@ -1,7 +1,7 @@
 from typing import TYPE_CHECKING
 from celery import shared_task
-from mainapp.utils import get_org_local_datetime, get_cache, CacheType
-from mainapp.utils import CacheType
+from mainapp.cache import get_orgs_meta
+from mainapp.metrics import track_task_rows
 from .models import Student, StudentsSnapshot
 from mainapp.models import OrgSettings
 from mainapp.utils import get_org_local_datetime
@@ -15,16 +15,16 @@ def save_clients_snapshot(orgs=None):
     results = []
 
     if not orgs:
-        orgs: list["Organization"] = get_cache(
-            "mainapp.Organization", cache_type=CacheType.MODEL
-        )
+        orgs = list(get_orgs_meta())
 
     for org in orgs:
-        students_count = Student.objects.filter_by_org(org).count()
+        org_id = getattr(org, "pk", org)
+        students_count = Student.objects.filter_by_org(org_id).count()
         snapshot = StudentsSnapshot.objects.create(
-            org=org, 
-            total_clients=students_count, 
+            org_id=org_id,
+            total_clients=students_count,
         )
         results.append(f'Создан снапшот, количество клиентов {students_count}')
 
-    return results
\ No newline at end of file
+    track_task_rows("save_clients_snapshot", len(results))
+    return results
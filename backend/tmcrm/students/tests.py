@@ -1,3 +1,62 @@
-from django.test import TestCase
+from rest_framework import status
+from mainapp.tests import BaseSetupDB
+from lesson_schedule.models import Attendance, Grade
+from .models import StudentGroup
 
-# Create your tests here.
+
+class TestGradebook(BaseSetupDB):
+
+    def setUp(self):
+        super().setUp()
+        self.url = f"/api/students/student_groups/{self.group1.pk}/gradebook/"
+        self.params = {"start_date": "2025-08-01", "end_date": "2025-08-31"}
+
+    def test_matrix(self):
+        Grade.objects.create(org=self.org, lesson=self.schedule3, student=self.student1, value=5)
+        Attendance.objects.create(org=self.org, lesson=self.schedule1, student=self.student1, was_present=True)
+
+        response = self.client.get(self.url, self.params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["students"], [self.student1.pk])
+        self.assertEqual(response.data["lessons"], [self.schedule1.pk, self.schedule3.pk])
+        self.assertEqual(response.data["grades"], "-5")
+        self.assertEqual(response.data["presence"], "1-")
+
+    def test_cached_until_data_changes(self):
+        response = self.client.get(self.url, self.params)
+        not_modified = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Grade.objects.create(org=self.org, lesson=self.schedule1, student=self.student1, value=4)
+
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["grades"], "4-")
+
+    def test_not_modified_without_building(self):
+        from unittest import mock
+
+        etag = self.client.get(self.url, self.params)["ETag"]
+        with mock.patch("lesson_schedule.gradebook.cache") as cache, \
+                mock.patch("lesson_schedule.gradebook.build_gradebook") as build:
+            response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        cache.get.assert_not_called()
+        build.assert_not_called()
+
+    def test_group_without_org_sees_org_grades(self):
+        StudentGroup.objects.filter(pk=self.group1.pk).update(org=None)
+        etag = self.client.get(self.url, self.params)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Grade.objects.create(org=self.org, lesson=self.schedule1, student=self.student1, value=4)
+
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["grades"], "4-")
+
+    def test_range_required(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,8 +1,13 @@
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
 from mainapp.views import BaseViewSetWithOrdByOrg, SelectRelatedViewSet
-from mainapp.decorators import base_search
+from search.constants import SearchKind
+from search.decorators import indexed_search
+from search.mixins import AutocompleteMixin
+from lesson_schedule.gradebook import get_gradebook, get_gradebook_key
 from lesson_schedule.models import Grade
 from lesson_schedule.serializers.read import GradeReadSerializer
 from .models import StudentGroup, Student
@@ -13,6 +18,7 @@ from .serializers.read import (
     ParentReadSerializer,
     AccrualReadSerializer,
 )
+from .serializers.other import GradebookParamsSerializer
 from .serializers.write import (
     StudentGroupWriteSerializer,
     StudentWriteSerializer,
@@ -21,29 +27,48 @@ from .serializers.write import (
 )
 
 
-class StudentGroupViewSet(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
+class StudentGroupViewSet(AutocompleteMixin, SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
     queryset = StudentGroup.objects.all()
     read_serializer_class = StudentGroupReadSerializer
     write_serializer_class = StudentGroupWriteSerializer
     prefetch_related_fields = ['students']
+    autocomplete_source = 'group'
 
     @action(detail=False, methods=['post'], url_path='search')
-    @base_search
-    def search(self, request, words: list[str]) -> Q:
-        q = Q()
-        for word in words:
-            q |= (
-            Q(students__name__icontains=word) |
-            Q(students__surname__icontains=word) |
-            Q(name__icontains=word)
-            )  
-        return q
+    @indexed_search(SearchKind.GROUP)
+    def search(self, request):
+        return self.get_queryset()
 
+    @action(detail=True, methods=['get'], url_path='gradebook')
+    def gradebook(self, request, pk=None):
+        """Журнал группы за период: ?start_date=...&end_date=... (lesson_schedule.gradebook)"""
+        params = GradebookParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
 
-class StudentViewSet(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
+        # Состав группы журналу не нужен целиком, prefetch учеников не делаем
+        group = get_object_or_404(self.get_queryset().prefetch_related(None), pk=pk)
+        self.check_object_permissions(request, group)
+
+        start, end = params.validated_data["start_date"], params.validated_data["end_date"]
+        org_id = getattr(request.user.get_org, "pk", None)
+        key = get_gradebook_key(group, start, end, org_id)
+        etag = f'"{key.rsplit(":", 1)[-1]}"'
+        # Ключ зависит только от версий данных: при совпадении ETag журнал не собирается
+        if etag in (tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(get_gradebook(group, start, end, org_id, key=key))
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class StudentViewSet(AutocompleteMixin, SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
     queryset = Student.objects.all()
     read_serializer_class = StudentReadSerializer
     write_serializer_class = StudentWriteSerializer
+    prefetch_related_fields = ["groups"]
+    autocomplete_source = "student"
 
     @action(detail=False, methods=["get"], url_path="get_count_students")
     def get_count_students(self, request):
@@ -51,18 +76,9 @@ class StudentViewSet(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
         return Response({"count": count_students})
 
     @action(detail=False, methods=["post"], url_path="search")
-    @base_search
-    def search(self, request, words: list[str]) -> Q:
-        q = Q()
-        for word in words:
-            q |= (
-                Q(name__icontains=word) |
-                Q(surname__icontains=word) |
-                Q(phone_number__icontains=word) |
-                Q(birthday__icontains=word) |
-                Q(email__icontains=word)
-            )
-        return q
+    @indexed_search(SearchKind.STUDENT)
+    def search(self, request):
+        return self.get_queryset()
 
 class StudentGradeViewSet(SelectRelatedViewSet, BaseViewSetWithOrdByOrg):
     queryset = Grade.objects.all()
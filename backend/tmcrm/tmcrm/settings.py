@@ -1,4 +1,5 @@
 from pathlib import Path
+import os
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,12 +49,15 @@ APPS = [
     "mainapp",
     "students",
     "accounts",
+    "search",
 ]
 
 INSTALLED_APPS = DJANGO_APPS + OTHER_APPS + APPS
 
 
 MIDDLEWARE = [
+    "mainapp.middleware.metrics.PrometheusMiddleware",
+    "mainapp.middleware.query_inspector.QueryInspectorMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -113,6 +117,29 @@ DATABASES = {
     }
 }
 
+# Запуск без PostgreSQL (например, бенчмарки): TMCRM_DATABASE=sqlite
+if os.environ.get("TMCRM_DATABASE") == "sqlite":
+    DATABASES["default"] = DATABASES["sqlite"]
+
+
+# Общий кэш всех процессов: версии кэшей, пользователи для аутентификации,
+# ответы аналитики. Сброс в одном процессе должен быть виден остальным
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("TMCRM_CACHE_URL", "redis://localhost:6379/1"),
+    }
+}
+
+# Запуск без Redis (тесты, бенчмарки) в одном процессе: TMCRM_CACHE=locmem
+if os.environ.get("TMCRM_CACHE") == "locmem":
+    CACHES["default"] = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+
+# Кэш пользователей для аутентификации (mainapp.authentication.CachedJWTAuthentication).
+# Блокировка пользователя или смена пароля в одном процессе должны сразу действовать
+# во всех, поэтому кэш включается только вместе с общим кэшем
+AUTH_USERS_CACHE = CACHES["default"]["BACKEND"] == "django.core.cache.backends.redis.RedisCache"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -167,7 +194,7 @@ REST_FRAMEWORK = {
         "mainapp.permissions.IsAuthenticated",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "mainapp.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
 }
@@ -201,6 +228,35 @@ CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 
+# На сколько недель вперед создаются занятия периодических расписаний
+LESSONS_MATERIALIZATION_HORIZON_WEEKS = 8
+
+# Доступ к /metrics: токен в заголовке Authorization: Bearer <токен>
+# (bearer_token в scrape_config). Без токена /metrics закрыт.
+# Список адресов сборщика по умолчанию пуст и включается явно, только если Django
+# видит адрес самого сборщика: за локальным nginx/gunicorn-прокси REMOTE_ADDR
+# у всех запросов 127.0.0.1, и /metrics стал бы публичным
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.environ.get("TMCRM_METRICS_ALLOWED_IPS", "").split(",") if ip
+]
+METRICS_TOKEN = os.environ.get("TMCRM_METRICS_TOKEN")
+
+# Поиск N+1 и медленных запросов (mainapp.query_inspector).
+# На стенде включается целиком, в продакшене - для доли запросов через SAMPLE_RATE
+QUERY_INSPECTOR = {
+    "ENABLED": os.environ.get("TMCRM_QUERY_INSPECTOR") == "1",
+    "SAMPLE_RATE": float(os.environ.get("TMCRM_QUERY_INSPECTOR_SAMPLE_RATE", 1.0)),
+    "N_PLUS_ONE_THRESHOLD": 5,
+    "SLOW_QUERY_MS": 100,
+    "SLOWEST": 5,
+    "BUDGETS": {
+        "ScheduleViewSet": 10,
+        "StudentGroupViewSet": 10,
+        "ParentViewSet": 10,
+    },
+    "RAISE_ON_BUDGET": False,
+}
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -4,6 +4,7 @@ from django.conf import settings
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
+from mainapp.metrics import metrics_view
 
 from lesson_schedule.urls import router as schedule_router
 from employers.urls import router as employers_router
@@ -13,6 +14,7 @@ from students.urls import router as students_router
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("tmcrm.api_urls")),
+    path("metrics", metrics_view, name="metrics"),
     path("", include("mainapp.urls")),
 ]
 